@@ -0,0 +1,469 @@
+"""
+Alertas de preço avaliados a cada snapshot de mercado, no servidor.
+
+As regras ficam em SQLite (dados/alertas.sqlite3, ou ALERTAS_CAMINHO) e são
+avaliadas pelo processo dono da coleta (o app ou o servico_dados.py), uma
+vez por snapshot, em vez de por sessão. Com o serviço de dados, as réplicas
+do app só gravam e leem regras: quem avalia é o servico_dados.py, então
+todos precisam de ALERTAS_CAMINHO apontando para o mesmo arquivo. Sem isso,
+cada réplica guarda as próprias regras em dados/alertas.sqlite3 e elas nunca
+são avaliadas. Tipos de regra:
+
+    acima        preço cruzou para cima do limite
+    abaixo       preço cruzou para baixo do limite
+    variacao     |variação 24h| (%) passou a ser maior ou igual ao limite
+    cruzamento   preço cruzou a média móvel de `limite` horas (sparkline)
+
+Os alertas disparam na travessia (o valor anterior não atendia à regra e
+o novo atende), então não se repetem enquanto a condição continuar valendo.
+
+Para cada tipo, as regras ficam agrupadas por moeda, com os limites em
+ordem crescente (um array contíguo e o início/fim de cada moeda). A cada
+snapshot, só as moedas alteradas com regras são consultadas: uma busca
+binária vetorizada em cada grupo devolve a faixa de limites atravessados
+entre o valor anterior e o novo. O custo cresce com o número de moedas
+alteradas (e de alertas disparados), não com regras × moedas.
+
+Destinos (onde os alertas disparados são entregues):
+    DestinoLog      log 'alertas' (padrão)
+    DestinoArquivo  uma linha JSON por alerta (ALERTAS_ARQUIVO)
+Todo alerta disparado também é gravado na tabela `disparos`.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from metricas import metricas
+
+CAMINHO_PADRAO = os.environ.get(
+    'ALERTAS_CAMINHO',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'alertas.sqlite3')
+)
+
+ACIMA = 'acima'
+ABAIXO = 'abaixo'
+VARIACAO = 'variacao'
+CRUZAMENTO = 'cruzamento'
+
+# Tipos de regra: código -> descrição
+TIPOS_ALERTA = {
+    ACIMA: "Preço acima de",
+    ABAIXO: "Preço abaixo de",
+    VARIACAO: "Variação 24h (±%) de pelo menos",
+    CRUZAMENTO: "Preço cruzar a média móvel de (horas)",
+}
+
+# Janela máxima da média móvel: pontos do sparkline de 7 dias
+JANELA_MAXIMA = 168
+
+# Disparos mantidos na tabela (os mais antigos são descartados)
+LIMITE_DISPAROS = 10000
+
+Disparo = namedtuple('Disparo', [
+    'regra_id', 'usuario', 'cripto_id', 'tipo', 'limite', 'valor', 'anterior', 'instante'
+])
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS regras (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario TEXT NOT NULL,
+    cripto_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    limite REAL NOT NULL,
+    criada_em REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS regras_usuario ON regras (usuario);
+
+CREATE TABLE IF NOT EXISTS disparos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    regra_id INTEGER NOT NULL,
+    usuario TEXT NOT NULL,
+    cripto_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    limite REAL NOT NULL,
+    valor REAL NOT NULL,
+    anterior REAL NOT NULL,
+    instante REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS disparos_usuario ON disparos (usuario, instante);
+
+CREATE TABLE IF NOT EXISTS versao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    regras INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO versao (id, regras) VALUES (1, 0);
+"""
+
+logger = logging.getLogger('alertas')
+
+
+class DestinoLog:
+    """
+    Entrega os alertas no log 'alertas'.
+    """
+
+    def enviar(self, disparos):
+        for disparo in disparos:
+            logger.warning("Alerta %s: %s %s %s (valor %.8g, anterior %.8g) para %s",
+                           disparo.regra_id, disparo.cripto_id, disparo.tipo, disparo.limite,
+                           disparo.valor, disparo.anterior, disparo.usuario)
+
+
+class DestinoArquivo:
+    """
+    Acrescenta cada alerta como uma linha JSON em um arquivo local.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+
+    def enviar(self, disparos):
+        with self._trava, open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            for disparo in disparos:
+                arquivo.write(json.dumps(disparo._asdict(), ensure_ascii=False) + '\n')
+
+
+def criar_destino():
+    """
+    Retorna o destino configurado: arquivo JSON se ALERTAS_ARQUIVO estiver
+    definida, senão o log.
+    """
+    caminho = os.environ.get('ALERTAS_ARQUIVO')
+    if caminho:
+        return DestinoArquivo(caminho)
+    return DestinoLog()
+
+
+def _buscar_em_grupos(limites, inicio, fim, valores, lado='left'):
+    """
+    Busca binária vetorizada: para cada i, retorna a posição de valores[i]
+    em limites[inicio[i]:fim[i]] (já ordenado), como np.searchsorted com
+    `lado`, somada a inicio[i]. Todos os grupos avançam juntos, um passo
+    por iteração.
+    """
+    baixo = np.array(inicio, dtype=np.int64)
+    alto = np.array(fim, dtype=np.int64)
+    ultimo = max(len(limites) - 1, 0)
+    while True:
+        ativos = baixo < alto
+        if not ativos.any():
+            return baixo
+        meio = (baixo + alto) // 2
+        limite = limites[np.minimum(meio, ultimo)]
+        direita = ativos & ((limite < valores) if lado == 'left' else (limite <= valores))
+        baixo = np.where(direita, meio + 1, baixo)
+        alto = np.where(ativos & ~direita, meio, alto)
+
+
+def _expandir_faixas(inicio, fim):
+    """
+    Retorna as posições de todas as faixas [inicio[i], fim[i]) concatenadas.
+    """
+    tamanhos = np.maximum(np.asarray(fim) - np.asarray(inicio), 0)
+    total = int(tamanhos.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    return np.repeat(inicio - np.cumsum(tamanhos) + tamanhos, tamanhos) + np.arange(total)
+
+
+class IndiceRegras:
+    """
+    Regras de um tipo agrupadas por moeda: as regras da moeda ids[g] ocupam
+    as posições inicio[g]:fim[g] dos arrays, em ordem crescente de limite.
+    """
+
+    def __init__(self, df_regras):
+        df_regras = df_regras.sort_values(['cripto_id', 'limite'], kind='stable')
+        self.limites = df_regras['limite'].to_numpy(dtype=np.float64)
+        self.regra_ids = df_regras['id'].to_numpy(dtype=np.int64)
+        self.usuarios = df_regras['usuario'].to_numpy(dtype=object)
+        moedas = df_regras['cripto_id'].to_numpy(dtype=object)
+        novo_grupo = np.ones(len(moedas), dtype=bool)
+        novo_grupo[1:] = moedas[1:] != moedas[:-1]
+        self.inicio = np.flatnonzero(novo_grupo)
+        self.fim = np.append(self.inicio[1:], len(moedas)).astype(np.int64)
+        self.ids = pd.Index(moedas[self.inicio])
+
+    def __len__(self):
+        return len(self.limites)
+
+    def grupos(self, cripto_ids):
+        """
+        Retorna tupla (posição em cripto_ids, grupo) das moedas que têm regras.
+        """
+        grupos = self.ids.get_indexer(cripto_ids)
+        posicoes = np.flatnonzero(grupos >= 0)
+        return posicoes, grupos[posicoes]
+
+    def atravessados(self, grupos, anteriores, atuais, subindo=True):
+        """
+        Retorna tupla (posições das regras, índice em `grupos`) das regras
+        cujo limite foi atravessado: subindo, anterior < limite <= atual;
+        descendo, atual <= limite < anterior.
+        """
+        inicio, fim = self.inicio[grupos], self.fim[grupos]
+        if subindo:
+            validos = atuais > anteriores
+            a = _buscar_em_grupos(self.limites, inicio, fim, anteriores, 'right')
+            b = _buscar_em_grupos(self.limites, inicio, fim, atuais, 'right')
+        else:
+            validos = atuais < anteriores
+            a = _buscar_em_grupos(self.limites, inicio, fim, atuais, 'left')
+            b = _buscar_em_grupos(self.limites, inicio, fim, anteriores, 'left')
+        # Comparações com NaN são falsas: moedas sem valor ficam de fora
+        a, b = a[validos], b[validos]
+        return _expandir_faixas(a, b), np.repeat(np.flatnonzero(validos), b - a)
+
+
+def _medias_moveis(sparklines, linhas, grupos, janelas):
+    """
+    Retorna, para cada i, a média dos últimos `janelas[i]` pontos válidos
+    do sparkline da linha `linhas[grupos[i]]` (NaN se não houver pontos).
+    As somas acumuladas são calculadas uma vez por moeda.
+    """
+    matriz = np.asarray(sparklines[linhas], dtype=np.float64)
+    validos = np.isfinite(matriz)
+    zeros = np.zeros((len(matriz), 1))
+    soma = np.hstack([zeros, np.cumsum(np.where(validos, matriz, 0.0), axis=1)])
+    quantidade = np.hstack([zeros, np.cumsum(validos, axis=1)])
+    fim = matriz.shape[1]
+    inicio = np.clip(fim - janelas, 0, fim)
+    pontos = quantidade[grupos, fim] - quantidade[grupos, inicio]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(pontos > 0, (soma[grupos, fim] - soma[grupos, inicio]) / pontos, np.nan)
+
+
+class _Valores:
+    """
+    Valores de um snapshot usados na avaliação, com busca de linhas por id.
+    """
+
+    def __init__(self, snapshot):
+        df = snapshot.df
+        self.ids = pd.Index(df['id'].astype(str).to_numpy())
+        self.precos = df['current_price'].to_numpy(dtype=np.float64)
+        if 'price_change_percentage_24h' in df.columns:
+            self.variacoes = np.abs(df['price_change_percentage_24h'].to_numpy(dtype=np.float64))
+        else:
+            self.variacoes = np.full(len(df), np.nan)
+        self.sparklines = snapshot.sparklines
+
+
+class MotorAlertas:
+    """
+    Regras de alerta em SQLite e sua avaliação a cada snapshot. O índice
+    das regras é reconstruído só quando elas mudam (contador `versao`, que
+    também vale para regras criadas por outros processos).
+    """
+
+    def __init__(self, caminho=CAMINHO_PADRAO, destino=None):
+        self.caminho = caminho
+        self.destino = destino if destino is not None else criar_destino()
+        self.erro = None
+        self._anterior = None
+        self._versao = None
+        self._indices = {}
+        self._trava = threading.Lock()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    # ---------- Regras ----------
+
+    def adicionar(self, usuario, cripto_id, tipo, limite):
+        """
+        Cria uma regra e retorna o seu id. Lança ValueError se o tipo ou o
+        limite forem inválidos.
+        """
+        if tipo not in TIPOS_ALERTA:
+            raise ValueError(f"Tipo de alerta desconhecido: {tipo}")
+        limite = float(limite)
+        if not np.isfinite(limite) or limite <= 0:
+            raise ValueError("O limite deve ser um número positivo")
+        if tipo == CRUZAMENTO and not 2 <= limite <= JANELA_MAXIMA:
+            raise ValueError(f"A média móvel deve ter entre 2 e {JANELA_MAXIMA} horas")
+        with self._conectar() as conexao:
+            cursor = conexao.execute(
+                "INSERT INTO regras (usuario, cripto_id, tipo, limite, criada_em) VALUES (?, ?, ?, ?, ?)",
+                (usuario, cripto_id, tipo, limite, time.time())
+            )
+            conexao.execute("UPDATE versao SET regras = regras + 1 WHERE id = 1")
+            return cursor.lastrowid
+
+    def remover(self, regra_id, usuario):
+        """
+        Remove uma regra do usuário. Retorna True se ela existia.
+        """
+        with self._conectar() as conexao:
+            removidas = conexao.execute(
+                "DELETE FROM regras WHERE id = ? AND usuario = ?", (int(regra_id), usuario)
+            ).rowcount
+            if removidas:
+                conexao.execute("UPDATE versao SET regras = regras + 1 WHERE id = 1")
+        return removidas > 0
+
+    def regras(self, usuario=None):
+        """
+        Retorna DataFrame com as regras (de um usuário ou de todos).
+        """
+        consulta = "SELECT id, usuario, cripto_id, tipo, limite, criada_em FROM regras"
+        with self._conectar() as conexao:
+            if usuario is None:
+                return pd.read_sql_query(consulta + " ORDER BY id", conexao)
+            return pd.read_sql_query(consulta + " WHERE usuario = ? ORDER BY id", conexao, params=(usuario,))
+
+    def disparos(self, usuario, limite=20):
+        """
+        Retorna DataFrame com os últimos alertas disparados para o usuário.
+        """
+        with self._conectar() as conexao:
+            return pd.read_sql_query(
+                "SELECT regra_id, cripto_id, tipo, limite, valor, anterior, instante FROM disparos "
+                "WHERE usuario = ? ORDER BY instante DESC, id DESC LIMIT ?",
+                conexao, params=(usuario, int(limite))
+            )
+
+    def _indices_atuais(self):
+        """
+        Retorna dict tipo -> IndiceRegras, reconstruído se as regras mudaram.
+        """
+        with self._conectar() as conexao:
+            versao = conexao.execute("SELECT regras FROM versao WHERE id = 1").fetchone()[0]
+        if versao != self._versao:
+            df_regras = self.regras()
+            self._indices = {tipo: IndiceRegras(df_tipo) for tipo, df_tipo in df_regras.groupby('tipo')}
+            self._versao = versao
+        return self._indices
+
+    # ---------- Avaliação ----------
+
+    def _avaliar_limites(self, indice, tipo, ids, anterior, atual):
+        posicoes, grupos = indice.grupos(ids)
+        if not len(grupos):
+            return []
+        linhas_atual = atual.ids.get_indexer(ids[posicoes])
+        linhas_anterior = anterior.ids.get_indexer(ids[posicoes])
+        campo = 'variacoes' if tipo == VARIACAO else 'precos'
+        valores = getattr(atual, campo)[linhas_atual]
+        anteriores = getattr(anterior, campo)[linhas_anterior]
+        regras, grupo_local = indice.atravessados(grupos, anteriores, valores, subindo=tipo != ABAIXO)
+        return [(tipo, indice, regras, ids[posicoes][grupo_local], valores[grupo_local], anteriores[grupo_local])]
+
+    def _avaliar_cruzamentos(self, indice, ids, anterior, atual):
+        posicoes, grupos = indice.grupos(ids)
+        if not len(grupos):
+            return []
+        regras = _expandir_faixas(indice.inicio[grupos], indice.fim[grupos])
+        grupo_local = np.repeat(np.arange(len(grupos)), indice.fim[grupos] - indice.inicio[grupos])
+        linhas_atual = atual.ids.get_indexer(ids[posicoes])
+        linhas_anterior = anterior.ids.get_indexer(ids[posicoes])
+        janelas = indice.limites[regras].astype(np.int64)
+
+        precos = atual.precos[linhas_atual][grupo_local]
+        precos_anteriores = anterior.precos[linhas_anterior][grupo_local]
+        diferenca = precos - _medias_moveis(atual.sparklines, linhas_atual, grupo_local, janelas)
+        diferenca_anterior = precos_anteriores - _medias_moveis(anterior.sparklines, linhas_anterior,
+                                                                grupo_local, janelas)
+        cruzou = np.sign(diferenca) * np.sign(diferenca_anterior) < 0
+        return [(CRUZAMENTO, indice, regras[cruzou], ids[posicoes][grupo_local[cruzou]],
+                 precos[cruzou], precos_anteriores[cruzou])]
+
+    def avaliar(self, snapshot):
+        """
+        Avalia as regras contra o snapshot (comparando com o snapshot
+        anterior recebido) e retorna a lista de Disparo. Só as moedas
+        alteradas entre os dois snapshots são consultadas.
+        """
+        with self._trava, metricas.medir('alertas_avaliar'):
+            atual = _Valores(snapshot)
+            anterior, self._anterior = self._anterior, atual
+            indices = self._indices_atuais()
+            if anterior is None or not indices:
+                return []
+
+            ids = np.asarray(snapshot.mudancas.alteradas, dtype=object)
+            # Moedas alteradas que também estavam no snapshot anterior
+            ids = ids[(anterior.ids.get_indexer(ids) >= 0) & (atual.ids.get_indexer(ids) >= 0)]
+            if not len(ids):
+                return []
+
+            resultados = []
+            for tipo, indice in indices.items():
+                if tipo == CRUZAMENTO:
+                    resultados += self._avaliar_cruzamentos(indice, ids, anterior, atual)
+                else:
+                    resultados += self._avaliar_limites(indice, tipo, ids, anterior, atual)
+
+        instante = time.time()
+        disparos = [
+            Disparo(int(indice.regra_ids[regra]), indice.usuarios[regra], str(cripto_id), tipo,
+                    float(indice.limites[regra]), float(valor), float(valor_anterior), instante)
+            for tipo, indice, regras, cripto_ids, valores, anteriores in resultados
+            for regra, cripto_id, valor, valor_anterior in zip(regras, cripto_ids, valores, anteriores)
+        ]
+        metricas.contar('alertas_disparados', len(disparos))
+        return disparos
+
+    def _gravar_disparos(self, disparos):
+        with self._conectar() as conexao:
+            conexao.executemany(
+                "INSERT INTO disparos (regra_id, usuario, cripto_id, tipo, limite, valor, anterior, instante) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", disparos
+            )
+            ultimo = conexao.execute("SELECT MAX(id) FROM disparos").fetchone()[0]
+            conexao.execute("DELETE FROM disparos WHERE id <= ?", (ultimo - LIMITE_DISPAROS,))
+
+    def notificar(self, snapshot):
+        """
+        Recebe um novo snapshot (chamado pelo coletor de mercado), avalia as
+        regras e entrega os alertas disparados. Erros ficam em self.erro e
+        não interrompem a coleta.
+        """
+        try:
+            disparos = self.avaliar(snapshot)
+            if disparos:
+                self._gravar_disparos(disparos)
+                self.destino.enviar(disparos)
+            self.erro = None
+        except Exception as e:
+            self.erro = e
+        return self
+
+
+_motor = None
+_trava_motor = threading.Lock()
+
+
+def obter_motor_alertas():
+    """
+    Retorna o motor de alertas compartilhado do processo, criando-o na primeira chamada.
+    """
+    global _motor
+    with _trava_motor:
+        if _motor is None:
+            _motor = MotorAlertas()
+        return _motor
@@ -0,0 +1,113 @@
+"""
+Redução de pontos (downsampling) de séries de preço antes de plotar.
+
+Usa Largest-Triangle-Three-Buckets (LTTB), que preserva a forma visual da
+série, com pré-redução min/max para séries muito longas (MinMaxLTTB). O
+número de pontos é escolhido pela largura do gráfico: mais pontos do que
+pixels não muda o desenho, só aumenta o payload.
+"""
+import numpy as np
+
+# Largura típica do gráfico no layout "wide" (pixels)
+LARGURA_GRAFICO_PX = 1200
+
+# Pontos por pixel horizontal
+PONTOS_POR_PIXEL = 2
+
+# Séries maiores que PRE_REDUCAO * alvo passam antes por min/max
+PRE_REDUCAO = 4
+
+
+def pontos_alvo(largura_px=LARGURA_GRAFICO_PX):
+    """
+    Retorna o número de pontos a plotar para um gráfico com a largura dada.
+    """
+    return max(3, int(largura_px * PONTOS_POR_PIXEL))
+
+
+def indices_minmax(y, baldes):
+    """
+    Divide a série em baldes de mesmo tamanho e mantém o mínimo e o máximo
+    de cada um (totalmente vetorizado). Retorna índices ordenados.
+    """
+    n = len(y)
+    tamanho = int(np.ceil(n / baldes))
+    matriz = np.full(baldes * tamanho, np.nan)
+    matriz[:n] = y
+    matriz = matriz.reshape(baldes, tamanho)
+
+    validos = ~np.all(np.isnan(matriz), axis=1)
+    linhas = np.flatnonzero(validos)
+    base = linhas * tamanho
+    minimos = base + np.nanargmin(matriz[validos], axis=1)
+    maximos = base + np.nanargmax(matriz[validos], axis=1)
+
+    indices = np.unique(np.concatenate([[0, n - 1], minimos, maximos]))
+    return indices[indices < n]
+
+
+def indices_lttb(x, y, alvo):
+    """
+    Seleciona `alvo` pontos com Largest-Triangle-Three-Buckets.
+    As médias de todos os baldes são calculadas de uma vez (somas
+    acumuladas); o laço percorre só os baldes, e cada um é avaliado com
+    operações vetorizadas. Retorna índices ordenados.
+    """
+    n = len(x)
+    if alvo >= n or alvo < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # alvo - 2 baldes para os pontos internos (o primeiro e o último são fixos)
+    limites = np.linspace(1, n - 1, alvo - 1).astype(np.int64)
+    inicio, fim = limites[:-1], limites[1:]
+
+    soma_x = np.concatenate([[0.0], np.cumsum(x)])
+    soma_y = np.concatenate([[0.0], np.cumsum(y)])
+    tamanho = np.maximum(fim - inicio, 1)
+    media_x = (soma_x[fim] - soma_x[inicio]) / tamanho
+    media_y = (soma_y[fim] - soma_y[inicio]) / tamanho
+    # O "próximo balde" do último balde é o último ponto
+    proximo_x = np.append(media_x[1:], x[-1])
+    proximo_y = np.append(media_y[1:], y[-1])
+
+    indices = np.empty(alvo, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for balde in range(alvo - 2):
+        a, b = inicio[balde], max(fim[balde], inicio[balde] + 1)
+        ax, ay = x[anterior], y[anterior]
+        area = np.abs((ax - proximo_x[balde]) * (y[a:b] - ay) - (ax - x[a:b]) * (proximo_y[balde] - ay))
+        anterior = a + int(np.argmax(area))
+        indices[balde + 1] = anterior
+
+    return indices
+
+
+def indices_reducao(x, y, alvo):
+    """
+    Escolhe os índices a plotar: LTTB, com pré-redução min/max quando a
+    série é muito maior que o alvo.
+    """
+    n = len(x)
+    if n <= alvo:
+        return np.arange(n)
+    if n > PRE_REDUCAO * alvo:
+        pre = indices_minmax(np.asarray(y, dtype=np.float64), PRE_REDUCAO * alvo // 2)
+        return pre[indices_lttb(np.asarray(x)[pre], np.asarray(y)[pre], alvo)]
+    return indices_lttb(x, y, alvo)
+
+
+def reduzir_serie(df, alvo=None, coluna_x='timestamp', coluna_y='price'):
+    """
+    Reduz um DataFrame de série temporal para no máximo `alvo` pontos.
+    Retorna o próprio df se já couber no alvo.
+    """
+    alvo = alvo or pontos_alvo()
+    if len(df) <= alvo:
+        return df
+    x = df[coluna_x].to_numpy(dtype='datetime64[ms]').astype(np.float64)
+    y = df[coluna_y].to_numpy(dtype=np.float64)
+    return df.iloc[indices_reducao(x, y, alvo)]
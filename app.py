@@ -1,10 +1,31 @@
 import streamlit as st
 import requests
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta
+import os
 import time
+import uuid
+from collections import deque
+from functools import wraps
+
+from alertas import ABAIXO, ACIMA, CRUZAMENTO, TIPOS_ALERTA, VARIACAO, obter_motor_alertas
+from amostragem import pontos_alvo
+from aquecimento import AquecedorHistorico
+from armazem_historico import INTERVALO_ATUALIZACAO, obter_armazem
+from cambio import COLUNAS_MONETARIAS, COLUNAS_SERIE, MOEDA_BASE, MOEDAS_EXIBICAO, TabelaCambio, converter
+from cliente_api import obter_cliente
+from cliente_servico import ClienteServicoDados, ProdutorServico
+from coletor_mercado import VELHICE_MAXIMA, ColetorMercado, ColunaAusenteError, idade_snapshot
+from fluxo_precos import CAPACIDADE_PONTOS, FluxoPrecos, anexar_pontos, criar_produtor
+from formatacao import (formatar_idade, formatar_numero, formatar_percentual, formatar_percentuais, formatar_preco,
+                        formatar_precos, montar_tabela_ranking, simbolo_moeda)
+from graficos import (cache_figuras, criar_grafico_barras, criar_grafico_distribuicao, criar_grafico_historico,
+                      criar_grafico_correlacao, criar_grafico_indicadores)
+from indicadores import Indicadores, IndicadoresMercado, IndicadoresSeries, ultimo_valor
+from metricas import iniciar_exportador, metricas
+from registro_caches import FIGURAS, HISTORICO, MERCADO, RegistroCaches
+from triagem import METRICAS_TRIAGEM, TriagemMercado
 
 # Configuração da página
 st.set_page_config(
@@ -23,93 +44,364 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Serviço de dados externo (python servico_dados.py). Sem ele, a coleta e o
+# histórico rodam no próprio processo do Streamlit.
+SERVICO_DADOS_URL = os.environ.get('SERVICO_DADOS_URL')
+
+# Intervalo dos fragmentos do modo ao vivo (segundos)
+INTERVALO_AO_VIVO = 3
+
+# Períodos do histórico longo (dias). A API pública só oferece até 1 ano.
+PERIODOS_LONGOS = {"90 Dias": 90, "1 Ano": 365}
+
+# Com METRICAS=1, serve GET /metricas (texto Prometheus) nesta porta
+METRICAS_PORTA = os.environ.get('METRICAS_PORTA')
+
+# Linhas exibidas na tabela de triagem e em cada lista de destaques
+LINHAS_TRIAGEM = 100
+LINHAS_DESTAQUES = 5
+
+# Opções de market cap mínimo da triagem (na moeda de exibição)
+MARKET_CAPS_MINIMOS = [0, 1e6, 1e7, 1e8, 1e9, 1e10]
+
 # ========== FUNÇÕES AUXILIARES ==========
 
-@st.cache_data(ttl=60)  # Cache por 60 segundos
-def buscar_dados_criptomoedas(numero_moedas=20):
+@st.cache_resource
+def obter_servico_dados():
     """
-    Busca dados das principais criptomoedas via API CoinGecko.
-    Retorna DataFrame com dados ou DataFrame vazio em caso de erro.
-    """
-    url = "https://api.coingecko.com/api/v3/coins/markets"
-    parametros = {
-        'vs_currency': 'usd',
-        'order': 'market_cap_desc',
-        'per_page': numero_moedas,
-        'page': 1,
-        'sparkline': 'true',
-        'price_change_percentage': '1h,24h,7d,30d'
-    }
+    Retorna o cliente do serviço de dados externo (SERVICO_DADOS_URL).
+    """
+    return ClienteServicoDados(SERVICO_DADOS_URL)
+
+
+@st.cache_resource
+def obter_aquecedor_historico():
+    """
+    Retorna o aquecedor de histórico compartilhado (pré-carrega o Top N).
+    """
+    if SERVICO_DADOS_URL:
+        return obter_servico_dados()
+    return AquecedorHistorico(obter_armazem()).iniciar()
+
+
+@st.cache_resource
+def obter_coletor_mercado():
+    """
+    Retorna o coletor de mercado compartilhado por todas as sessões do processo.
+    A cada snapshot, o histórico do Top N visível é pré-carregado e as regras
+    de alerta são avaliadas. Com SERVICO_DADOS_URL, a coleta (e a avaliação
+    dos alertas) fica a cargo do serviço de dados.
+    """
+    if SERVICO_DADOS_URL:
+        return obter_servico_dados()
+    coletor = ColetorMercado()
+    coletor.ao_publicar(obter_aquecedor_historico().notificar)
+    coletor.ao_publicar(obter_motor_alertas().notificar)
+    return coletor.iniciar()
+
+
+@st.cache_resource
+def obter_registro_caches():
+    """
+    Retorna o registro dos caches do processo, com as regiões mercado
+    (snapshot), historico (série por moeda) e figuras.
+    """
+    registro = RegistroCaches()
+    registro.registrar(MERCADO, lambda chave=None: obter_coletor_mercado().atualizar_agora())
+    if SERVICO_DADOS_URL:
+        registro.registrar(HISTORICO, obter_servico_dados().invalidar_historico)
+    else:
+        registro.registrar(HISTORICO, obter_armazem().invalidar)
+    registro.registrar(FIGURAS, cache_figuras.invalidar)
+    return registro
+
+
+@st.cache_resource
+def obter_fluxo_precos():
+    """
+    Retorna o fluxo de preços ao vivo compartilhado (modo streaming).
+    Com SERVICO_DADOS_URL, os ticks vêm do serviço de dados.
+    """
+    produtor = ProdutorServico(obter_servico_dados()) if SERVICO_DADOS_URL else criar_produtor()
+    return FluxoPrecos(produtor).iniciar()
+
+
+@st.cache_resource
+def obter_tabela_cambio():
+    """
+    Retorna a tabela de câmbio compartilhada (renovada a cada hora).
+    Com SERVICO_DADOS_URL, os fatores vêm do serviço de dados.
+    """
+    if SERVICO_DADOS_URL:
+        return TabelaCambio(obter_servico_dados().fatores_cambio)
+    return TabelaCambio()
+
+
+@st.cache_resource
+def obter_indicadores_mercado():
+    """
+    Retorna os indicadores dos sparklines de todas as moedas (um cálculo por snapshot).
+    """
+    return IndicadoresMercado()
+
+
+@st.cache_resource
+def obter_indicadores_series():
+    """
+    Retorna os indicadores das séries históricas (complementados a cada novo trecho).
+    """
+    return IndicadoresSeries()
+
+
+@st.cache_resource
+def obter_triagem_mercado():
+    """
+    Retorna a triagem de todas as moedas do snapshot (um cálculo por snapshot).
+    """
+    return TriagemMercado()
+
+
+@st.cache_resource
+def obter_metricas():
+    """
+    Retorna o registro de métricas do processo, com os coletores do cache de
+    figuras, do limitador e do single-flight (os dois últimos ficam no
+    serviço de dados, quando há um). Com METRICAS_PORTA, inicia o exportador.
+    """
+    metricas.registrar_coletor('figuras_cache', lambda: {'acertos': cache_figuras.acertos,
+                                                         'faltas': cache_figuras.faltas})
+    if not SERVICO_DADOS_URL:
+        metricas.registrar_coletor('limitador', lambda: obter_cliente().limitador.estatisticas())
+        metricas.registrar_coletor('api_voo', lambda: obter_cliente().voo.estatisticas())
+    if METRICAS_PORTA and metricas.ativas:
+        iniciar_exportador(int(METRICAS_PORTA))
+    return metricas
+
+
+def exibir_grafico(fig, etapa):
+    """
+    Envia a figura ao navegador, medindo a serialização na etapa informada.
+    """
+    with metricas.medir(etapa):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def exibir_tabela_triagem(df_triagem, simbolo, moeda, altura=None):
+    """
+    Exibe linhas de Triagem.tabela (valores monetários já em `moeda`) com
+    colunas numéricas, para a ordenação pelo cabeçalho seguir os valores.
+    """
+    df_exibicao = pd.DataFrame({
+        '#': df_triagem['market_cap_rank'],
+        'Nome': df_triagem['name'].astype(str) + ' (' + df_triagem['symbol'].astype(str).str.upper() + ')',
+        'Preço': df_triagem['current_price'],
+        **{METRICAS_TRIAGEM[coluna]: df_triagem[coluna] for coluna in METRICAS_TRIAGEM},
+    })
+    unidade = f" ({moeda.upper()})"
+    st.dataframe(
+        df_exibicao.rename(columns={'Market Cap': 'Market Cap' + unidade, 'Volume 24h': 'Volume 24h' + unidade}),
+        use_container_width=True,
+        height=altura,
+        hide_index=True,
+        column_config={
+            '#': st.column_config.NumberColumn(format="%d"),
+            'Preço': st.column_config.NumberColumn(format=simbolo + "%.6g"),
+            METRICAS_TRIAGEM['retorno_24h']: st.column_config.NumberColumn(format="%.2f%%"),
+            METRICAS_TRIAGEM['retorno_7d']: st.column_config.NumberColumn(format="%.2f%%"),
+            METRICAS_TRIAGEM['volatilidade']: st.column_config.NumberColumn(format="%.0f%%"),
+            METRICAS_TRIAGEM['correlacao_mercado']: st.column_config.NumberColumn(format="%.2f"),
+            'Market Cap' + unidade: st.column_config.NumberColumn(format="compact"),
+            'Volume 24h' + unidade: st.column_config.NumberColumn(format="compact"),
+        }
+    )
+
+
+def exibir_alertas(cripto_id, cripto_nome, preco, fator_cambio, simbolo, moeda):
+    """
+    Formulário e lista dos alertas do usuário. As regras são avaliadas no
+    servidor a cada coleta (alertas.py), não nesta sessão; limites de preço
+    são gravados em USD.
+    """
+    motor = obter_motor_alertas()
+    if SERVICO_DADOS_URL and 'ALERTAS_CAMINHO' not in os.environ:
+        # Réplica com arquivo local: o serviço de dados não enxerga estas regras
+        st.warning("⚠️ Alertas desta réplica não são avaliados: defina ALERTAS_CAMINHO "
+                   "com o mesmo arquivo usado pelo serviço de dados.")
+    if 'usuario_alertas' not in st.session_state:
+        st.session_state['usuario_alertas'] = uuid.uuid4().hex[:8]
+    usuario = st.text_input(
+        "Seu identificador",
+        key='usuario_alertas',
+        help="Use o mesmo identificador para ver seus alertas em outra sessão."
+    ).strip()
+    if not usuario:
+        st.info("Informe um identificador para criar alertas.")
+        return
+    
+    with st.form("novo_alerta"):
+        col_a1, col_a2 = st.columns(2)
+        tipo = col_a1.selectbox("Condição", options=list(TIPOS_ALERTA), format_func=TIPOS_ALERTA.get)
+        limite = col_a2.number_input(
+            f"Limite (preço em {moeda.upper()}, % ou horas)",
+            min_value=0.0,
+            value=float(preco) if pd.notna(preco) else 0.0,
+            format="%.8g"
+        )
+        if st.form_submit_button(f"🔔 Criar alerta para {cripto_nome}"):
+            try:
+                limite_usd = limite / fator_cambio if tipo in (ACIMA, ABAIXO) else limite
+                motor.adicionar(usuario, cripto_id, tipo, limite_usd)
+                st.success("Alerta criado. Ele será avaliado a cada nova coleta do mercado.")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+    
+    df_regras = motor.regras(usuario)
+    if df_regras.empty:
+        st.caption("Nenhum alerta cadastrado.")
+        return
+    
+    precos = df_regras['tipo'].isin([ACIMA, ABAIXO])
+    st.dataframe(
+        pd.DataFrame({
+            'Alerta': df_regras['id'],
+            'Moeda': df_regras['cripto_id'],
+            'Condição': df_regras['tipo'].map(TIPOS_ALERTA),
+            'Limite': np.where(precos, formatar_precos(df_regras['limite'] * fator_cambio, simbolo),
+                               df_regras['limite'].map('{:g}'.format)
+                               + df_regras['tipo'].map({VARIACAO: '%', CRUZAMENTO: ' h'}).fillna('')),
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    col_r1, col_r2 = st.columns([3, 1])
+    regra_id = col_r1.selectbox("Alerta", options=df_regras['id'].tolist(), label_visibility="collapsed")
+    # Remove no callback: a seção é reexecutada já sem a regra
+    col_r2.button("🗑️ Remover", use_container_width=True, on_click=motor.remover, args=(regra_id, usuario))
+    
+    df_disparos = motor.disparos(usuario)
+    if not df_disparos.empty:
+        st.markdown("**Últimos alertas disparados**")
+        precos = df_disparos['tipo'] != VARIACAO
+        st.dataframe(
+            pd.DataFrame({
+                'Quando': pd.to_datetime(df_disparos['instante'], unit='s').dt.strftime('%d/%m %H:%M'),
+                'Moeda': df_disparos['cripto_id'],
+                'Condição': df_disparos['tipo'].map(TIPOS_ALERTA),
+                'Valor': np.where(precos, formatar_precos(df_disparos['valor'] * fator_cambio, simbolo),
+                                  formatar_percentuais(df_disparos['valor'])),
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+    if motor.erro is not None:
+        st.warning(f"⚠️ Falha na última avaliação dos alertas ({type(motor.erro).__name__}).")
+
+
+@st.fragment(run_every=INTERVALO_AO_VIVO)
+def exibir_preco_ao_vivo(cripto_id, preco_snapshot, fator_cambio, simbolo):
+    """
+    Card de preço atual alimentado pelo fluxo ao vivo. Roda sozinho a cada
+    INTERVALO_AO_VIVO segundos, sem rerun da página. Os ticks chegam em USD
+    e são convertidos com `fator_cambio`; `preco_snapshot` já vem convertido.
+    """
+    fluxo = obter_fluxo_precos()
+    fluxo.registrar_visiveis([cripto_id])
+    tick = fluxo.ultimo(cripto_id)
     
-    try:
-        resposta = requests.get(url, params=parametros, timeout=10)
-        resposta.raise_for_status()
-        dados = resposta.json()
-        
-        if not dados:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(dados)
-        
-        # Verificar se colunas essenciais existem
-        colunas_necessarias = ['id', 'symbol', 'name', 'current_price', 'market_cap', 
-                               'total_volume', 'price_change_percentage_24h']
-        
-        for col in colunas_necessarias:
-            if col not in df.columns:
-                st.warning(f"Coluna '{col}' não encontrada nos dados da API")
-                return pd.DataFrame()
-        
-        return df
-        
-    except requests.exceptions.Timeout:
+    if tick is None:
+        st.metric("Preço Atual", formatar_preco(preco_snapshot, simbolo))
+        return
+    
+    preco = tick.preco * fator_cambio
+    variacao = (preco / preco_snapshot - 1) * 100 if preco_snapshot else None
+    st.metric(
+        "Preço Atual ⚡",
+        formatar_preco(preco, simbolo),
+        delta=formatar_percentual(variacao) if variacao is not None else None,
+        help=f"Ao vivo às {datetime.fromtimestamp(tick.instante).strftime('%H:%M:%S')}; variação desde a última coleta"
+    )
+
+
+@st.fragment(run_every=INTERVALO_AO_VIVO)
+def exibir_grafico_ao_vivo(cripto_id, titulo, df_base, fator_cambio, moeda):
+    """
+    Gráfico de 7 dias com os pontos ao vivo anexados ao fim da série.
+    A cada execução, só os pontos que chegaram desde a anterior são lidos
+    do fluxo; a sessão guarda no máximo CAPACIDADE_PONTOS pontos (em USD,
+    convertidos só na exibição).
+    """
+    fluxo = obter_fluxo_precos()
+    fluxo.registrar_visiveis([cripto_id])
+    
+    fim_base = df_base['timestamp'].iloc[-1] if not df_base.empty else None
+    estado = st.session_state.get('ao_vivo')
+    if estado is None or estado['cripto_id'] != cripto_id or estado['fim_base'] != fim_base:
+        # Outra moeda ou novo snapshot: recomeça a partir do que o buffer já tem
+        estado = {'cripto_id': cripto_id, 'fim_base': fim_base, 'cursor': 0,
+                  'pontos': deque(maxlen=CAPACIDADE_PONTOS)}
+        st.session_state['ao_vivo'] = estado
+    
+    novos, estado['cursor'] = fluxo.ler(cripto_id, estado['cursor'])
+    anexar_pontos(estado['pontos'], novos)
+    
+    pontos = [(datetime.fromtimestamp(instante), preco * fator_cambio) for instante, preco in estado['pontos']]
+    if fim_base is not None:
+        pontos = [(momento, preco) for momento, preco in pontos if momento > fim_base]
+    df_ao_vivo = pd.DataFrame(pontos, columns=['timestamp', 'price'])
+    df_grafico = pd.concat([df_base, df_ao_vivo], ignore_index=True) if pontos else df_base
+    
+    with metricas.medir('grafico_historico'):
+        fig = criar_grafico_historico(df_grafico, titulo, moeda=moeda)
+    if fig:
+        exibir_grafico(fig, 'envio_ao_vivo')
+        st.caption(f"⚡ Ao vivo: {len(pontos)} pontos desde a última coleta")
+    if fluxo.erro is not None:
+        st.caption(f"⚠️ Fluxo ao vivo indisponível no momento ({type(fluxo.erro).__name__})")
+
+
+def buscar_dados_criptomoedas(numero_moedas=20):
+    """
+    Retorna as principais criptomoedas a partir do snapshot compartilhado.
+    Retorna tupla (Top N, snapshot completo); DataFrames vazios em caso de erro.
+    """
+    obter_aquecedor_historico().registrar_visiveis(numero_moedas)
+    snapshot = obter_coletor_mercado().aguardar_snapshot()
+    erro = snapshot.erro
+    idade = idade_snapshot(snapshot)
+    
+    if erro is not None and not snapshot.df.empty:
+        # Falha na última coleta: segue exibindo os últimos dados válidos
+        st.warning(f"⚠️ Falha ao atualizar os dados ({type(erro).__name__}). "
+                   f"Exibindo a última coleta válida, de {formatar_idade(idade)} atrás.")
+    elif idade is not None and idade > VELHICE_MAXIMA:
+        st.warning(f"⚠️ Os dados de mercado são de {formatar_idade(idade)} atrás. A coleta segue em segundo plano.")
+    elif isinstance(erro, ColunaAusenteError):
+        st.warning(f"Coluna '{erro}' não encontrada nos dados da API")
+    elif isinstance(erro, requests.exceptions.Timeout):
         st.error("⏱️ Timeout: A API demorou muito para responder. Tente novamente.")
-        return pd.DataFrame()
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Erro na requisição: {str(e)}")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"❌ Erro inesperado ao buscar dados: {str(e)}")
-        return pd.DataFrame()
+    elif isinstance(erro, requests.exceptions.RequestException):
+        st.error(f"❌ Erro na requisição: {str(erro)}")
+    elif erro is not None:
+        st.error(f"❌ Erro inesperado ao buscar dados: {str(erro)}")
+    
+    return snapshot.df.head(numero_moedas), snapshot
 
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos (300 segundos)
-def buscar_dados_historicos(cripto_id, dias=30):
+def buscar_dados_historicos(cripto_id, dias=30, janela=None):
     """
     Busca dados históricos de preço de uma criptomoeda específica.
     Retorna DataFrame com timestamp e price ou DataFrame vazio.
-    Cache de 5 minutos para evitar excesso de requisições.
+    Os pontos ficam gravados em disco; a API só é consultada para o trecho
+    que falta (no máximo a cada 5 minutos por moeda). Com `janela`
+    (inicio_ms, fim_ms), retorna só essa janela, na resolução mais fina
+    disponível para ela.
     """
-    url = f"https://api.coingecko.com/api/v3/coins/{cripto_id}/market_chart"
-    parametros = {
-        'vs_currency': 'usd',
-        'days': dias,
-        'interval': 'daily' if dias > 1 else 'hourly'
-    }
-    
     try:
-        # Adicionar delay pequeno para evitar rate limit
-        time.sleep(0.5)
-        
-        resposta = requests.get(url, params=parametros, timeout=15)
-        
-        # Tratamento específico para erro 429 (Rate Limit)
-        if resposta.status_code == 429:
-            st.error("⚠️ **Limite de requisições da API atingido.** Os dados históricos estão temporariamente indisponíveis. Aguarde alguns minutos antes de atualizar novamente.")
-            return pd.DataFrame()
-        
-        resposta.raise_for_status()
-        dados = resposta.json()
-        
-        if 'prices' not in dados or not dados['prices']:
-            return pd.DataFrame()
-        
-        # Converter para DataFrame
-        precos = dados['prices']
-        df = pd.DataFrame(precos, columns=['timestamp', 'price'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        return df
+        fonte = obter_servico_dados() if SERVICO_DADOS_URL else obter_armazem()
+        with metricas.medir('historico'):
+            if janela is not None:
+                return fonte.obter_janela(cripto_id, *janela)
+            return fonte.obter(cripto_id, dias)
         
     except requests.exceptions.Timeout:
         st.warning("⏱️ Timeout ao buscar dados históricos. Tente novamente em alguns instantes.")
@@ -128,197 +420,56 @@ def buscar_dados_historicos(cripto_id, dias=30):
         return pd.DataFrame()
 
 
-def formatar_numero(numero):
+def exibir_idade_historico(df_historico):
     """
-    Formata números grandes para notação simplificada (K, M, B, T).
-    Retorna string formatada.
+    Indica quando o histórico exibido não está fresco (servido do disco
+    enquanto é complementado, ou após uma falha no complemento).
     """
-    if pd.isna(numero) or numero is None:
-        return "N/A"
-    
-    try:
-        numero = float(numero)
-        
-        if numero >= 1e12:
-            return f"${numero/1e12:.2f}T"
-        elif numero >= 1e9:
-            return f"${numero/1e9:.2f}B"
-        elif numero >= 1e6:
-            return f"${numero/1e6:.2f}M"
-        elif numero >= 1e3:
-            return f"${numero/1e3:.2f}K"
-        else:
-            return f"${numero:.2f}"
-    except (ValueError, TypeError):
-        return "N/A"
+    idade = df_historico.attrs.get('idade')
+    if idade is not None and idade > INTERVALO_ATUALIZACAO:
+        st.caption(f"🕒 Histórico de {formatar_idade(idade)} atrás · atualizando em segundo plano")
 
 
-def formatar_preco(preco):
+def secao(etapa, run_every=None):
     """
-    Formata o preço com a quantidade adequada de casas decimais.
-    Retorna string formatada.
+    Decorador das seções da página: fragmento do Streamlit (uma interação
+    dentro da seção reexecuta só ela, não a página) com o tempo de cada
+    execução registrado na etapa `etapa`.
     """
-    if pd.isna(preco) or preco is None:
-        return "N/A"
-    
-    try:
-        preco = float(preco)
-        
-        if preco >= 1:
-            return f"${preco:,.2f}"
-        elif preco >= 0.01:
-            return f"${preco:.4f}"
-        else:
-            return f"${preco:.8f}"
-    except (ValueError, TypeError):
-        return "N/A"
+    def decorar(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            with metricas.medir(etapa):
+                return funcao(*args, **kwargs)
+        return st.fragment(medida, run_every=run_every)
+    return decorar
 
 
-def formatar_percentual(valor):
+def obter_cambio(moeda, avisar=True):
     """
-    Formata valores percentuais com 2 casas decimais.
-    Retorna string formatada ou N/A.
+    Retorna tupla (moeda, fator a partir de USD, símbolo). Sem a tabela de
+    câmbio, volta para USD (com aviso, se `avisar`).
     """
-    if pd.isna(valor) or valor is None:
-        return "N/A"
-    
     try:
-        valor = float(valor)
-        return f"{valor:.2f}%"
-    except (ValueError, TypeError):
-        return "N/A"
-
-
-def obter_emoji_variacao(valor):
-    """
-    Retorna emoji baseado na variação do preço.
-    🟢 para positivo, 🔴 para negativo, ⚪ para neutro/N/A.
-    """
-    if pd.isna(valor) or valor is None:
-        return "⚪"
-    
-    try:
-        valor = float(valor)
-        return "🟢" if valor > 0 else "🔴" if valor < 0 else "⚪"
-    except (ValueError, TypeError):
-        return "⚪"
-
-
-def criar_grafico_historico(df_historico, titulo):
-    """
-    Cria gráfico de linha com os dados históricos.
-    Retorna figure do Plotly.
-    """
-    if df_historico.empty or 'timestamp' not in df_historico.columns or 'price' not in df_historico.columns:
-        return None
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=df_historico['timestamp'],
-        y=df_historico['price'],
-        mode='lines',
-        name='Preço',
-        line=dict(color='#00d4ff', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(0, 212, 255, 0.1)',
-        hovertemplate='<b>Data:</b> %{x|%d/%m/%Y %H:%M}<br><b>Preço:</b> $%{y:.2f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        title=titulo,
-        xaxis_title="Data",
-        yaxis_title="Preço (USD)",
-        hovermode='x unified',
-        template='plotly_dark',
-        height=400,
-        paper_bgcolor='rgba(0,0,0,0.3)',
-        plot_bgcolor='rgba(0,0,0,0.3)',
-        font=dict(color='white')
-    )
-    
-    return fig
-
-
-def criar_grafico_distribuicao(df):
-    """
-    Cria gráfico de pizza com distribuição de market cap (Top 10).
-    Retorna figure do Plotly.
-    """
-    if df.empty or 'market_cap' not in df.columns or 'name' not in df.columns:
-        return None
-    
-    # Top 10 para o gráfico
-    df_top = df.head(10).copy()
-    
-    # Remover valores nulos
-    df_top = df_top[df_top['market_cap'].notna()]
-    
-    if df_top.empty:
-        return None
-    
-    fig = px.pie(
-        df_top,
-        values='market_cap',
-        names='name',
-        title='Distribuição de Market Cap (Top 10)',
-        hole=0.4,
-        color_discrete_sequence=px.colors.sequential.Plasma
-    )
-    
-    fig.update_traces(
-        textposition='inside',
-        textinfo='percent+label',
-        hovertemplate='<b>%{label}</b><br>Market Cap: $%{value:,.0f}<br>Percentual: %{percent}<extra></extra>'
-    )
-    
-    fig.update_layout(
-        template='plotly_dark',
-        paper_bgcolor='rgba(0,0,0,0.3)',
-        height=400,
-        font=dict(color='white')
-    )
-    
-    return fig
+        fator_cambio = obter_tabela_cambio().fator(moeda)
+    except Exception as e:
+        if avisar:
+            st.warning(f"⚠️ Câmbio indisponível no momento ({type(e).__name__}). Exibindo valores em USD.")
+        moeda, fator_cambio = MOEDA_BASE, 1.0
+    return moeda, fator_cambio, simbolo_moeda(moeda)
 
 
-def criar_grafico_barras(df):
+def renovar_mercado_se_vencido(intervalo):
     """
-    Cria gráfico de barras com Top 10 por Market Cap.
-    Retorna figure do Plotly.
+    Na execução do temporizador da seção de mercado: se nenhuma coleta nova
+    chegou desde a última exibição, força uma (os demais caches são preservados).
     """
-    if df.empty or 'market_cap' not in df.columns or 'name' not in df.columns:
-        return None
-    
-    df_top10 = df.head(10).copy()
-    df_top10 = df_top10[df_top10['market_cap'].notna()]
-    
-    if df_top10.empty:
-        return None
-    
-    # Verificar se a coluna de variação existe
-    color_col = 'price_change_percentage_24h' if 'price_change_percentage_24h' in df_top10.columns else None
-    
-    fig = px.bar(
-        df_top10,
-        x='name',
-        y='market_cap',
-        title='Top 10 Criptomoedas por Market Cap',
-        labels={'market_cap': 'Market Cap (USD)', 'name': 'Criptomoeda'},
-        color=color_col,
-        color_continuous_scale=['red', 'yellow', 'green'],
-        hover_data={'market_cap': ':,.0f'}
-    )
-    
-    fig.update_layout(
-        template='plotly_dark',
-        paper_bgcolor='rgba(0,0,0,0.3)',
-        height=400,
-        xaxis_tickangle=-45,
-        font=dict(color='white')
-    )
-    
-    return fig
+    exibido_em = st.session_state.get('mercado_exibido_em')
+    if exibido_em is None or time.monotonic() - exibido_em < intervalo - 1:
+        return
+    coletor = obter_coletor_mercado()
+    if coletor.snapshot().atualizado_em == st.session_state.get('mercado_atualizado_em'):
+        coletor.atualizar_agora()
 
 
 # ========== INTERFACE PRINCIPAL ==========
@@ -343,6 +494,9 @@ with st.expander("ℹ️ Informações Importantes sobre a API", expanded=False)
 
 st.markdown("---")
 
+inicio_pagina = time.perf_counter()
+obter_metricas()
+
 # Sidebar - Configurações
 with st.sidebar:
     st.header("⚙️ Configurações")
@@ -355,8 +509,22 @@ with st.sidebar:
         step=5
     )
     
+    moeda = st.selectbox(
+        "💱 Moeda",
+        options=list(MOEDAS_EXIBICAO),
+        format_func=MOEDAS_EXIBICAO.get,
+        key="moeda",
+        help="Convertida localmente a partir dos dados em USD, sem novas consultas à API."
+    )
+    
     auto_atualizar = st.checkbox("Atualização automática", value=True)
     
+    ao_vivo = st.toggle(
+        "⚡ Preços ao vivo",
+        value=False,
+        help="Atualiza o preço e o gráfico de 7 dias da moeda selecionada a cada poucos segundos, sem recarregar a página."
+    )
+    
     if auto_atualizar:
         intervalo = st.slider(
             "Intervalo de atualização (segundos)",
@@ -371,238 +539,444 @@ with st.sidebar:
     
     st.warning("⚠️ **Importante:** A API gratuita do CoinGecko tem limites de requisições. Se os gráficos não carregarem, aguarde 1-2 minutos.")
     
+    # Fila do limitador de requisições (compartilhado por todas as sessões)
+    if SERVICO_DADOS_URL:
+        estatisticas_api = obter_servico_dados().estatisticas_limitador()
+    else:
+        estatisticas_api = obter_cliente().limitador.estatisticas()
+    st.caption(
+        f"📡 Fila da API: {estatisticas_api['fila']} | "
+        f"Espera média: {estatisticas_api['espera_media']:.1f}s | "
+        f"Máxima: {estatisticas_api['espera_maxima']:.1f}s"
+    )
+    
+    # Painel de depuração (só com METRICAS=1): valores acumulados no processo
+    if metricas.ativas:
+        with st.expander("🐞 Métricas de desempenho"):
+            resumo = metricas.resumo()
+            if resumo['etapas']:
+                st.dataframe(pd.DataFrame(resumo['etapas']).T.round(2), use_container_width=True)
+            st.json({'contadores': resumo['contadores'], 'coletados': resumo['coletados']}, expanded=False)
+    
     # Botão de atualização manual
+    # Renova só o snapshot de mercado e o histórico da moeda em análise
     if st.button("🔄 Atualizar Agora", use_container_width=True):
-        st.cache_data.clear()
+        registro = obter_registro_caches()
+        cripto_em_analise = st.session_state.get('cripto_id_selecionada')
+        if cripto_em_analise:
+            registro.invalidar(HISTORICO, cripto_em_analise)
+        registro.invalidar(MERCADO)
         st.rerun()
 
-# Buscar dados
-with st.spinner("🔍 Buscando dados das criptomoedas..."):
-    df = buscar_dados_criptomoedas(numero_moedas)
-
-if df.empty:
-    st.error("❌ Não foi possível carregar os dados. Verifique sua conexão e tente novamente.")
-    st.stop()
-
-# Última atualização
-col_update1, col_update2 = st.columns([3, 1])
-with col_update1:
-    st.caption(f"🕐 Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-with col_update2:
-    if auto_atualizar:
-        st.caption(f"⏱️ Próxima em: {intervalo}s")
+# ========== SEÇÕES DA PÁGINA ==========
+# Cada seção é um fragmento: interações dentro dela reexecutam só a própria
+# seção. O temporizador da atualização automática reexecuta só a seção de
+# mercado; a análise detalhada lê o snapshot quando o usuário interage e tem
+# seus próprios fragmentos ao vivo para preço e gráfico.
 
-# ========== MÉTRICAS PRINCIPAIS ==========
-st.subheader("📊 Visão Geral do Mercado")
-
-col1, col2, col3, col4 = st.columns(4)
+@secao('secao_triagem')
+def secao_triagem(triagem, fator_cambio, simbolo, moeda):
+    """
+    Filtros e tabela da triagem (reexecutados sozinhos a cada mudança de filtro).
+    """
+    col_f1, col_f2, col_f3 = st.columns(3)
+    with col_f1:
+        market_cap_minimo = st.select_slider(
+            "Market cap mínimo",
+            options=MARKET_CAPS_MINIMOS,
+            value=0,
+            format_func=lambda valor: formatar_numero(valor, simbolo) if valor else "Sem mínimo"
+        )
+    with col_f2:
+        volatilidade_faixa = st.slider("Volatilidade anualizada (%)", min_value=0, max_value=300, value=(0, 300),
+                                       help="Nos extremos, a faixa fica aberta.")
+    with col_f3:
+        retorno_faixa = st.slider("Retorno 7d (%)", min_value=-50, max_value=50, value=(-50, 50),
+                                  help="Nos extremos, a faixa fica aberta.")
+    col_o1, col_o2 = st.columns([3, 1])
+    with col_o1:
+        ordenar_por = st.selectbox("Ordenar por", options=list(METRICAS_TRIAGEM), index=list(METRICAS_TRIAGEM).index('market_cap'),
+                                   format_func=METRICAS_TRIAGEM.get)
+    with col_o2:
+        crescente = st.checkbox("Ordem crescente", value=False)
+    
+    # Faixas abertas nos extremos dos sliders; market cap convertido de volta para USD
+    faixas = {
+        'market_cap': (market_cap_minimo / fator_cambio if market_cap_minimo else None, None),
+        'volatilidade': (volatilidade_faixa[0] or None, volatilidade_faixa[1] if volatilidade_faixa[1] < 300 else None),
+        'retorno_7d': (retorno_faixa[0] if retorno_faixa[0] > -50 else None,
+                       retorno_faixa[1] if retorno_faixa[1] < 50 else None),
+    }
+    with metricas.medir('filtro_triagem'):
+        linhas = triagem.ordenar(triagem.filtrar(faixas), ordenar_por, decrescente=not crescente)
+    st.caption(f"{len(linhas)} de {len(triagem)} moedas atendem aos filtros"
+               + (f" (exibindo as {LINHAS_TRIAGEM} primeiras)" if len(linhas) > LINHAS_TRIAGEM else ""))
+    exibir_tabela_triagem(converter(triagem.tabela(linhas[:LINHAS_TRIAGEM]), fator_cambio, COLUNAS_MONETARIAS),
+                          simbolo, moeda, altura=400)
 
-with col1:
-    market_cap_total = df['market_cap'].sum() if 'market_cap' in df.columns else 0
-    st.metric(
-        label="Market Cap Total",
-        value=formatar_numero(market_cap_total)
-    )
 
-with col2:
-    volume_total = df['total_volume'].sum() if 'total_volume' in df.columns else 0
-    st.metric(
-        label="Volume 24h Total",
-        value=formatar_numero(volume_total)
+@secao('secao_mercado', run_every=intervalo if auto_atualizar else None)
+def secao_mercado(numero_moedas, moeda_escolhida, intervalo):
+    """
+    Visão geral, gráficos, ranking, triagem e correlação do snapshot atual.
+    """
+    if intervalo:
+        renovar_mercado_se_vencido(intervalo)
+    
+    # Buscar dados
+    with st.spinner("🔍 Buscando dados das criptomoedas..."):
+        with metricas.medir('mercado'):
+            df, snapshot = buscar_dados_criptomoedas(numero_moedas)
+        atualizado_em = snapshot.atualizado_em
+    st.session_state['mercado_exibido_em'] = time.monotonic()
+    st.session_state['mercado_atualizado_em'] = atualizado_em
+    
+    if df.empty:
+        st.error("❌ Não foi possível carregar os dados. Verifique sua conexão e tente novamente.")
+        st.stop()
+    
+    # Conversão local: o snapshot fica em USD; só a fatia exibida é convertida
+    moeda, fator_cambio, simbolo = obter_cambio(moeda_escolhida)
+    df = converter(df, fator_cambio, COLUNAS_MONETARIAS)
+    
+    # Última atualização
+    col_update1, col_update2 = st.columns([3, 1])
+    with col_update1:
+        st.caption(
+            f"🕐 Última atualização: {atualizado_em.strftime('%d/%m/%Y %H:%M:%S')} "
+            f"(dados de {formatar_idade(idade_snapshot(snapshot))} atrás)"
+        )
+    with col_update2:
+        if intervalo:
+            proxima = datetime.fromtimestamp(time.time() + intervalo)
+            st.caption(f"⏱️ Próxima às {proxima.strftime('%H:%M:%S')}")
+    
+    # ========== MÉTRICAS PRINCIPAIS ==========
+    st.subheader("📊 Visão Geral do Mercado")
+    # Agregados mantidos de forma incremental pelo coletor (só moedas alteradas)
+    agregados = snapshot.agregados
+    mudancas = snapshot.mudancas
+    st.caption(
+        f"Métricas calculadas sobre as {agregados.moedas} criptomoedas acompanhadas · "
+        f"última coleta: {len(mudancas.alteradas)} alteradas, {len(mudancas.entraram)} entraram, "
+        f"{len(mudancas.sairam)} saíram"
     )
-
-with col3:
-    # Dominância do Bitcoin
-    if 'symbol' in df.columns and 'market_cap' in df.columns:
-        btc_row = df[df['symbol'].str.lower() == 'btc']
-        if not btc_row.empty and market_cap_total > 0:
-            btc_dominance = (btc_row.iloc[0]['market_cap'] / market_cap_total * 100)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            label="Market Cap Total",
+            value=formatar_numero(agregados.market_cap_total * fator_cambio, simbolo)
+        )
+    
+    with col2:
+        st.metric(
+            label="Volume 24h Total",
+            value=formatar_numero(agregados.volume_total * fator_cambio, simbolo)
+        )
+    
+    with col3:
+        # Dominância do Bitcoin
+        if agregados.dominancia_btc is not None:
             st.metric(
                 label="Dominância BTC",
-                value=f"{btc_dominance:.2f}%"
+                value=f"{agregados.dominancia_btc:.2f}%"
             )
         else:
             st.metric(label="Dominância BTC", value="N/A")
-    else:
-        st.metric(label="Dominância BTC", value="N/A")
-
-with col4:
-    # Média de variação 24h
-    if 'price_change_percentage_24h' in df.columns:
-        media_variacao = df['price_change_percentage_24h'].mean()
-        st.metric(
-            label="Variação Média 24h",
-            value=formatar_percentual(media_variacao),
-            delta=formatar_percentual(media_variacao)
-        )
-    else:
-        st.metric(label="Variação Média 24h", value="N/A")
-
-st.markdown("---")
-
-# ========== GRÁFICOS DE ANÁLISE ==========
-st.subheader("📈 Análise Visual")
-
-col_g1, col_g2 = st.columns(2)
-
-with col_g1:
-    # Gráfico de barras - Top 10 por Market Cap
-    fig_bar = criar_grafico_barras(df)
-    if fig_bar:
-        st.plotly_chart(fig_bar, use_container_width=True)
-    else:
-        st.warning("Não foi possível criar o gráfico de barras.")
-
-with col_g2:
-    # Gráfico de pizza - Distribuição
-    fig_pie = criar_grafico_distribuicao(df)
-    if fig_pie:
-        st.plotly_chart(fig_pie, use_container_width=True)
-    else:
-        st.warning("Não foi possível criar o gráfico de distribuição.")
-
-st.markdown("---")
-
-# ========== TABELA DE CRIPTOMOEDAS ==========
-st.subheader("💰 Ranking de Criptomoedas")
-
-# Preparar DataFrame para exibição
-df_tabela = pd.DataFrame()
-
-if not df.empty:
-    df_tabela['#'] = df['market_cap_rank'].fillna(0).astype(int)
-    df_tabela['Nome'] = df['name'] + ' (' + df['symbol'].str.upper() + ')'
-    df_tabela['Preço'] = df['current_price'].apply(formatar_preco)
     
-    # Variações com emojis
-    if 'price_change_percentage_1h_in_currency' in df.columns:
-        df_tabela['1h'] = df.apply(
-            lambda x: f"{obter_emoji_variacao(x['price_change_percentage_1h_in_currency'])} {formatar_percentual(x['price_change_percentage_1h_in_currency'])}", 
-            axis=1
-        )
+    with col4:
+        # Média de variação 24h
+        if agregados.media_variacao_24h is not None:
+            media_variacao = agregados.media_variacao_24h
+            st.metric(
+                label="Variação Média 24h",
+                value=formatar_percentual(media_variacao),
+                delta=formatar_percentual(media_variacao)
+            )
+        else:
+            st.metric(label="Variação Média 24h", value="N/A")
     
-    if 'price_change_percentage_24h' in df.columns:
-        df_tabela['24h'] = df.apply(
-            lambda x: f"{obter_emoji_variacao(x['price_change_percentage_24h'])} {formatar_percentual(x['price_change_percentage_24h'])}", 
-            axis=1
-        )
+    st.markdown("---")
     
-    if 'price_change_percentage_7d_in_currency' in df.columns:
-        df_tabela['7d'] = df.apply(
-            lambda x: f"{obter_emoji_variacao(x['price_change_percentage_7d_in_currency'])} {formatar_percentual(x['price_change_percentage_7d_in_currency'])}", 
-            axis=1
-        )
+    # ========== GRÁFICOS DE ANÁLISE ==========
+    st.subheader("📈 Análise Visual")
     
-    df_tabela['Volume 24h'] = df['total_volume'].apply(formatar_numero)
-    df_tabela['Market Cap'] = df['market_cap'].apply(formatar_numero)
-
-# Exibir tabela
-st.dataframe(
-    df_tabela,
-    use_container_width=True,
-    height=600,
-    hide_index=True
-)
-
-st.markdown("---")
-
-# ========== DETALHES DA CRIPTOMOEDA SELECIONADA ==========
-st.subheader("🔍 Análise Detalhada")
-
-# Seletor de criptomoeda
-if 'name' in df.columns and not df.empty:
-    cripto_selecionada = st.selectbox(
-        "Selecione uma criptomoeda para ver detalhes:",
-        options=df['name'].tolist(),
-        index=0
-    )
+    col_g1, col_g2 = st.columns(2)
     
-    # Buscar linha da criptomoeda selecionada
-    info_row = df[df['name'] == cripto_selecionada].iloc[0]
-    cripto_id = info_row['id']
+    with col_g1:
+        # Gráfico de barras - Top 10 por Market Cap
+        with metricas.medir('grafico_barras'):
+            fig_bar = criar_grafico_barras(df, moeda)
+        if fig_bar:
+            exibir_grafico(fig_bar, 'envio_barras')
+        else:
+            st.warning("Não foi possível criar o gráfico de barras.")
+    
+    with col_g2:
+        # Gráfico de pizza - Distribuição
+        with metricas.medir('grafico_distribuicao'):
+            fig_pie = criar_grafico_distribuicao(df, moeda)
+        if fig_pie:
+            exibir_grafico(fig_pie, 'envio_distribuicao')
+        else:
+            st.warning("Não foi possível criar o gráfico de distribuição.")
     
-    # Informações em cards
-    col_info1, col_info2, col_info3 = st.columns(3)
+    st.markdown("---")
     
-    with col_info1:
-        st.metric("Preço Atual", formatar_preco(info_row.get('current_price')))
-        st.metric("Preço Máximo 24h", formatar_preco(info_row.get('high_24h')))
-        st.metric("Preço Mínimo 24h", formatar_preco(info_row.get('low_24h')))
+    # ========== TABELA DE CRIPTOMOEDAS ==========
+    st.subheader("💰 Ranking de Criptomoedas")
     
-    with col_info2:
-        st.metric("Market Cap", formatar_numero(info_row.get('market_cap')))
-        st.metric("Volume 24h", formatar_numero(info_row.get('total_volume')))
-        rank = info_row.get('market_cap_rank')
-        st.metric("Market Cap Rank", f"#{int(rank)}" if pd.notna(rank) else "N/A")
+    # Preparar DataFrame para exibição (formatação vetorizada)
+    with metricas.medir('tabela'):
+        df_tabela = montar_tabela_ranking(df, simbolo)
     
-    with col_info3:
-        var_1h = info_row.get('price_change_percentage_1h_in_currency')
-        st.metric("Variação 1h", formatar_percentual(var_1h), delta=formatar_percentual(var_1h))
-        
-        var_24h = info_row.get('price_change_percentage_24h')
-        st.metric("Variação 24h", formatar_percentual(var_24h), delta=formatar_percentual(var_24h))
-        
-        var_7d = info_row.get('price_change_percentage_7d_in_currency')
-        st.metric("Variação 7d", formatar_percentual(var_7d), delta=formatar_percentual(var_7d))
+    # Exibir tabela
+    with metricas.medir('envio_tabela'):
+        st.dataframe(
+            df_tabela,
+            use_container_width=True,
+            height=600,
+            hide_index=True
+        )
     
     st.markdown("---")
     
-    # Gráficos históricos em tabs
-    tab1, tab2 = st.tabs(["📅 Últimos 7 Dias", "📅 Últimos 30 Dias"])
+    # ========== TRIAGEM E CORRELAÇÃO ==========
+    st.subheader("🧮 Triagem e Correlação")
     
-    with tab1:
-        # Tentar usar dados de sparkline primeiro (já disponíveis, sem nova requisição)
-        if 'sparkline_in_7d' in info_row and info_row['sparkline_in_7d'] and isinstance(info_row['sparkline_in_7d'], dict):
-            sparkline_prices = info_row['sparkline_in_7d'].get('price', [])
-            if sparkline_prices and len(sparkline_prices) > 0:
+    # Calculadas uma vez por coleta sobre os sparklines de todas as moedas do snapshot
+    with metricas.medir('triagem'):
+        triagem = obter_triagem_mercado().obter(snapshot)
+    st.caption(f"Retornos horários dos últimos 7 dias de {len(triagem)} moedas (métricas calculadas em USD).")
+    
+    tab_correlacao, tab_triagem, tab_destaques = st.tabs(["🔥 Correlação", "🔎 Triagem", "🚀 Destaques"])
+    
+    with tab_correlacao:
+        # Top N da página (primeiras linhas do snapshot, por market cap)
+        linhas_top = np.arange(min(len(df), len(triagem)))
+        with metricas.medir('grafico_correlacao'):
+            fig_correlacao = criar_grafico_correlacao(triagem.correlacao_entre(linhas_top), df['name'].iloc[linhas_top])
+        if fig_correlacao:
+            exibir_grafico(fig_correlacao, 'envio_correlacao')
+        else:
+            st.info("São necessárias pelo menos duas moedas para a matriz de correlação.")
+    
+    with tab_triagem:
+        secao_triagem(triagem, fator_cambio, simbolo, moeda)
+    
+    with tab_destaques:
+        destaques = [
+            ("📈 Maiores altas 24h", triagem.maiores('retorno_24h', LINHAS_DESTAQUES)),
+            ("📉 Maiores quedas 24h", triagem.maiores('retorno_24h', LINHAS_DESTAQUES, decrescente=False)),
+            ("🌪️ Mais voláteis (7d)", triagem.maiores('volatilidade', LINHAS_DESTAQUES)),
+            ("🧭 Menos correlacionadas com o mercado", triagem.maiores('correlacao_mercado', LINHAS_DESTAQUES, decrescente=False)),
+        ]
+        for titulo, linhas_destaque in destaques:
+            st.markdown(f"**{titulo}**")
+            exibir_tabela_triagem(converter(triagem.tabela(linhas_destaque), fator_cambio, COLUNAS_MONETARIAS),
+                                  simbolo, moeda)
+    
+    st.markdown("---")
+
+
+@secao('secao_detalhes', run_every=intervalo if auto_atualizar else None)
+def secao_detalhes(numero_moedas, moeda_escolhida, ao_vivo):
+    """
+    Análise detalhada da moeda selecionada. Trocar de moeda, de indicador
+    ou de período reexecuta só esta seção, que lê o snapshot atual do
+    coletor (sem esperar nem forçar coleta). Com a atualização automática,
+    também roda no temporizador, como a seção de mercado, para os cards e
+    o gráfico acompanharem cada novo snapshot.
+    """
+    st.subheader("🔍 Análise Detalhada")
+    
+    snapshot = obter_coletor_mercado().snapshot()
+    moeda, fator_cambio, simbolo = obter_cambio(moeda_escolhida, avisar=False)
+    df = converter(snapshot.df.head(numero_moedas), fator_cambio, COLUNAS_MONETARIAS)
+    
+    # Seletor de criptomoeda
+    if 'name' in df.columns and not df.empty:
+        cripto_selecionada = st.selectbox(
+            "Selecione uma criptomoeda para ver detalhes:",
+            options=df['name'].tolist(),
+            index=0
+        )
+        
+        # Buscar linha da criptomoeda selecionada
+        info_row = df[df['name'] == cripto_selecionada].iloc[0]
+        cripto_id = info_row['id']
+        st.session_state['cripto_id_selecionada'] = cripto_id
+        
+        # Informações em cards
+        col_info1, col_info2, col_info3 = st.columns(3)
+        
+        with col_info1:
+            if ao_vivo:
+                exibir_preco_ao_vivo(cripto_id, info_row.get('current_price'), fator_cambio, simbolo)
+            else:
+                st.metric("Preço Atual", formatar_preco(info_row.get('current_price'), simbolo))
+            st.metric("Preço Máximo 24h", formatar_preco(info_row.get('high_24h'), simbolo))
+            st.metric("Preço Mínimo 24h", formatar_preco(info_row.get('low_24h'), simbolo))
+        
+        with col_info2:
+            st.metric("Market Cap", formatar_numero(info_row.get('market_cap'), simbolo))
+            st.metric("Volume 24h", formatar_numero(info_row.get('total_volume'), simbolo))
+            rank = info_row.get('market_cap_rank')
+            st.metric("Market Cap Rank", f"#{int(rank)}" if pd.notna(rank) else "N/A")
+        
+        with col_info3:
+            var_1h = info_row.get('price_change_percentage_1h_in_currency')
+            st.metric("Variação 1h", formatar_percentual(var_1h), delta=formatar_percentual(var_1h))
+            
+            var_24h = info_row.get('price_change_percentage_24h')
+            st.metric("Variação 24h", formatar_percentual(var_24h), delta=formatar_percentual(var_24h))
+            
+            var_7d = info_row.get('price_change_percentage_7d_in_currency')
+            st.metric("Variação 7d", formatar_percentual(var_7d), delta=formatar_percentual(var_7d))
+        
+        mostrar_indicadores = st.toggle(
+            "📐 Indicadores técnicos",
+            value=False,
+            help="Média móvel (20), EMA (20), bandas de Bollinger (20, 2σ), RSI (14), volatilidade realizada (24h, anualizada) e drawdown."
+        )
+        if mostrar_indicadores:
+            # Calculados uma vez por snapshot para todas as moedas; aqui só a linha da moeda
+            with metricas.medir('indicadores'):
+                indicadores_7d = Indicadores(*(valores[info_row.name] for valores in obter_indicadores_mercado().obter(snapshot)))
+            rsi = ultimo_valor(indicadores_7d.rsi)
+            volatilidade = ultimo_valor(indicadores_7d.volatilidade)
+            col_ind1, col_ind2, col_ind3, col_ind4 = st.columns(4)
+            col_ind1.metric("RSI (14h)", f"{rsi:.0f}" if rsi is not None else "N/A")
+            col_ind2.metric("Volatilidade anualizada", f"{volatilidade:.0f}%" if volatilidade is not None else "N/A")
+            col_ind3.metric("Drawdown 7d", formatar_percentual(ultimo_valor(indicadores_7d.drawdown)))
+            col_ind4.metric("Drawdown máximo 7d", formatar_percentual(np.fmin.reduce(indicadores_7d.drawdown)))
+        
+        with st.expander("🔔 Alertas de preço"):
+            exibir_alertas(cripto_id, cripto_selecionada, info_row.get('current_price'), fator_cambio, simbolo, moeda)
+        
+        st.markdown("---")
+        
+        # Gráficos históricos em tabs
+        tab1, tab2, tab3 = st.tabs(["📅 Últimos 7 Dias", "📅 Últimos 30 Dias", "🔎 Histórico Longo"])
+        
+        with tab1:
+            # Tentar usar dados de sparkline primeiro (já disponíveis, sem nova requisição)
+            sparkline_prices = snapshot.sparklines[info_row.name]
+            validos = ~np.isnan(sparkline_prices)
+            sparkline_prices = sparkline_prices[validos]
+            if len(sparkline_prices) > 0:
                 # Criar DataFrame a partir do sparkline
                 df_sparkline = pd.DataFrame({
-                    'timestamp': pd.date_range(end=datetime.now(), periods=len(sparkline_prices), freq='H'),
+                    # Ancorado no horário da coleta: mesmo snapshot, mesma figura em cache
+                    'timestamp': pd.date_range(end=snapshot.atualizado_em, periods=len(sparkline_prices), freq='h'),
                     'price': sparkline_prices
                 })
-                fig_7d_spark = criar_grafico_historico(df_sparkline, f"{cripto_selecionada} - Últimos 7 Dias (Sparkline)")
-                if fig_7d_spark:
-                    st.plotly_chart(fig_7d_spark, use_container_width=True)
-                    st.caption("📌 Dados do gráfico sparkline (168 pontos horários)")
+                if ao_vivo:
+                    # Sparkline + pontos ao vivo anexados, sem rerun da página
+                    exibir_grafico_ao_vivo(cripto_id, f"{cripto_selecionada} - Últimos 7 Dias (Ao Vivo)",
+                                           converter(df_sparkline, fator_cambio, COLUNAS_SERIE), fator_cambio, moeda)
+                elif mostrar_indicadores:
+                    for nome, valores in zip(Indicadores._fields, indicadores_7d):
+                        df_sparkline[nome] = valores[validos]
+                    df_sparkline = converter(df_sparkline, fator_cambio, COLUNAS_SERIE)
+                    with metricas.medir('grafico_historico'):
+                        fig_7d_spark = criar_grafico_indicadores(df_sparkline, f"{cripto_selecionada} - Últimos 7 Dias (Indicadores)", moeda=moeda)
+                    if fig_7d_spark:
+                        exibir_grafico(fig_7d_spark, 'envio_historico')
+                else:
+                    with metricas.medir('grafico_historico'):
+                        fig_7d_spark = criar_grafico_historico(converter(df_sparkline, fator_cambio, COLUNAS_SERIE),
+                                                               f"{cripto_selecionada} - Últimos 7 Dias (Sparkline)", moeda=moeda)
+                    if fig_7d_spark:
+                        exibir_grafico(fig_7d_spark, 'envio_historico')
+                        st.caption(f"📌 Dados do gráfico sparkline ({len(sparkline_prices)} pontos horários)")
             else:
-                st.info("📊 Dados de sparkline não disponíveis. Tente selecionar outra criptomoeda.")
-        else:
-            # Se não houver sparkline, tentar buscar dados históricos
-            with st.spinner("Carregando dados de 7 dias..."):
-                df_hist_7 = buscar_dados_historicos(cripto_id, 7)
-                if not df_hist_7.empty:
-                    fig_7d = criar_grafico_historico(df_hist_7, f"{cripto_selecionada} - Últimos 7 Dias")
-                    if fig_7d:
-                        st.plotly_chart(fig_7d, use_container_width=True)
+                # Se não houver sparkline, tentar buscar dados históricos
+                with st.spinner("Carregando dados de 7 dias..."):
+                    df_hist_7 = converter(buscar_dados_historicos(cripto_id, 7), fator_cambio, COLUNAS_SERIE)
+                    if not df_hist_7.empty:
+                        with metricas.medir('grafico_historico'):
+                            fig_7d = criar_grafico_historico(df_hist_7, f"{cripto_selecionada} - Últimos 7 Dias", moeda=moeda)
+                        if fig_7d:
+                            exibir_grafico(fig_7d, 'envio_historico')
+                            exibir_idade_historico(df_hist_7)
+                        else:
+                            st.warning("Não foi possível criar o gráfico.")
+                    else:
+                        st.info("📊 Dados históricos não disponíveis no momento. A API pode ter atingido o limite de requisições. Aguarde 1-2 minutos e clique em 'Atualizar Agora' na sidebar.")
+        
+        with tab2:
+            with st.spinner("Carregando dados de 30 dias..."):
+                df_hist_30 = buscar_dados_historicos(cripto_id, 30)
+                if not df_hist_30.empty:
+                    with metricas.medir('grafico_historico'):
+                        # Indicadores calculados em USD (lineares no preço) e convertidos junto com a série
+                        if mostrar_indicadores:
+                            df_ind_30 = obter_indicadores_series().obter((cripto_id, 30), df_hist_30)
+                            fig_30d = criar_grafico_indicadores(converter(df_ind_30, fator_cambio, COLUNAS_SERIE),
+                                                                f"{cripto_selecionada} - Últimos 30 Dias (Indicadores)", moeda=moeda)
+                        else:
+                            fig_30d = criar_grafico_historico(converter(df_hist_30, fator_cambio, COLUNAS_SERIE),
+                                                              f"{cripto_selecionada} - Últimos 30 Dias", moeda=moeda)
+                    if fig_30d:
+                        exibir_grafico(fig_30d, 'envio_historico')
+                        exibir_idade_historico(df_hist_30)
                     else:
                         st.warning("Não foi possível criar o gráfico.")
                 else:
                     st.info("📊 Dados históricos não disponíveis no momento. A API pode ter atingido o limite de requisições. Aguarde 1-2 minutos e clique em 'Atualizar Agora' na sidebar.")
-    
-    with tab2:
-        with st.spinner("Carregando dados de 30 dias..."):
-            df_hist_30 = buscar_dados_historicos(cripto_id, 30)
-            if not df_hist_30.empty:
-                fig_30d = criar_grafico_historico(df_hist_30, f"{cripto_selecionada} - Últimos 30 Dias")
-                if fig_30d:
-                    st.plotly_chart(fig_30d, use_container_width=True)
-                else:
-                    st.warning("Não foi possível criar o gráfico.")
+        
+        with tab3:
+            # Só carrega depois que um período é escolhido (as tabs rodam sempre)
+            periodo = st.selectbox(
+                "Período",
+                options=list(PERIODOS_LONGOS),
+                index=None,
+                placeholder="Escolha um período",
+                key="periodo_longo"
+            )
+            if periodo is None:
+                st.caption("Escolha um período para carregar o histórico longo.")
             else:
-                st.info("📊 Dados históricos não disponíveis no momento. A API pode ter atingido o limite de requisições. Aguarde 1-2 minutos e clique em 'Atualizar Agora' na sidebar.")
+                with st.spinner(f"Carregando {periodo.lower()}..."):
+                    df_longo = converter(buscar_dados_historicos(cripto_id, PERIODOS_LONGOS[periodo]), fator_cambio, COLUNAS_SERIE)
+                if not df_longo.empty:
+                    primeiro = df_longo['timestamp'].iloc[0].floor('h').to_pydatetime()
+                    ultimo = df_longo['timestamp'].iloc[-1].ceil('h').to_pydatetime()
+                    if ultimo <= primeiro:
+                        ultimo = primeiro + timedelta(hours=1)
+                    # Zoom: janela visível; só ela é relida (e rebaixada, se preciso) em resolução maior
+                    inicio_janela, fim_janela = st.slider(
+                        "Janela",
+                        min_value=primeiro,
+                        max_value=ultimo,
+                        value=(primeiro, ultimo),
+                        step=timedelta(hours=1),
+                        format="DD/MM/YY HH:mm"
+                    )
+                    df_janela = df_longo
+                    if (inicio_janela, fim_janela) != (primeiro, ultimo):
+                        janela_ms = (int(pd.Timestamp(inicio_janela).value // 10**6),
+                                     int(pd.Timestamp(fim_janela).value // 10**6))
+                        df_janela = converter(buscar_dados_historicos(cripto_id, janela=janela_ms), fator_cambio, COLUNAS_SERIE)
+                    with metricas.medir('grafico_historico'):
+                        fig_longo = criar_grafico_historico(df_janela, f"{cripto_selecionada} - {periodo}", moeda=moeda)
+                    if fig_longo:
+                        exibir_grafico(fig_longo, 'envio_historico')
+                        st.caption(f"📌 {len(df_janela)} pontos na janela, exibidos com no máximo {pontos_alvo()}")
+                        exibir_idade_historico(df_janela)
+                    else:
+                        st.warning("Não há pontos na janela selecionada.")
+                else:
+                    st.info("📊 Dados históricos não disponíveis no momento. A API pode ter atingido o limite de requisições. Aguarde 1-2 minutos e clique em 'Atualizar Agora' na sidebar.")
+    
+    else:
+        st.warning("Nenhuma criptomoeda disponível para seleção.")
 
-else:
-    st.warning("Nenhuma criptomoeda disponível para seleção.")
 
-# ========== ATUALIZAÇÃO AUTOMÁTICA ==========
-if auto_atualizar:
-    # Usar placeholder para contagem regressiva
-    placeholder = st.empty()
-    
-    for segundos_restantes in range(intervalo, 0, -1):
-        placeholder.caption(f"🔄 Próxima atualização em: {segundos_restantes}s")
-        time.sleep(1)
-    
-    placeholder.empty()
-    st.cache_data.clear()
-    st.rerun()
\ No newline at end of file
+secao_mercado(numero_moedas, moeda, intervalo if auto_atualizar else None)
+secao_detalhes(numero_moedas, moeda, ao_vivo)
+
+metricas.observar('pagina', time.perf_counter() - inicio_pagina)
@@ -0,0 +1,117 @@
+"""
+Pré-carregamento (aquecimento) do histórico das moedas visíveis.
+
+Após cada snapshot de mercado, busca o histórico de 30 dias do Top N em
+ordem de market cap, com poucas requisições simultâneas para respeitar o
+limitador de taxa. Assim, trocar de moeda na "Análise Detalhada" lê apenas
+o armazém em disco.
+"""
+import asyncio
+import threading
+import time
+
+# Histórico pré-carregado (aba de 30 dias; a de 7 dias é uma fatia dela)
+DIAS_AQUECIMENTO = 30
+
+# Requisições simultâneas do aquecimento. Valor baixo para que pedidos
+# interativos não fiquem atrás de uma fila longa no limitador.
+CONCORRENCIA_AQUECIMENTO = 2
+
+# Top N usado quando nenhuma sessão informou o seu
+MOEDAS_VISIVEIS_PADRAO = 20
+
+# Por quanto tempo o Top N informado por uma sessão continua valendo
+VALIDADE_VISIVEIS = 600
+
+
+class AquecedorHistorico:
+    """
+    Etapa executada após cada snapshot: aquece o histórico do Top N visível.
+    Roda em thread própria; snapshots que chegam durante um aquecimento são
+    agrupados e só o mais recente é processado.
+    """
+
+    def __init__(self, armazem, dias=DIAS_AQUECIMENTO, concorrencia=CONCORRENCIA_AQUECIMENTO):
+        self.armazem = armazem
+        self.dias = dias
+        self.concorrencia = concorrencia
+        self._visiveis = {}
+        self._pendente = None
+        self._condicao = threading.Condition()
+        self._thread = None
+
+    def iniciar(self):
+        """
+        Inicia a thread de aquecimento (apenas uma vez).
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="aquecimento-historico", daemon=True)
+            self._thread.start()
+        return self
+
+    def registrar_visiveis(self, numero_moedas):
+        """
+        Registra o Top N exibido por uma sessão.
+        """
+        with self._condicao:
+            self._visiveis[numero_moedas] = time.monotonic()
+
+    def numero_visiveis(self):
+        """
+        Retorna o maior Top N informado recentemente pelas sessões.
+        """
+        limite = time.monotonic() - VALIDADE_VISIVEIS
+        with self._condicao:
+            recentes = [n for n, instante in self._visiveis.items() if instante >= limite]
+        return max(recentes, default=MOEDAS_VISIVEIS_PADRAO)
+
+    def notificar(self, snapshot):
+        """
+        Recebe um novo snapshot (chamado pelo coletor de mercado).
+        """
+        with self._condicao:
+            self._pendente = snapshot
+            self._condicao.notify()
+
+    def ids_para_aquecer(self, df):
+        """
+        Retorna os ids do Top N ordenados por rank de market cap, sem as
+        moedas cujo histórico já está atualizado.
+        """
+        df_top = df.sort_values('market_cap_rank', na_position='last').head(self.numero_visiveis())
+        return [cripto_id for cripto_id in df_top['id']
+                if not self.armazem.esta_atualizado(cripto_id, self.dias)]
+
+    async def _aquecer(self, ids):
+        loop = asyncio.get_running_loop()
+        # Semáforo justo: as moedas entram na fila do limitador em ordem de rank
+        semaforo = asyncio.Semaphore(self.concorrencia)
+
+        async def aquecer_moeda(cripto_id):
+            async with semaforo:
+                await loop.run_in_executor(None, self.armazem.atualizar, cripto_id, self.dias)
+
+        return await asyncio.gather(*(aquecer_moeda(cripto_id) for cripto_id in ids),
+                                    return_exceptions=True)
+
+    def aquecer(self, snapshot):
+        """
+        Aquece o histórico do Top N do snapshot.
+        Retorna a lista de ids processados; falhas individuais são ignoradas
+        (a moeda será buscada sob demanda).
+        """
+        ids = self.ids_para_aquecer(snapshot.df)
+        if ids:
+            asyncio.run(self._aquecer(ids))
+        return ids
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(lambda: self._pendente is not None)
+                snapshot, self._pendente = self._pendente, None
+            try:
+                self.aquecer(snapshot)
+            except Exception:
+                # O aquecimento é só otimização: erros não podem derrubar a thread
+                pass
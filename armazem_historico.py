@@ -0,0 +1,420 @@
+"""
+Armazém persistente de histórico de preços (SQLite, uma série por moeda).
+
+Os pontos já baixados ficam gravados em disco. Cada consulta busca na API
+apenas o intervalo que falta (desde o último timestamp gravado ou antes do
+primeiro), e as visões de 7 e 30 dias são fatias da mesma série. Ao dar
+zoom em uma janela, só essa janela é baixada de novo na resolução mais
+fina que a API oferece para ela; fora dessas janelas a série é horária
+(ou diária, além de 90 dias). Pedidos simultâneos da mesma série são
+agrupados em uma única atualização, e uma falha é compartilhada por alguns
+segundos em vez de ser repetida por cada sessão.
+
+Política de cache (stale-while-revalidate): até INTERVALO_ATUALIZACAO
+segundos após o último complemento a série é fresca; até VELHICE_MAXIMA ela
+é servida na hora e complementada em segundo plano; depois disso o
+complemento é feito antes de responder. Se ele falhar, a série gravada é
+servida mesmo assim. O DataFrame retornado traz a idade dos dados em
+df.attrs['idade'] (segundos).
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from cliente_api import obter_cliente
+from metricas import metricas
+from voo_unico import VooUnico
+
+# HISTORICO_CAMINHO permite usar outro arquivo (ex.: nos benchmarks)
+CAMINHO_PADRAO = os.environ.get(
+    'HISTORICO_CAMINHO',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'historico.sqlite3')
+)
+
+# Intervalo mínimo entre complementos da mesma série (antigo TTL do cache)
+INTERVALO_ATUALIZACAO = 300
+
+# Idade máxima (segundos) em que a série é servida sem esperar o complemento
+VELHICE_MAXIMA = 3600
+
+# Situação de uma série em relação à política de cache
+FRESCA = 'fresca'
+VELHA = 'velha'
+AUSENTE = 'ausente'
+
+# Folga ao comparar o início pedido com o início gravado (1 hora)
+TOLERANCIA_INICIO_MS = 3600 * 1000
+
+MS_POR_DIA = 86400 * 1000
+
+# Granularidade automática de /market_chart/range: pontos de 5 minutos para
+# janelas de até 1 dia (só perto do momento atual) e horários até 90 dias
+RESOLUCAO_5_MINUTOS_MS = 5 * 60 * 1000
+RESOLUCAO_HORARIA_MS = 3600 * 1000
+DURACAO_MAXIMA_HORARIA_MS = 90 * MS_POR_DIA
+
+# Uma janela é rebaixada se tiver menos que esta fração dos pontos esperados
+FRACAO_MINIMA_PONTOS = 0.5
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS precos (
+    cripto_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    price REAL NOT NULL,
+    refinado INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cripto_id, timestamp)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cobertura (
+    cripto_id TEXT PRIMARY KEY,
+    inicio INTEGER NOT NULL,
+    fim INTEGER NOT NULL
+);
+"""
+
+
+class ArmazemHistorico:
+    """
+    Série de preços por moeda gravada em SQLite, complementada de forma incremental.
+    """
+
+    def __init__(self, caminho=CAMINHO_PADRAO, cliente=None):
+        self.caminho = caminho
+        self.cliente = cliente if cliente is not None else obter_cliente()
+        self._trava = threading.Lock()
+        self._travas_moeda = defaultdict(threading.Lock)
+        self._janelas_refinadas = set()
+        self._voo = VooUnico()
+        self._revalidando = set()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(ESQUEMA)
+            # Arquivos gravados antes da coluna `refinado`
+            colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(precos)")}
+            if 'refinado' not in colunas:
+                conexao.execute("ALTER TABLE precos ADD COLUMN refinado INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _trava_moeda(self, cripto_id):
+        with self._trava:
+            return self._travas_moeda[cripto_id]
+
+    def _cobertura(self, cripto_id):
+        with self._conectar() as conexao:
+            return conexao.execute(
+                "SELECT inicio, fim FROM cobertura WHERE cripto_id = ?", (cripto_id,)
+            ).fetchone()
+
+    def _gravar(self, cripto_id, precos, inicio, fim, por_hora=False, refinado=False):
+        """
+        Grava os pontos recebidos e amplia a faixa coberta para [inicio, fim],
+        limitada ao último ponto recebido. Sem pontos, nada muda: o intervalo
+        continua descoberto e é pedido de novo na próxima atualização.
+
+        Com `por_hora`, só o último ponto de cada hora é gravado, substituindo
+        o gravado antes na mesma hora: complementos de até 1 dia chegam com
+        pontos de 5 minutos e a série continua horária. Pontos gravados com
+        `refinado` (janelas de zoom) nunca são substituídos assim.
+        """
+        linhas = [(cripto_id, int(ts), float(preco), int(refinado)) for ts, preco in precos if preco is not None]
+        if not linhas:
+            return
+        fim = min(fim, max(linha[1] for linha in linhas))
+        with self._conectar() as conexao:
+            if por_hora:
+                linhas = list({linha[1] // RESOLUCAO_HORARIA_MS: linha for linha in linhas}.values())
+                conexao.executemany(
+                    """
+                    DELETE FROM precos
+                    WHERE cripto_id = ? AND timestamp >= ? AND timestamp < ? AND refinado = 0
+                    """,
+                    [(cripto_id, ts - ts % RESOLUCAO_HORARIA_MS, ts) for _, ts, _, _ in linhas]
+                )
+            conexao.executemany(
+                """
+                INSERT INTO precos (cripto_id, timestamp, price, refinado) VALUES (?, ?, ?, ?)
+                ON CONFLICT (cripto_id, timestamp) DO UPDATE SET
+                    price = excluded.price,
+                    refinado = MAX(refinado, excluded.refinado)
+                """,
+                linhas
+            )
+            conexao.execute(
+                """
+                INSERT INTO cobertura (cripto_id, inicio, fim) VALUES (?, ?, ?)
+                ON CONFLICT (cripto_id) DO UPDATE SET
+                    inicio = MIN(inicio, excluded.inicio),
+                    fim = MAX(fim, excluded.fim)
+                """,
+                (cripto_id, inicio, fim)
+            )
+
+    def _baixar_intervalo(self, cripto_id, inicio_ms, fim_ms):
+        """
+        Baixa os preços entre dois timestamps (ms) via /market_chart/range.
+        """
+        parametros = {
+            'vs_currency': 'usd',
+            'from': inicio_ms // 1000,
+            'to': fim_ms // 1000
+        }
+        dados = self.cliente.obter(f'/coins/{cripto_id}/market_chart/range', parametros, timeout=15)
+        return dados.get('prices') or []
+
+    def _baixar_dias(self, cripto_id, dias):
+        """
+        Baixa a série completa dos últimos `dias` (primeira carga da moeda).
+        """
+        parametros = {
+            'vs_currency': 'usd',
+            'days': dias
+        }
+        dados = self.cliente.obter(f'/coins/{cripto_id}/market_chart', parametros, timeout=15)
+        return dados.get('prices') or []
+
+    def idade(self, cripto_id):
+        """
+        Retorna os segundos desde o último complemento da série (None se não houver).
+        """
+        cobertura = self._cobertura(cripto_id)
+        if cobertura is None:
+            return None
+        return max(0.0, time.time() - cobertura[1] / 1000)
+
+    def situacao(self, cripto_id, dias):
+        """
+        Classifica a série dos últimos `dias` como FRESCA, VELHA (servível
+        enquanto é complementada) ou AUSENTE (consulta só o disco).
+        """
+        cobertura = self._cobertura(cripto_id)
+        if cobertura is None:
+            return AUSENTE
+        inicio, fim = cobertura
+        agora = int(time.time() * 1000)
+        if inicio > agora - dias * MS_POR_DIA + TOLERANCIA_INICIO_MS:
+            return AUSENTE
+        idade_ms = agora - fim
+        if idade_ms <= INTERVALO_ATUALIZACAO * 1000:
+            return FRESCA
+        if idade_ms <= VELHICE_MAXIMA * 1000:
+            return VELHA
+        return AUSENTE
+
+    def esta_atualizado(self, cripto_id, dias):
+        """
+        Indica se a série já cobre os últimos `dias` e foi complementada há
+        menos de INTERVALO_ATUALIZACAO segundos (consulta só o disco).
+        """
+        return self.situacao(cripto_id, dias) == FRESCA
+
+    def atualizar(self, cripto_id, dias):
+        """
+        Garante que a série cubra os últimos `dias`, buscando só o que falta.
+        Chamadas simultâneas para a mesma moeda e período compartilham uma
+        única atualização. Lança exceções do cliente da API em caso de falha.
+        """
+        self._voo.executar(('atualizar', cripto_id, dias), self._atualizar, cripto_id, dias)
+
+    def _atualizar(self, cripto_id, dias):
+        agora = int(time.time() * 1000)
+        inicio_desejado = agora - dias * MS_POR_DIA
+
+        # Uma atualização por moeda de cada vez: evita baixar o mesmo intervalo duas vezes
+        with self._trava_moeda(cripto_id):
+            cobertura = self._cobertura(cripto_id)
+
+            if cobertura is None:
+                self._gravar(cripto_id, self._baixar_dias(cripto_id, dias), inicio_desejado, agora, por_hora=True)
+                return
+
+            inicio, fim = cobertura
+            if inicio_desejado < inicio - TOLERANCIA_INICIO_MS:
+                # Pedido mais longo que o gravado: completa o começo da série
+                self._gravar(cripto_id, self._baixar_intervalo(cripto_id, inicio_desejado, inicio),
+                             inicio_desejado, inicio, por_hora=True)
+
+            if agora - fim > INTERVALO_ATUALIZACAO * 1000:
+                # Complemento incremental desde o último ponto gravado (pontos de
+                # 5 minutos para até 1 dia, reduzidos a um por hora)
+                self._gravar(cripto_id, self._baixar_intervalo(cripto_id, fim, agora), fim, agora, por_hora=True)
+
+    def ler_intervalo(self, cripto_id, inicio_ms, fim_ms=None):
+        """
+        Lê os pontos gravados entre dois timestamps (ms), sem acessar a API.
+        Retorna DataFrame com timestamp e price (vazio se não houver dados).
+        """
+        fim_ms = fim_ms if fim_ms is not None else int(time.time() * 1000)
+        with self._conectar() as conexao:
+            df = pd.read_sql_query(
+                """
+                SELECT timestamp, price FROM precos
+                WHERE cripto_id = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp
+                """,
+                conexao, params=(cripto_id, int(inicio_ms), int(fim_ms))
+            )
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.attrs['idade'] = self.idade(cripto_id)
+        return df
+
+    def ler(self, cripto_id, dias):
+        """
+        Lê a fatia dos últimos `dias` gravada em disco, sem acessar a API.
+        Retorna DataFrame com timestamp e price (vazio se não houver dados).
+        """
+        return self.ler_intervalo(cripto_id, int(time.time() * 1000) - dias * MS_POR_DIA)
+
+    def invalidar(self, cripto_id=None):
+        """
+        Marca a série da moeda (ou todas, sem id) como vencida: a próxima
+        leitura é servida do disco e complementada na hora, em segundo plano.
+        Erros guardados da moeda são descartados.
+        """
+        limite = int(time.time() * 1000) - (INTERVALO_ATUALIZACAO + 1) * 1000
+        with self._conectar() as conexao:
+            if cripto_id is None:
+                conexao.execute("UPDATE cobertura SET fim = MIN(fim, ?)", (limite,))
+            else:
+                conexao.execute("UPDATE cobertura SET fim = MIN(fim, ?) WHERE cripto_id = ?", (limite, cripto_id))
+
+        # Chaves do agrupamento: (operação, id, ...) aqui e (caminho, params) no cliente
+        self._voo.esquecer_se(lambda chave: cripto_id is None or chave[1] == cripto_id)
+        voo_cliente = getattr(self.cliente, 'voo', None)
+        if voo_cliente is not None:
+            caminho = f'/coins/{cripto_id}/' if cripto_id is not None else '/coins/'
+            voo_cliente.esquecer_se(lambda chave: chave[0].startswith(caminho))
+        with self._trava:
+            self._janelas_refinadas = {janela for janela in self._janelas_refinadas
+                                       if cripto_id is not None and janela[0] != cripto_id}
+
+    def _revalidar(self, cripto_id, dias):
+        try:
+            self.atualizar(cripto_id, dias)
+        except Exception:
+            # A série gravada continua sendo servida; a próxima leitura tenta de novo
+            pass
+        finally:
+            with self._trava:
+                self._revalidando.discard((cripto_id, dias))
+
+    def revalidar_em_segundo_plano(self, cripto_id, dias):
+        """
+        Complementa a série em uma thread própria (uma por moeda e período).
+        """
+        with self._trava:
+            if (cripto_id, dias) in self._revalidando:
+                return
+            self._revalidando.add((cripto_id, dias))
+        threading.Thread(target=self._revalidar, args=(cripto_id, dias),
+                         name=f"revalidacao-{cripto_id}", daemon=True).start()
+
+    def obter(self, cripto_id, dias):
+        """
+        Retorna a fatia dos últimos `dias` seguindo a política de cache:
+        fresca ou velha é servida na hora (a velha é complementada em
+        segundo plano); ausente é complementada antes. Se o complemento
+        falhar e houver pontos gravados, eles são servidos assim mesmo.
+        Lança exceções do cliente da API se não houver nada para servir.
+        """
+        situacao = self.situacao(cripto_id, dias)
+        metricas.contar('historico_cache', situacao=situacao)
+        if situacao == VELHA:
+            self.revalidar_em_segundo_plano(cripto_id, dias)
+        elif situacao == AUSENTE:
+            try:
+                self.atualizar(cripto_id, dias)
+            except Exception:
+                df = self.ler(cripto_id, dias)
+                if df.empty:
+                    raise
+                return df
+        return self.ler(cripto_id, dias)
+
+    def _contar_pontos(self, cripto_id, inicio_ms, fim_ms):
+        with self._conectar() as conexao:
+            return conexao.execute(
+                "SELECT COUNT(*) FROM precos WHERE cripto_id = ? AND timestamp BETWEEN ? AND ?",
+                (cripto_id, int(inicio_ms), int(fim_ms))
+            ).fetchone()[0]
+
+    def refinar(self, cripto_id, inicio_ms, fim_ms):
+        """
+        Baixa de novo só a janela [inicio_ms, fim_ms] se a API oferecer para
+        ela uma resolução mais fina do que a gravada (ex.: pontos horários
+        dentro de uma série de 1 ano, que vem com pontos diários).
+        Lança exceções do cliente da API em caso de falha.
+        """
+        self._voo.executar(('refinar', cripto_id, inicio_ms, fim_ms), self._refinar, cripto_id, inicio_ms, fim_ms)
+
+    def _refinar(self, cripto_id, inicio_ms, fim_ms):
+        resolucao = resolucao_api(inicio_ms, fim_ms, int(time.time() * 1000))
+        if resolucao is None:
+            return
+
+        # Cada janela é tentada uma vez (a API pode ter menos pontos que o esperado)
+        chave = (cripto_id, inicio_ms // resolucao, fim_ms // resolucao)
+        with self._trava_moeda(cripto_id):
+            if chave in self._janelas_refinadas:
+                return
+            esperados = (fim_ms - inicio_ms) / resolucao
+            if self._contar_pontos(cripto_id, inicio_ms, fim_ms) < esperados * FRACAO_MINIMA_PONTOS:
+                self._gravar(cripto_id, self._baixar_intervalo(cripto_id, inicio_ms, fim_ms), inicio_ms, fim_ms,
+                             refinado=True)
+            self._janelas_refinadas.add(chave)
+
+    def obter_janela(self, cripto_id, inicio_ms, fim_ms):
+        """
+        Refina a janela se necessário e retorna os pontos gravados nela.
+        """
+        try:
+            self.refinar(cripto_id, inicio_ms, fim_ms)
+        except Exception:
+            # Sem refino: a janela é servida na resolução já gravada
+            df = self.ler_intervalo(cripto_id, inicio_ms, fim_ms)
+            if df.empty:
+                raise
+            return df
+        return self.ler_intervalo(cripto_id, inicio_ms, fim_ms)
+
+
+def resolucao_api(inicio_ms, fim_ms, agora_ms):
+    """
+    Resolução (ms entre pontos) que /market_chart/range devolve para a janela.
+    Retorna None para janelas longas, em que a API só tem pontos diários.
+    """
+    duracao = fim_ms - inicio_ms
+    if duracao <= MS_POR_DIA and fim_ms >= agora_ms - MS_POR_DIA:
+        return RESOLUCAO_5_MINUTOS_MS
+    if duracao <= DURACAO_MAXIMA_HORARIA_MS:
+        return RESOLUCAO_HORARIA_MS
+    return None
+
+
+_armazem = None
+_trava_armazem = threading.Lock()
+
+
+def obter_armazem():
+    """
+    Retorna o armazém compartilhado do processo, criando-o na primeira chamada.
+    """
+    global _armazem
+    with _trava_armazem:
+        if _armazem is None:
+            _armazem = ArmazemHistorico()
+        return _armazem
@@ -0,0 +1,413 @@
+"""
+Benchmark do dashboard contra o servidor de fixtures (servidor_fixtures.py).
+
+Mede, sem acessar a CoinGecko real:
+    - renderização da página (AppTest): primeira execução com o processo frio,
+      nova execução da mesma sessão e nova sessão com o processo aquecido;
+    - ingestão do mercado (JSON -> snapshot), montagem da tabela de ranking e
+      construção dos gráficos do mercado (barras, pizza, triagem e
+      correlação) para 50, 500 e 5000 moedas;
+    - construção dos gráficos históricos (com e sem cache de figuras) e serialização;
+    - requisições à API por usuário simulado, respostas 429 e novas tentativas;
+    - ocupação do limitador de taxa padrão (15/min) pelas consultas
+      periódicas em segundo plano, que precisa deixar espaço aos pedidos
+      interativos;
+    - custo de cada interação: rerun completo da página (como o AppTest
+      executa) e tempo da seção que o Streamlit reexecuta de fato (fragmento);
+    - cards de detalhes acompanhando o snapshot novo a cada tick do temporizador.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_app [--usuarios 5] [--latencia-ms 80] [--taxa-429 0.05]
+                                   [--fixtures benchmarks/fixtures] [--taxa 600] [--json saida.json]
+
+--taxa é o limite do limitador em requisições/minuto (padrão 600, para o
+benchmark não ficar preso ao limite de 15/min da API gratuita).
+
+O repositório não traz respostas gravadas: sem --fixtures, todo o mercado
+e os históricos são sintéticos (stub_coingecko.py). Para medir com dados
+reais, grave-os antes com `python -m benchmarks.servidor_fixtures --gravar`.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from stub_coingecko import MOEDAS_PADRAO, MercadoSintetico
+from benchmarks.servidor_fixtures import ServidorFixtures
+
+ROTULO_SELECAO = "Selecione uma criptomoeda para ver detalhes:"
+CARD_DETALHES = "Preço Máximo 24h"
+TAMANHOS_INGESTAO = (50, 500, 5000)
+DIAS_GRAFICO = (7, 30, 365)
+REPETICOES_INTERACAO = 5
+
+# Fração máxima do limitador padrão ocupada pelas consultas em segundo plano
+OCUPACAO_MAXIMA = 2 / 3
+
+
+def cronometrar(funcao, repeticoes=1):
+    """
+    Retorna o menor tempo (segundos) entre as repetições e o último resultado.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def preparar_ambiente(servidor, diretorio):
+    """
+    Aponta o app para o servidor de fixtures e para um histórico temporário.
+    Precisa rodar antes de importar os módulos do dashboard.
+    """
+    os.environ['COINGECKO_URL_BASE'] = servidor.url_base
+    os.environ['HISTORICO_CAMINHO'] = os.path.join(diretorio, 'historico.sqlite')
+    os.environ.pop('SERVICO_DADOS_URL', None)
+    os.environ.pop('FLUXO_REPLAY', None)
+
+
+def medir_orcamento_limitador():
+    """
+    Retorna tupla (dict origem -> requisições/min, ocupação) das consultas
+    periódicas em segundo plano com as configurações padrão: coleta do
+    mercado, aquecimento do Top N, modo ao vivo e câmbio. A ocupação é a
+    fração do limite padrão do limitador que elas consomem.
+    """
+    from aquecimento import MOEDAS_VISIVEIS_PADRAO
+    from armazem_historico import INTERVALO_ATUALIZACAO
+    from cambio import INTERVALO_CAMBIO
+    from coletor_mercado import PAGINAS_MERCADO, intervalo_pagina
+    from fluxo_precos import INTERVALO_CONSULTA
+    from limitador import TAXA_PADRAO
+
+    origens = {
+        'coleta_mercado': sum(60 / intervalo_pagina(pagina) for pagina in range(1, PAGINAS_MERCADO + 1)),
+        'aquecimento': MOEDAS_VISIVEIS_PADRAO * 60 / INTERVALO_ATUALIZACAO,
+        'ao_vivo': 60 / INTERVALO_CONSULTA,
+        'cambio': 60 / INTERVALO_CAMBIO,
+    }
+    return origens, sum(origens.values()) / (TAXA_PADRAO * 60)
+
+
+def medir_ingestao(repeticoes=3):
+    """
+    Retorna dict tamanho -> (ms, moedas/s) da ingestão de um mercado completo:
+    decodificação do JSON, normalização por página, união das páginas,
+    detecção de mudanças e agregados incrementais.
+    """
+    from coletor_mercado import POR_PAGINA, normalizar_pagina
+    from mudancas_mercado import AcumuladorAgregados, calcular_mudancas
+    from snapshot_compacto import unir_paginas
+
+    resultados = {}
+    for tamanho in TAMANHOS_INGESTAO:
+        mercado = MercadoSintetico(tamanho)
+        paginas = -(-tamanho // POR_PAGINA)
+        corpos = [json.dumps(mercado.pagina(pagina, POR_PAGINA, True)).encode()
+                  for pagina in range(1, paginas + 1)]
+        anterior, _ = unir_paginas({pagina: (normalizar_pagina(json.loads(corpo)), 0.0)
+                                    for pagina, corpo in enumerate(corpos, 1)})
+        anterior = anterior.assign(current_price=anterior['current_price'] * 1.001)
+
+        def ingerir():
+            compactas = {pagina: (normalizar_pagina(json.loads(corpo)), 1.0)
+                         for pagina, corpo in enumerate(corpos, 1)}
+            df, _ = unir_paginas(compactas)
+            acumulador = AcumuladorAgregados()
+            acumulador.recalcular(anterior)
+            acumulador.aplicar(anterior, df, calcular_mudancas(anterior, df))
+            return acumulador.agregados()
+
+        tempo, _ = cronometrar(ingerir, repeticoes)
+        resultados[tamanho] = (tempo * 1000, tamanho / tempo)
+    return resultados
+
+
+def medir_tabela(repeticoes=5):
+    """
+    Retorna dict tamanho -> ms da montagem da tabela de ranking.
+    """
+    from benchmarks.bench_formatacao import gerar_mercado
+    from formatacao import montar_tabela_ranking
+
+    resultados = {}
+    for tamanho in TAMANHOS_INGESTAO:
+        df = gerar_mercado(tamanho)
+        tempo, _ = cronometrar(lambda: montar_tabela_ranking(df), repeticoes)
+        resultados[tamanho] = tempo * 1000
+    return resultados
+
+
+def medir_graficos_mercado(repeticoes=3, linhas_correlacao=20):
+    """
+    Retorna dict tamanho -> (ms de barras e pizza, ms de triagem e
+    correlação) com o cache de figuras vazio, sobre o snapshot sintético
+    de cada tamanho (a correlação usa as `linhas_correlacao` primeiras moedas).
+    """
+    from coletor_mercado import POR_PAGINA, normalizar_pagina
+    from graficos import (cache_figuras, criar_grafico_barras, criar_grafico_correlacao,
+                          criar_grafico_distribuicao)
+    from snapshot_compacto import unir_paginas
+    from triagem import Triagem
+
+    def sem_cache(funcao):
+        def medida():
+            cache_figuras.limpar()
+            return funcao()
+        return medida
+
+    resultados = {}
+    for tamanho in TAMANHOS_INGESTAO:
+        mercado = MercadoSintetico(tamanho)
+        paginas = -(-tamanho // POR_PAGINA)
+        df, sparklines = unir_paginas({pagina: (normalizar_pagina(mercado.pagina(pagina, POR_PAGINA, True)), 0.0)
+                                       for pagina in range(1, paginas + 1)})
+        linhas = np.arange(min(tamanho, linhas_correlacao))
+
+        barras, _ = cronometrar(sem_cache(lambda: (criar_grafico_barras(df), criar_grafico_distribuicao(df))),
+                                repeticoes)
+        correlacao, _ = cronometrar(sem_cache(lambda: criar_grafico_correlacao(
+            Triagem(df, sparklines).correlacao_entre(linhas), df['name'].iloc[linhas])), repeticoes)
+        resultados[tamanho] = (barras * 1000, correlacao * 1000)
+    return resultados
+
+
+def medir_graficos():
+    """
+    Retorna dict dias -> (ms frio, ms com cache, ms de to_json) do gráfico
+    histórico com uma série horária de `dias` dias.
+    """
+    from graficos import cache_figuras, criar_grafico_historico
+
+    resultados = {}
+    agora_ms = int(time.time() * 1000)
+    for dias in DIAS_GRAFICO:
+        pontos = dias * 24
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(agora_ms - np.arange(pontos)[::-1] * 3600 * 1000, unit='ms'),
+            'price': 100 * np.exp(np.cumsum(np.random.default_rng(dias).normal(0, 0.01, pontos))),
+        })
+        cache_figuras.limpar()
+        frio, figura = cronometrar(lambda: criar_grafico_historico(df, f"{dias} dias"))
+        quente, _ = cronometrar(lambda: criar_grafico_historico(df, f"{dias} dias"), 5)
+        serializacao, _ = cronometrar(figura.to_json, 3)
+        resultados[dias] = (frio * 1000, quente * 1000, serializacao * 1000)
+    return resultados
+
+
+def nova_sessao():
+    from streamlit.testing.v1 import AppTest
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return AppTest.from_file(os.path.join(raiz, 'app.py'), default_timeout=120)
+
+
+def selecionar(sessao, indice):
+    """
+    Seleciona a moeda na posição `indice` do seletor de detalhes (se existir).
+    Retorna o nome selecionado ou None.
+    """
+    for seletor in sessao.selectbox:
+        if seletor.label == ROTULO_SELECAO:
+            nome = seletor.options[indice % len(seletor.options)]
+            seletor.select(nome)
+            return nome
+    return None
+
+
+def medir_paginas(servidor, usuarios):
+    """
+    Retorna dict com os tempos de renderização (ms) e as requisições feitas
+    à API por usuário simulado (cada um abre uma sessão e escolhe outra moeda).
+    """
+    resultados = {}
+
+    sessao = nova_sessao()
+    antes = servidor.total()
+    tempo, _ = cronometrar(sessao.run)
+    resultados['pagina_fria_ms'] = tempo * 1000
+    resultados['requisicoes_pagina_fria'] = servidor.total() - antes
+    resultados['excecoes'] = [e.message for e in sessao.exception]
+
+    tempo, _ = cronometrar(sessao.run, 3)
+    resultados['rerun_ms'] = tempo * 1000
+
+    tempos, requisicoes = [], []
+    for usuario in range(usuarios):
+        sessao = nova_sessao()
+        antes = servidor.total()
+        inicio = time.perf_counter()
+        sessao.run()
+        tempos.append(time.perf_counter() - inicio)
+        if selecionar(sessao, usuario + 1) is not None:
+            sessao.run()
+        requisicoes.append(servidor.total() - antes)
+    resultados['sessao_nova_ms'] = min(tempos) * 1000 if tempos else 0.0
+    resultados['requisicoes_por_usuario'] = requisicoes
+    return resultados
+
+
+def card_detalhes(sessao):
+    """
+    Retorna o valor do card CARD_DETALHES da moeda em análise (ou None).
+    """
+    for card in sessao.metric:
+        if card.label == CARD_DETALHES:
+            return card.value
+    return None
+
+
+def _tick_com_mercado_novo(sessao, repeticao, servidor):
+    # Preços novos no stub e temporizador vencido: a seção de mercado força
+    # a coleta, e a de detalhes precisa mostrar o snapshot novo
+    servidor.mercado.precos_base *= 1.05
+    sessao.session_state['mercado_exibido_em'] = time.monotonic() - 3600
+
+
+def _filtrar_volatilidade(sessao, repeticao, servidor):
+    for faixa in sessao.slider:
+        if faixa.label.startswith("Volatilidade"):
+            faixa.set_range(0, 290 - repeticao)
+
+
+def _alternar_indicadores(sessao, repeticao, servidor):
+    for chave in sessao.toggle:
+        if "Indicadores técnicos" in chave.label:
+            chave.set_value(repeticao % 2 == 0)
+
+
+# Interação -> (ação na sessão, seção reexecutada pelo Streamlit)
+INTERACOES = {
+    'timer': (lambda sessao, repeticao, servidor: None, 'secao_mercado'),
+    'timer_detalhes': (_tick_com_mercado_novo, 'secao_detalhes'),
+    'selecionar_moeda': (lambda sessao, repeticao, servidor: selecionar(sessao, repeticao + 1), 'secao_detalhes'),
+    'filtro_triagem': (_filtrar_volatilidade, 'secao_triagem'),
+    'indicadores': (_alternar_indicadores, 'secao_detalhes'),
+}
+
+
+def medir_interacoes(servidor, repeticoes=REPETICOES_INTERACAO):
+    """
+    Retorna tupla (dict interação -> (ms do rerun completo, ms da seção),
+    ticks do temporizador em que os cards de detalhes não mudaram). O
+    AppTest sempre reexecuta o script inteiro; no navegador, cada interação
+    reexecuta só o fragmento da seção, cujo tempo vem das métricas
+    (secao_*). Medianas de `repeticoes` execuções.
+    """
+    from metricas import metricas
+
+    sessao = nova_sessao()
+    sessao.run()
+    sessao.run()
+    ativas, metricas.ativas = metricas.ativas, True
+    resultados, detalhes_parados = {}, 0
+    try:
+        for nome, (acao, secao) in INTERACOES.items():
+            completos, secoes = [], []
+            for repeticao in range(repeticoes):
+                antes = card_detalhes(sessao)
+                acao(sessao, repeticao, servidor)
+                metricas.zerar()
+                tempo, _ = cronometrar(sessao.run)
+                completos.append(tempo * 1000)
+                secoes.append(metricas.resumo()['etapas'].get(secao, {}).get('total_s', 0.0) * 1000)
+                if nome == 'timer_detalhes' and card_detalhes(sessao) == antes:
+                    detalhes_parados += 1
+            resultados[nome] = (statistics.median(completos), statistics.median(secoes))
+    finally:
+        metricas.ativas = ativas
+    return resultados, detalhes_parados
+
+
+def imprimir(resultados):
+    linhas = [
+        ("Dados", resultados['dados']),
+        ("Página (processo frio)", f"{resultados['pagina_fria_ms']:.0f} ms"),
+        ("Rerun da mesma sessão", f"{resultados['rerun_ms']:.0f} ms"),
+        ("Sessão nova (processo aquecido)", f"{resultados['sessao_nova_ms']:.0f} ms"),
+    ]
+    for tamanho, (ms, por_segundo) in resultados['ingestao'].items():
+        linhas.append((f"Ingestão {tamanho} moedas", f"{ms:.1f} ms  ({por_segundo:,.0f} moedas/s)"))
+    for tamanho, ms in resultados['tabela'].items():
+        linhas.append((f"Tabela de ranking {tamanho} moedas", f"{ms:.1f} ms"))
+    for tamanho, (barras, correlacao) in resultados['graficos_mercado'].items():
+        linhas.append((f"Gráficos do mercado {tamanho} moedas",
+                       f"{barras:.1f} ms barras e pizza | {correlacao:.1f} ms triagem e correlação"))
+    for dias, (frio, quente, serializacao) in resultados['graficos'].items():
+        linhas.append((f"Gráfico {dias} dias ({dias * 24} pontos)",
+                       f"{frio:.1f} ms frio | {quente:.2f} ms cache | {serializacao:.1f} ms to_json"))
+    for nome, (completo, secao) in resultados['interacoes'].items():
+        linhas.append((f"Interação {nome}", f"{completo:.0f} ms página inteira | {secao:.0f} ms só a seção"))
+    origens, ocupacao = resultados['orcamento']
+    linhas.append(("Limitador em segundo plano (req/min)",
+                   " | ".join(f"{origem} {por_minuto:.2f}" for origem, por_minuto in origens.items())))
+    linhas.append(("Ocupação do limitador (15/min)",
+                   f"{ocupacao:.0%} (máximo {OCUPACAO_MAXIMA:.0%})"))
+    linhas.append(("Requisições na página fria", str(resultados['requisicoes_pagina_fria'])))
+    linhas.append(("Requisições por usuário", str(resultados['requisicoes_por_usuario'])))
+    linhas.append(("Requisições por rota", str(resultados['rotas'])))
+    linhas.append(("Respostas 429 (novas tentativas)", str(resultados['respostas_429'])))
+
+    largura = max(len(nome) for nome, _ in linhas)
+    for nome, valor in linhas:
+        print(f"{nome:<{largura}}  {valor}")
+    for excecao in resultados['excecoes']:
+        print(f"Exceção na página: {excecao}")
+    if ocupacao > OCUPACAO_MAXIMA:
+        print("Consultas em segundo plano ocupam o limitador demais: pedidos interativos ficariam na fila.")
+    if resultados['detalhes_parados']:
+        print(f"Cards de detalhes sem o snapshot novo em {resultados['detalhes_parados']} tick(s) do temporizador.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do dashboard com fixtures da CoinGecko")
+    parser.add_argument('--usuarios', type=int, default=5)
+    parser.add_argument('--moedas', type=int, default=MOEDAS_PADRAO)
+    parser.add_argument('--fixtures', help="diretório com respostas gravadas")
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    parser.add_argument('--taxa-429', type=float, default=0.0)
+    parser.add_argument('--taxa', type=float, default=600, help="requisições por minuto do limitador")
+    parser.add_argument('--json', help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    servidor = ServidorFixtures(porta=0, moedas=args.moedas, diretorio=args.fixtures,
+                                latencia=args.latencia_ms / 1000, taxa_429=args.taxa_429).iniciar()
+    with tempfile.TemporaryDirectory() as diretorio:
+        preparar_ambiente(servidor, diretorio)
+
+        from cliente_api import obter_cliente
+        from limitador import CAPACIDADE_PADRAO, LimitadorTaxa
+
+        obter_cliente().limitador = LimitadorTaxa(taxa=args.taxa / 60, capacidade=CAPACIDADE_PADRAO)
+
+        resultados = medir_paginas(servidor, args.usuarios)
+        resultados['dados'] = (f"gravados em {args.fixtures} (sintéticos no que faltar)" if args.fixtures
+                               else "sintéticos (stub_coingecko.py)")
+        resultados['interacoes'], resultados['detalhes_parados'] = medir_interacoes(servidor)
+        resultados['orcamento'] = medir_orcamento_limitador()
+        resultados['ingestao'] = medir_ingestao()
+        resultados['tabela'] = medir_tabela()
+        resultados['graficos_mercado'] = medir_graficos_mercado()
+        resultados['graficos'] = medir_graficos()
+        resultados['rotas'] = {rota: n for rota, n in servidor.contagem.items() if rota != '429'}
+        resultados['respostas_429'] = servidor.contagem['429']
+        servidor.shutdown()
+
+    imprimir(resultados)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    sys.exit(1 if resultados['excecoes'] or resultados['detalhes_parados']
+             or resultados['orcamento'][1] > OCUPACAO_MAXIMA else 0)
+
+
+if __name__ == '__main__':
+    main()
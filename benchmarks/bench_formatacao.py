@@ -0,0 +1,89 @@
+"""
+Benchmark da montagem da tabela de ranking: df.apply linha a linha x vetorizado.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_formatacao [numero_linhas]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from formatacao import (formatar_numero, formatar_percentual, formatar_preco,
+                        montar_tabela_ranking, obter_emoji_variacao)
+
+
+def gerar_mercado(numero_linhas, semente=42):
+    """
+    Gera um DataFrame sintético com as colunas de /coins/markets usadas na tabela.
+    Inclui valores nulos e todas as faixas de preço e market cap.
+    """
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        'market_cap_rank': np.arange(1, numero_linhas + 1, dtype='float64'),
+        'name': [f"Moeda {i}" for i in range(numero_linhas)],
+        'symbol': [f"m{i}" for i in range(numero_linhas)],
+        'current_price': rng.lognormal(0, 6, numero_linhas),
+        'price_change_percentage_1h_in_currency': rng.normal(0, 1, numero_linhas),
+        'price_change_percentage_24h': rng.normal(0, 5, numero_linhas),
+        'price_change_percentage_7d_in_currency': rng.normal(0, 10, numero_linhas),
+        'total_volume': rng.lognormal(15, 5, numero_linhas),
+        'market_cap': rng.lognormal(18, 5, numero_linhas),
+    })
+    for coluna in df.columns[3:]:
+        df.loc[rng.random(numero_linhas) < 0.02, coluna] = np.nan
+    df.loc[rng.random(numero_linhas) < 0.02, 'market_cap_rank'] = np.nan
+    return df
+
+
+def montar_tabela_linha_a_linha(df):
+    """
+    Implementação anterior (df.apply por linha/célula), mantida como referência.
+    """
+    df_tabela = pd.DataFrame()
+    df_tabela['#'] = df['market_cap_rank'].fillna(0).astype(int)
+    df_tabela['Nome'] = df['name'] + ' (' + df['symbol'].str.upper() + ')'
+    df_tabela['Preço'] = df['current_price'].apply(formatar_preco)
+    for coluna, titulo in [('price_change_percentage_1h_in_currency', '1h'),
+                           ('price_change_percentage_24h', '24h'),
+                           ('price_change_percentage_7d_in_currency', '7d')]:
+        df_tabela[titulo] = df.apply(
+            lambda x: f"{obter_emoji_variacao(x[coluna])} {formatar_percentual(x[coluna])}",
+            axis=1
+        )
+    df_tabela['Volume 24h'] = df['total_volume'].apply(formatar_numero)
+    df_tabela['Market Cap'] = df['market_cap'].apply(formatar_numero)
+    return df_tabela
+
+
+def medir(funcao, df, repeticoes=5):
+    """
+    Retorna o menor tempo (segundos) entre as repetições e o último resultado.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(df)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    numero_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    df = gerar_mercado(numero_linhas)
+
+    tempo_antigo, tabela_antiga = medir(montar_tabela_linha_a_linha, df)
+    tempo_novo, tabela_nova = medir(montar_tabela_ranking, df)
+
+    # As duas implementações precisam produzir exatamente o mesmo texto
+    pd.testing.assert_frame_equal(tabela_antiga, tabela_nova, check_dtype=False)
+
+    print(f"Linhas: {numero_linhas}")
+    print(f"df.apply linha a linha: {tempo_antigo * 1000:9.1f} ms")
+    print(f"Vetorizado:             {tempo_novo * 1000:9.1f} ms")
+    print(f"Ganho:                  {tempo_antigo / tempo_novo:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
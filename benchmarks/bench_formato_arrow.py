@@ -0,0 +1,86 @@
+"""
+Benchmark da serialização do serviço de dados (Arrow IPC x Parquet).
+
+Mede tamanho e tempo de ida e volta do snapshot de mercado e de uma série
+histórica, e confere que a volta reproduz o original: colunas, sparklines,
+campos do snapshot e a idade da série (df.attrs['idade']).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_formato_arrow [numero_moedas]
+"""
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_memoria_snapshot import gerar_payload
+from coletor_mercado import SnapshotMercado
+from formato_arrow import (bytes_para_historico, bytes_para_snapshot, historico_para_bytes,
+                           snapshot_para_bytes)
+from mudancas_mercado import AGREGADOS_VAZIOS, SEM_MUDANCAS
+from snapshot_compacto import compactar_pagina, unir_paginas
+
+FORMATOS = ('arrow', 'parquet')
+PONTOS_HISTORICO = 720
+
+
+def gerar_historico(pontos=PONTOS_HISTORICO, idade=42.5):
+    """
+    Gera uma série horária (timestamp, price) com a idade em df.attrs.
+    """
+    agora_ms = 1_700_000_000_000
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(agora_ms - np.arange(pontos)[::-1] * 3600 * 1000, unit='ms'),
+        'price': 100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, pontos))),
+    })
+    df.attrs['idade'] = idade
+    return df
+
+
+def ida_e_volta(serializar, reconstruir):
+    """
+    Retorna tupla (bytes, ms para serializar, ms para reconstruir, resultado).
+    """
+    inicio = time.perf_counter()
+    conteudo = serializar()
+    meio = time.perf_counter()
+    resultado = reconstruir(conteudo)
+    fim = time.perf_counter()
+    return len(conteudo), (meio - inicio) * 1000, (fim - meio) * 1000, resultado
+
+
+def main():
+    numero_moedas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    df, sparklines = unir_paginas({1: (compactar_pagina(pd.DataFrame(gerar_payload(numero_moedas))), 0.0)})
+    snapshot = SnapshotMercado(df, sparklines, datetime(2026, 10, 17, 12, 0), 7, None, SEM_MUDANCAS, AGREGADOS_VAZIOS)
+    historico = gerar_historico()
+
+    for formato in FORMATOS:
+        tamanho, escrita, leitura, volta = ida_e_volta(
+            lambda: snapshot_para_bytes(snapshot, formato),
+            lambda conteudo: bytes_para_snapshot(conteudo, RuntimeError, formato))
+        pd.testing.assert_frame_equal(volta.df, snapshot.df, check_dtype=False, check_categorical=False)
+        np.testing.assert_array_equal(volta.sparklines, snapshot.sparklines)
+        assert (volta.versao, volta.atualizado_em) == (snapshot.versao, snapshot.atualizado_em)
+        print(f"Snapshot {numero_moedas} moedas ({formato}): {tamanho / 1e3:.0f} kB | "
+              f"{escrita:.1f} ms escrita | {leitura:.1f} ms leitura")
+
+        tamanho, escrita, leitura, volta = ida_e_volta(
+            lambda: historico_para_bytes(historico, formato),
+            lambda conteudo: bytes_para_historico(conteudo, formato))
+        pd.testing.assert_frame_equal(volta, historico, check_dtype=False)
+        assert volta.attrs['idade'] == historico.attrs['idade'], volta.attrs
+        print(f"Histórico {PONTOS_HISTORICO} pontos ({formato}): {tamanho / 1e3:.1f} kB | "
+              f"{escrita:.1f} ms escrita | {leitura:.1f} ms leitura")
+
+    # Série sem idade conhecida continua sem idade
+    sem_idade = historico.copy()
+    sem_idade.attrs.clear()
+    assert bytes_para_historico(historico_para_bytes(sem_idade)).attrs['idade'] is None
+    print("Ida e volta reproduzem snapshot e histórico (com a idade dos dados).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark dos indicadores técnicos: cálculo completo x incremental.
+
+Confere que os caminhos incrementais produzem o mesmo resultado de um
+cálculo do zero (MotorIndicadores.anexar e IndicadoresSeries, com a janela
+ganhando pontos no fim e andando para frente) e mede os tempos.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_indicadores [numero_moedas]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicadores import Indicadores, IndicadoresSeries, MotorIndicadores
+
+PONTOS_SPARKLINE = 168
+PONTOS_SERIE = 720
+PONTOS_NOVOS = 80
+
+
+def gerar_precos(moedas, pontos, semente=42):
+    """
+    Gera uma matriz (moedas × pontos) de passeios aleatórios com alguns preços ausentes.
+    """
+    rng = np.random.default_rng(semente)
+    precos = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (moedas, pontos)), axis=1))
+    precos[rng.random((moedas, pontos)) < 0.01] = np.nan
+    return precos
+
+
+def gerar_serie(precos, inicio=0):
+    """
+    Retorna DataFrame timestamp/price horário; `inicio` desloca a janela em horas.
+    """
+    agora_ms = 1_700_000_000_000
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(agora_ms + (inicio + np.arange(len(precos))) * 3600 * 1000, unit='ms'),
+        'price': precos,
+    })
+
+
+def conferir(calculado, esperado, contexto):
+    """
+    Lança AssertionError se algum indicador diferir do cálculo do zero.
+    """
+    for nome, valores, referencia in zip(Indicadores._fields, calculado, esperado):
+        np.testing.assert_allclose(valores, referencia, rtol=1e-9, atol=1e-9, equal_nan=True,
+                                   err_msg=f"{contexto}: {nome}")
+
+
+def medir(funcao, repeticoes=5):
+    """
+    Retorna o menor tempo (segundos) entre as repetições e o último resultado.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    moedas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    precos = gerar_precos(moedas, PONTOS_SPARKLINE)
+
+    # Matriz dos sparklines: completo x anexando as últimas colunas
+    tempo_completo, completo = medir(lambda: MotorIndicadores().calcular(precos))
+    motor = MotorIndicadores()
+    motor.calcular(precos[:, :-1])
+    inicio = time.perf_counter()
+    incremental = motor.anexar(precos[:, -1:])
+    tempo_anexar = time.perf_counter() - inicio
+    conferir(incremental, completo, "sparklines anexando 1 coluna")
+
+    # Série de 30 dias: ganhando pontos no fim e com a janela andando
+    serie = gerar_precos(1, PONTOS_SERIE + PONTOS_NOVOS)[0]
+    series = IndicadoresSeries()
+    series.obter('serie', gerar_serie(serie[:PONTOS_SERIE]))
+    for descartados in (0, PONTOS_NOVOS):
+        df = gerar_serie(serie[descartados:PONTOS_SERIE + PONTOS_NOVOS], descartados)
+        obtido = series.obter('serie', df)
+        esperado = IndicadoresSeries().obter('serie', df)
+        pd.testing.assert_frame_equal(obtido, esperado, check_exact=False, rtol=1e-9, atol=1e-9)
+    tempo_serie, _ = medir(lambda: IndicadoresSeries().obter('serie', df))
+
+    print(f"Sparklines {moedas} moedas × {PONTOS_SPARKLINE} pontos: {tempo_completo * 1000:.1f} ms completo | "
+          f"{tempo_anexar * 1000:.1f} ms anexando 1 coluna")
+    print(f"Série de {PONTOS_SERIE} pontos: {tempo_serie * 1000:.1f} ms do zero "
+          f"({series.incrementais} incremental, {series.recalculos} recálculos)")
+    print("Incremental e cálculo do zero coincidem.")
+
+
+if __name__ == '__main__':
+    main()
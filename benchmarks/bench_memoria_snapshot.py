@@ -0,0 +1,62 @@
+"""
+Relatório de memória: DataFrame bruto de /coins/markets x snapshot compacto.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_memoria_snapshot [numero_moedas]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from snapshot_compacto import PONTOS_SPARKLINE, compactar_pagina, relatorio_memoria, unir_paginas
+
+
+def gerar_payload(numero_moedas, semente=42):
+    """
+    Gera uma lista de dicts no formato de /coins/markets (com sparkline_in_7d).
+    """
+    rng = np.random.default_rng(semente)
+    payload = []
+    for rank in range(1, numero_moedas + 1):
+        preco = float(rng.lognormal(0, 4))
+        payload.append({
+            'id': f"moeda-{rank}", 'symbol': f"m{rank}", 'name': f"Moeda {rank}",
+            'image': f"https://assets.coingecko.com/coins/images/{rank}/large/moeda.png",
+            'current_price': preco, 'market_cap': float(rng.lognormal(18, 3)), 'market_cap_rank': rank,
+            'fully_diluted_valuation': None, 'total_volume': float(rng.lognormal(15, 3)),
+            'high_24h': preco * 1.02, 'low_24h': preco * 0.98, 'price_change_24h': 0.01,
+            'price_change_percentage_24h': float(rng.normal(0, 5)),
+            'market_cap_change_24h': 1000.0, 'market_cap_change_percentage_24h': 0.5,
+            'circulating_supply': 1e9, 'total_supply': 1e9, 'max_supply': None,
+            'ath': preco * 3, 'ath_change_percentage': -66.0, 'ath_date': '2021-11-10T14:24:11.849Z',
+            'atl': preco / 3, 'atl_change_percentage': 200.0, 'atl_date': '2015-10-20T00:00:00.000Z',
+            'roi': {'times': 1.5, 'currency': 'usd', 'percentage': 150.0},
+            'last_updated': '2026-10-17T12:00:00.000Z',
+            'sparkline_in_7d': {'price': (preco * (1 + rng.normal(0, 0.01, PONTOS_SPARKLINE))).tolist()},
+            'price_change_percentage_1h_in_currency': float(rng.normal(0, 1)),
+            'price_change_percentage_24h_in_currency': float(rng.normal(0, 5)),
+            'price_change_percentage_30d_in_currency': float(rng.normal(0, 20)),
+            'price_change_percentage_7d_in_currency': float(rng.normal(0, 10)),
+        })
+    return payload
+
+
+def main():
+    numero_moedas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payload = gerar_payload(numero_moedas)
+
+    df_bruto = pd.DataFrame(payload)
+    df_compacto, sparklines = unir_paginas({1: (compactar_pagina(df_bruto), 0.0)})
+    relatorio = relatorio_memoria(df_bruto, df_compacto, sparklines)
+
+    print(f"Moedas:              {relatorio['moedas']}")
+    print(f"DataFrame bruto:     {relatorio['bruto_bytes'] / 1e6:9.2f} MB")
+    print(f"Snapshot compacto:   {relatorio['compacto_bytes'] / 1e6:9.2f} MB")
+    print(f"  colunas:           {relatorio['dataframe_bytes'] / 1e6:9.2f} MB")
+    print(f"  sparklines:        {relatorio['sparklines_bytes'] / 1e6:9.2f} MB")
+    print(f"Redução:             {relatorio['reducao']:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Servidor de fixtures da CoinGecko para os benchmarks.
+
+Reproduz respostas gravadas de /coins/markets e /coins/{id}/market_chart
+(com os timestamps deslocados para terminar no momento atual) e, para o que
+não foi gravado, responde com o mercado sintético do stub_coingecko.py.
+Permite injetar latência e respostas 429 (com Retry-After) e conta as
+requisições recebidas por rota.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.servidor_fixtures [--porta 8200] [--latencia-ms 80] [--taxa-429 0.05]
+    python -m benchmarks.servidor_fixtures --gravar benchmarks/fixtures --origem https://api.coingecko.com/api/v3
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from stub_coingecko import (MOEDAS_PADRAO, PREFIXO, ROTA_GRAFICO, ManipuladorStub,
+                            MercadoSintetico)
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8200
+
+
+def _arquivo_mercado(pagina, por_pagina):
+    return f"markets_p{pagina}_{por_pagina}.json"
+
+
+def _arquivo_grafico(cripto_id):
+    return f"market_chart_{cripto_id}.json"
+
+
+class Fixtures:
+    """
+    Respostas gravadas em um diretório (uma por arquivo JSON).
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio
+        self._cache = {}
+
+    def _ler(self, nome):
+        if not self.diretorio:
+            return None
+        if nome not in self._cache:
+            caminho = os.path.join(self.diretorio, nome)
+            if os.path.exists(caminho):
+                with open(caminho, encoding='utf-8') as arquivo:
+                    self._cache[nome] = json.load(arquivo)
+            else:
+                self._cache[nome] = None
+        return self._cache[nome]
+
+    def mercado(self, pagina, por_pagina):
+        """
+        Retorna a página gravada de /coins/markets (ou None).
+        """
+        return self._ler(_arquivo_mercado(pagina, por_pagina))
+
+    def grafico(self, cripto_id, inicio_ms, fim_ms, agora_ms):
+        """
+        Retorna os preços gravados da moeda entre dois timestamps (ou None),
+        deslocados para que o último ponto gravado caia em `agora_ms`.
+        """
+        gravado = self._ler(_arquivo_grafico(cripto_id))
+        if not gravado or not gravado.get('prices'):
+            return None
+        deslocamento = agora_ms - gravado['prices'][-1][0]
+        return [[ts + deslocamento, preco] for ts, preco in gravado['prices']
+                if inicio_ms <= ts + deslocamento <= fim_ms]
+
+
+def gravar_fixtures(diretorio, url_base, paginas=2, por_pagina=250, moedas_historico=20, dias=90):
+    """
+    Grava respostas reais (ou de outro servidor) em `diretorio`: as primeiras
+    páginas de /coins/markets e o market_chart das primeiras moedas.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    sessao = requests.Session()
+    ids = []
+    for pagina in range(1, paginas + 1):
+        params = {'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': por_pagina,
+                  'page': pagina, 'sparkline': 'true', 'price_change_percentage': '1h,24h,7d,30d'}
+        dados = sessao.get(f"{url_base}/coins/markets", params=params, timeout=30).json()
+        with open(os.path.join(diretorio, _arquivo_mercado(pagina, por_pagina)), 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        ids.extend(item['id'] for item in dados)
+        # Respeita o limite do plano gratuito
+        time.sleep(4)
+
+    for cripto_id in ids[:moedas_historico]:
+        dados = sessao.get(f"{url_base}/coins/{cripto_id}/market_chart",
+                           params={'vs_currency': 'usd', 'days': dias}, timeout=30).json()
+        with open(os.path.join(diretorio, _arquivo_grafico(cripto_id)), 'w', encoding='utf-8') as arquivo:
+            json.dump({'prices': dados.get('prices') or []}, arquivo)
+        time.sleep(4)
+
+
+class ManipuladorFixtures(ManipuladorStub):
+    """
+    Rotas do stub com fixtures gravadas, latência e 429 injetados.
+    """
+
+    def _responder_429(self):
+        corpo = b'{"status": {"error_code": 429, "error_message": "Too Many Requests"}}'
+        self.send_response(429)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Retry-After', str(self.server.retry_after))
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        servidor = self.server
+        url = urlparse(self.path)
+        params = {nome: valores[-1] for nome, valores in parse_qs(url.query).items()}
+        caminho = url.path[len(PREFIXO):] if url.path.startswith(PREFIXO) else url.path
+        grafico = ROTA_GRAFICO.match(caminho)
+        rota = '/coins/{id}/market_chart' + (grafico.group(2) or '') if grafico else caminho
+        servidor.registrar(rota)
+
+        if servidor.latencia > 0:
+            time.sleep(servidor.latencia)
+        if servidor.sortear_429():
+            servidor.registrar('429')
+            self._responder_429()
+            return
+
+        if caminho == '/coins/markets':
+            gravada = servidor.fixtures.mercado(int(params.get('page', 1)), int(params.get('per_page', 100)))
+            if gravada is not None:
+                self._json(200, gravada)
+                return
+        elif grafico:
+            agora_ms = int(time.time() * 1000)
+            if grafico.group(2):
+                inicio_ms, fim_ms = int(params['from']) * 1000, int(params['to']) * 1000
+            else:
+                inicio_ms = agora_ms - int(float(params.get('days', 1)) * 86400 * 1000)
+                fim_ms = agora_ms
+            gravados = servidor.fixtures.grafico(grafico.group(1), inicio_ms, fim_ms, agora_ms)
+            if gravados is not None:
+                self._json(200, {'prices': gravados, 'market_caps': [], 'total_volumes': []})
+                return
+
+        super().do_GET()
+
+
+class ServidorFixtures(ThreadingHTTPServer):
+    """
+    Servidor HTTP de fixtures, com contadores de requisições por rota.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host=HOST_PADRAO, porta=PORTA_PADRAO, moedas=MOEDAS_PADRAO, diretorio=None,
+                 latencia=0.0, taxa_429=0.0, retry_after=1, semente=0):
+        super().__init__((host, porta), ManipuladorFixtures)
+        self.mercado = MercadoSintetico(moedas)
+        self.fixtures = Fixtures(diretorio)
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.contagem = Counter()
+        self._aleatorio = random.Random(semente)
+        self._trava = threading.Lock()
+        self._thread = None
+
+    @property
+    def url_base(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}{PREFIXO}"
+
+    def registrar(self, rota):
+        with self._trava:
+            self.contagem[rota] += 1
+
+    def sortear_429(self):
+        with self._trava:
+            return self._aleatorio.random() < self.taxa_429
+
+    def total(self):
+        """
+        Retorna o total de requisições recebidas (sem contar as respostas 429 à parte).
+        """
+        with self._trava:
+            return sum(n for rota, n in self.contagem.items() if rota != '429')
+
+    def iniciar(self):
+        """
+        Inicia o servidor em uma thread (para uso dentro do próprio benchmark).
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="servidor-fixtures", daemon=True)
+        self._thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de fixtures da CoinGecko")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--moedas', type=int, default=MOEDAS_PADRAO)
+    parser.add_argument('--fixtures', help="diretório com respostas gravadas")
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    parser.add_argument('--taxa-429', type=float, default=0.0)
+    parser.add_argument('--gravar', help="grava fixtures neste diretório e sai")
+    parser.add_argument('--origem', default="https://api.coingecko.com/api/v3")
+    args = parser.parse_args()
+
+    if args.gravar:
+        gravar_fixtures(args.gravar, args.origem)
+        return
+
+    servidor = ServidorFixtures(args.host, args.porta, args.moedas, args.fixtures,
+                                args.latencia_ms / 1000, args.taxa_429)
+    print(f"Fixtures da CoinGecko em {servidor.url_base}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(dict(servidor.contagem))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Conversão local de moeda a partir do snapshot em USD.
+
+Uma única tabela de câmbio (/exchange_rates), renovada a cada
+INTERVALO_CAMBIO segundos, converte preços, market caps, volumes e séries
+históricas com uma multiplicação vetorizada. Cada moeda de exibição
+adicional não custa nenhuma requisição nem cópia do snapshot: só a fatia
+exibida (Top N, uma série) é convertida, a cada renderização.
+
+A CoinGecko informa quanto 1 BTC vale em cada moeda; o fator de USD para
+a moeda X é valor[X] / valor['usd'].
+
+A primeira busca passa por um VooUnico: sessões simultâneas esperam a mesma
+requisição e, se ela falhar, recebem o erro guardado (e exibem USD) durante
+ESPERA_ERRO_CAMBIO segundos, em vez de repetir a chamada a cada rerun.
+"""
+import threading
+import time
+
+from cliente_api import obter_cliente
+from voo_unico import VooUnico
+
+# Intervalo entre renovações da tabela de câmbio (segundos)
+INTERVALO_CAMBIO = 3600
+
+# Espera após uma falha antes de consultar /exchange_rates de novo (segundos)
+ESPERA_ERRO_CAMBIO = 60
+
+# Moedas oferecidas no seletor: código -> rótulo
+MOEDAS_EXIBICAO = {
+    'usd': "Dólar americano (USD)",
+    'brl': "Real (BRL)",
+    'eur': "Euro (EUR)",
+}
+
+MOEDA_BASE = 'usd'
+
+# Colunas monetárias do snapshot (percentuais não mudam com a moeda)
+COLUNAS_MONETARIAS = ['current_price', 'high_24h', 'low_24h', 'market_cap', 'total_volume']
+
+# Colunas de preço das séries (histórico e indicadores sobrepostos)
+COLUNAS_SERIE = ['price', 'media', 'ema', 'banda_superior', 'banda_inferior']
+
+
+class MoedaIndisponivel(KeyError):
+    """
+    A tabela de câmbio não tem taxa para a moeda pedida.
+    """
+
+
+def buscar_fatores_coingecko():
+    """
+    Consulta /exchange_rates e retorna dict moeda -> fator de conversão a partir de USD.
+    Lança exceções do cliente da API em caso de falha.
+    """
+    taxas = obter_cliente().obter('/exchange_rates', timeout=10)['rates']
+    dolar = float(taxas[MOEDA_BASE]['value'])
+    return {moeda: float(taxa['value']) / dolar for moeda, taxa in taxas.items()}
+
+
+class TabelaCambio:
+    """
+    Fatores de conversão a partir de USD, compartilhados pelas sessões.
+    Tabela vencida é servida enquanto a nova é buscada em segundo plano;
+    depois de uma falha, nenhuma busca é feita por `espera_erro` segundos.
+    """
+
+    def __init__(self, buscar=buscar_fatores_coingecko, intervalo=INTERVALO_CAMBIO, espera_erro=ESPERA_ERRO_CAMBIO):
+        self.buscar = buscar
+        self.intervalo = intervalo
+        self.espera_erro = espera_erro
+        self.erro = None
+        self._fatores = None
+        self._obtida_em = None
+        self._falhou_em = None
+        self._renovando = False
+        self._trava = threading.Lock()
+        self._voo = VooUnico(validade_erro=espera_erro)
+
+    def idade(self):
+        """
+        Retorna a idade da tabela em segundos (ou None se nunca foi obtida).
+        """
+        return None if self._obtida_em is None else time.time() - self._obtida_em
+
+    def _em_espera(self):
+        return self._falhou_em is not None and time.monotonic() - self._falhou_em < self.espera_erro
+
+    def _renovar(self):
+        try:
+            fatores = self.buscar()
+        except Exception as e:
+            with self._trava:
+                self.erro, self._falhou_em = e, time.monotonic()
+            raise
+        finally:
+            with self._trava:
+                self._renovando = False
+        with self._trava:
+            self._fatores, self._obtida_em, self.erro, self._falhou_em = fatores, time.time(), None, None
+        return fatores
+
+    def _renovar_em_segundo_plano(self):
+        try:
+            self._renovar()
+        except Exception:
+            # Segue com a tabela anterior; o erro fica em self.erro
+            pass
+
+    def fatores(self):
+        """
+        Retorna dict moeda -> fator. Busca a tabela na primeira chamada, uma
+        única vez para as chamadas concorrentes (lança exceções do cliente da
+        API se falhar, e a mesma falha até passar `espera_erro`); depois,
+        renova em segundo plano quando vencida.
+        """
+        with self._trava:
+            fatores, idade = self._fatores, self.idade()
+            vencida = fatores is not None and idade > self.intervalo and not self._renovando and not self._em_espera()
+            if vencida:
+                self._renovando = True
+        if fatores is None:
+            return self._voo.executar('fatores', self._renovar)
+        if vencida:
+            threading.Thread(target=self._renovar_em_segundo_plano, name="renovacao-cambio", daemon=True).start()
+        return fatores
+
+    def fator(self, moeda):
+        """
+        Retorna o fator de USD para `moeda` (1.0 para USD, sem consultar a tabela).
+        Lança MoedaIndisponivel se a tabela não tiver a moeda.
+        """
+        if moeda == MOEDA_BASE:
+            return 1.0
+        fatores = self.fatores()
+        if moeda not in fatores:
+            raise MoedaIndisponivel(moeda)
+        return fatores[moeda]
+
+
+def converter(df, fator, colunas):
+    """
+    Retorna df com as colunas presentes em `colunas` multiplicadas por
+    `fator` (o próprio df se o fator for 1). Não modifica o original.
+    """
+    if fator == 1.0:
+        return df
+    convertido = df.assign(**{coluna: df[coluna] * fator for coluna in colunas if coluna in df.columns})
+    convertido.attrs = dict(df.attrs)
+    return convertido
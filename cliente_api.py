@@ -0,0 +1,166 @@
+"""
+Cliente HTTP compartilhado para a API CoinGecko.
+
+Usa uma única requests.Session por processo (pool de conexões e keep-alive),
+passa cada requisição pelo limitador de taxa compartilhado, repete
+requisições que recebem 429/5xx com espera exponencial respeitando o
+cabeçalho Retry-After e oferece uma API asyncio para buscas concorrentes.
+Requisições idênticas simultâneas viram uma só (ver voo_unico.py).
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from limitador import LimitadorTaxa
+from metricas import metricas
+from voo_unico import VooUnico
+
+# COINGECKO_URL_BASE permite apontar para outro endereço (ex.: stub_coingecko.py)
+URL_BASE = os.environ.get('COINGECKO_URL_BASE', "https://api.coingecko.com/api/v3")
+
+# Status que valem uma nova tentativa
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+
+def interpretar_retry_after(valor):
+    """
+    Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos.
+    Retorna None se o valor estiver ausente ou for inválido.
+    """
+    if not valor:
+        return None
+
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+
+
+class ClienteCoinGecko:
+    """
+    Cliente com pool de conexões, keep-alive e novas tentativas com backoff.
+    Seguro para uso por várias threads (sessões e coletores em segundo plano).
+    """
+
+    def __init__(self, url_base=URL_BASE, tentativas=4, espera_base=1.0,
+                 espera_maxima=30.0, tamanho_pool=10, limitador=None):
+        self.url_base = url_base.rstrip('/')
+        self.limitador = limitador if limitador is not None else LimitadorTaxa()
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.voo = VooUnico()
+
+        self.sessao = requests.Session()
+        self.sessao.headers.update({'Accept': 'application/json'})
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+
+    def _espera(self, tentativa, resposta=None):
+        """
+        Calcula a espera antes da próxima tentativa (Retry-After tem prioridade).
+        """
+        if resposta is not None:
+            retry_after = interpretar_retry_after(resposta.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        espera = self.espera_base * (2 ** tentativa)
+        return min(self.espera_maxima, espera + random.uniform(0, self.espera_base))
+
+    def obter(self, caminho, params=None, timeout=10):
+        """
+        Faz um GET em url_base + caminho e retorna o JSON da resposta.
+        Chamadas simultâneas com o mesmo caminho e parâmetros compartilham uma
+        única requisição; o JSON retornado não deve ser modificado.
+        Lança requests.exceptions.RequestException se todas as tentativas falharem.
+        """
+        chave = (caminho, tuple(sorted((params or {}).items())))
+        return self.voo.executar(chave, self._obter, caminho, params, timeout)
+
+    def _obter(self, caminho, params, timeout):
+        url = f"{self.url_base}{caminho}"
+        # Retry-After de um 429 aplicado ao limitador, somado à espera tolerada na fila
+        penalidade = 0.0
+
+        for tentativa in range(self.tentativas):
+            ultima = tentativa == self.tentativas - 1
+            # A fila do limitador não pode esperar mais que o tolerado
+            with metricas.medir('api_fila_limitador'):
+                self.limitador.adquirir(timeout=self.espera_maxima + penalidade)
+            penalidade = 0.0
+            try:
+                with metricas.medir('api_requisicao'):
+                    resposta = self.sessao.get(url, params=params, timeout=timeout)
+            except requests.exceptions.ConnectionError:
+                metricas.contar('api_respostas', status='conexao')
+                if ultima:
+                    raise
+                metricas.contar('api_novas_tentativas', motivo='conexao')
+                time.sleep(self._espera(tentativa))
+                continue
+
+            metricas.contar('api_respostas', status=resposta.status_code)
+            if resposta.status_code in STATUS_REPETIVEIS and not ultima:
+                espera = self._espera(tentativa, resposta)
+                # Retry-After maior que o tolerado: desistir em vez de travar a página
+                if espera <= self.espera_maxima:
+                    metricas.contar('api_novas_tentativas', motivo=resposta.status_code)
+                    if resposta.status_code == 429:
+                        # Limite global atingido: todas as requisições do processo aguardam
+                        self.limitador.penalizar(espera)
+                        penalidade = espera
+                    else:
+                        time.sleep(espera)
+                    continue
+
+            resposta.raise_for_status()
+            with metricas.medir('api_decodificar_json'):
+                return resposta.json()
+
+    async def obter_async(self, caminho, params=None, timeout=10):
+        """
+        Versão asyncio de obter(); a requisição roda em uma thread do executor
+        e reaproveita o mesmo pool de conexões.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.obter(caminho, params, timeout))
+
+    async def obter_varios(self, requisicoes, timeout=10):
+        """
+        Busca vários endpoints concorrentemente.
+        Recebe lista de (caminho, params) e retorna lista de JSONs ou exceções,
+        na mesma ordem.
+        """
+        tarefas = [self.obter_async(caminho, params, timeout) for caminho, params in requisicoes]
+        return await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+_cliente = None
+_trava_cliente = threading.Lock()
+
+
+def obter_cliente():
+    """
+    Retorna o cliente compartilhado do processo, criando-o na primeira chamada.
+    """
+    global _cliente
+    with _trava_cliente:
+        if _cliente is None:
+            _cliente = ClienteCoinGecko()
+        return _cliente
@@ -0,0 +1,188 @@
+"""
+Cliente do serviço de dados (servico_dados.py) usado pelas réplicas do dashboard.
+
+Oferece a mesma interface que o app usa localmente: a do coletor de mercado
+(aguardar_snapshot, atualizar_agora), a do aquecedor (registrar_visiveis),
+a do armazém de histórico (obter, obter_janela) e a busca da tabela de
+câmbio (fatores_cambio). ProdutorServico alimenta o fluxo de preços ao
+vivo da réplica com os ticks do serviço. O snapshot é pedido com
+If-None-Match: enquanto a versão não muda, o serviço responde 304 e a
+réplica reaproveita o snapshot já decodificado.
+"""
+import threading
+import time
+
+import requests
+
+from aquecimento import MOEDAS_VISIVEIS_PADRAO
+from coletor_mercado import SNAPSHOT_VAZIO, ColunaAusenteError
+from fluxo_precos import Tick
+from formato_arrow import bytes_para_historico, bytes_para_snapshot
+from limitador import EsperaLimitadorExcedida
+
+# Exceções reconstruídas a partir do tipo informado pelo serviço
+ERROS_CONHECIDOS = {
+    'ColunaAusenteError': ColunaAusenteError,
+    'EsperaLimitadorExcedida': EsperaLimitadorExcedida,
+    'Timeout': requests.exceptions.Timeout,
+    'ReadTimeout': requests.exceptions.ReadTimeout,
+    'ConnectTimeout': requests.exceptions.ConnectTimeout,
+    'HTTPError': requests.exceptions.HTTPError,
+    'ConnectionError': requests.exceptions.ConnectionError,
+    'RequestException': requests.exceptions.RequestException,
+}
+
+# Intervalo entre leituras dos ticks ao vivo no serviço (segundos)
+INTERVALO_LEITURA_FLUXO = 2
+
+ESTATISTICAS_VAZIAS = {'fila': 0, 'tokens': 0.0, 'total': 0, 'imediatas': 0,
+                       'espera_media': 0.0, 'espera_maxima': 0.0}
+
+
+def reconstruir_erro(descricao):
+    """
+    Converte a descrição {tipo, mensagem} enviada pelo serviço em exceção.
+    Retorna None se não houver erro.
+    """
+    if not descricao:
+        return None
+    classe = ERROS_CONHECIDOS.get(descricao.get('tipo'), Exception)
+    return classe(descricao.get('mensagem', ''))
+
+
+class ClienteServicoDados:
+    """
+    Acesso HTTP ao serviço de dados, compartilhado pelas sessões da réplica.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        self._snapshot = SNAPSHOT_VAZIO
+        self._etag = None
+        self._visiveis = MOEDAS_VISIVEIS_PADRAO
+        self._estatisticas = ESTATISTICAS_VAZIAS
+        self._trava = threading.Lock()
+
+    def _requisitar(self, metodo, caminho, params=None, cabecalhos=None):
+        resposta = self.sessao.request(metodo, self.url + caminho, params=params,
+                                       headers=cabecalhos, timeout=self.timeout)
+        if resposta.status_code >= 400:
+            try:
+                descricao = resposta.json()
+            except ValueError:
+                descricao = None
+            if descricao and descricao.get('tipo'):
+                raise reconstruir_erro(descricao)
+            resposta.raise_for_status()
+        return resposta
+
+    def _receber_snapshot(self, metodo, caminho, params):
+        with self._trava:
+            etag, anterior = self._etag, self._snapshot
+        try:
+            resposta = self._requisitar(metodo, caminho, params,
+                                        {'If-None-Match': etag} if etag else None)
+        except requests.exceptions.RequestException as e:
+            # Serviço fora do ar: segue com o último snapshot, registrando o erro
+            return anterior._replace(erro=e)
+
+        if resposta.status_code == 304:
+            return anterior
+        snapshot = bytes_para_snapshot(resposta.content, reconstruir_erro)
+        with self._trava:
+            self._snapshot, self._etag = snapshot, resposta.headers.get('ETag')
+        return snapshot
+
+    def registrar_visiveis(self, numero_moedas):
+        """
+        Registra o Top N exibido (enviado ao serviço no próximo pedido).
+        """
+        self._visiveis = numero_moedas
+
+    def snapshot(self):
+        """
+        Retorna o snapshot mais recente do serviço, sem esperar coleta.
+        """
+        return self._receber_snapshot('GET', '/mercado', {'visiveis': self._visiveis, 'espera': 0})
+
+    def aguardar_snapshot(self, timeout=15):
+        """
+        Retorna o snapshot mais recente, esperando a primeira coleta se necessário.
+        """
+        return self._receber_snapshot('GET', '/mercado', {'visiveis': self._visiveis, 'espera': timeout})
+
+    def atualizar_agora(self, timeout=15):
+        """
+        Pede ao serviço uma nova coleta e retorna o snapshot resultante.
+        """
+        return self._receber_snapshot('POST', '/mercado/atualizar', None)
+
+    def obter(self, cripto_id, dias):
+        """
+        Retorna a fatia dos últimos `dias` do histórico da moeda.
+        Lança exceções do cliente da API em caso de falha.
+        """
+        resposta = self._requisitar('GET', f'/historico/{cripto_id}', {'dias': dias})
+        return bytes_para_historico(resposta.content)
+
+    def obter_janela(self, cripto_id, inicio_ms, fim_ms):
+        """
+        Retorna a janela [inicio_ms, fim_ms] do histórico da moeda.
+        """
+        resposta = self._requisitar('GET', f'/historico/{cripto_id}', {'inicio': inicio_ms, 'fim': fim_ms})
+        return bytes_para_historico(resposta.content)
+
+    def invalidar_historico(self, cripto_id=None):
+        """
+        Pede ao serviço que marque a série da moeda (ou todas) como vencida.
+        """
+        caminho = f'/historico/{cripto_id}/invalidar' if cripto_id is not None else '/historico/invalidar'
+        self._requisitar('POST', caminho)
+
+    def estatisticas_limitador(self):
+        """
+        Retorna as estatísticas do limitador de taxa do serviço (as últimas
+        conhecidas, se o serviço não responder).
+        """
+        try:
+            self._estatisticas = self._requisitar('GET', '/saude').json()['limitador']
+        except requests.exceptions.RequestException:
+            pass
+        return self._estatisticas
+
+    def fatores_cambio(self):
+        """
+        Retorna os fatores de conversão a partir de USD conhecidos pelo serviço.
+        """
+        return self._requisitar('GET', '/cambio').json()
+
+    def ticks(self, ids):
+        """
+        Retorna os últimos ticks ao vivo das moedas `ids` conhecidos pelo serviço.
+        """
+        resposta = self._requisitar('GET', '/fluxo', {'ids': ','.join(sorted(ids))})
+        return [Tick(**tick) for tick in resposta.json()]
+
+
+class ProdutorServico:
+    """
+    Produtor do fluxo de preços que lê os ticks do serviço de dados: só o
+    serviço consulta a CoinGecko, qualquer que seja o número de réplicas.
+    """
+
+    def __init__(self, cliente, intervalo=INTERVALO_LEITURA_FLUXO):
+        self.cliente = cliente
+        self.intervalo = intervalo
+        self._proxima = 0.0
+
+    def proximos(self, ids):
+        """
+        Espera a próxima leitura e retorna os ticks das moedas `ids`.
+        """
+        espera = self._proxima - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self._proxima = time.monotonic() + self.intervalo
+        return self.cliente.ticks(ids)
@@ -0,0 +1,295 @@
+"""
+Coletor de dados de mercado em segundo plano.
+
+Um único coletor por processo busca o ranking da CoinGecko em páginas de 250
+moedas e publica um snapshot imutável com o mercado inteiro acompanhado. As
+sessões do Streamlit apenas leem o snapshot mais recente, sem fazer
+requisições próprias.
+
+As páginas do topo são renovadas com mais frequência que a cauda: a página
+k é renovada a cada INTERVALO_COLETA * 2^(k-1) segundos (limitado a
+INTERVALO_MAXIMO_PAGINA), sempre começando pela mais atrasada.
+
+O snapshot funciona como um cache stale-while-revalidate: as sessões sempre
+recebem o último snapshot válido na hora, enquanto o coletor o renova em
+segundo plano; falhas de coleta não apagam os dados já publicados.
+"""
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from cliente_api import obter_cliente
+from metricas import metricas
+from mudancas_mercado import (AGREGADOS_VAZIOS, SEM_MUDANCAS, AcumuladorAgregados,
+                              calcular_mudancas)
+from snapshot_compacto import PaginaCompacta, compactar_pagina, matriz_vazia, unir_paginas
+
+# Moedas por página de /coins/markets (máximo aceito pela API)
+POR_PAGINA = 250
+
+# Páginas acompanhadas (8 x 250 = Top 2000)
+PAGINAS_MERCADO = 8
+
+# Intervalo entre coletas da primeira página (segundos)
+INTERVALO_COLETA = 60
+
+# Intervalo máximo entre renovações de uma página da cauda (segundos)
+INTERVALO_MAXIMO_PAGINA = 900
+
+# Sem leituras por este tempo, o coletor deixa de consultar a API
+OCIOSIDADE_MAXIMA = 600
+
+# A partir desta idade (segundos), o snapshot é exibido como desatualizado
+VELHICE_MAXIMA = 900
+
+COLUNAS_NECESSARIAS = ['id', 'symbol', 'name', 'current_price', 'market_cap',
+                       'total_volume', 'price_change_percentage_24h']
+
+# Snapshot publicado pelo coletor. Nunca deve ser modificado pelas sessões.
+# `sparklines` é a matriz (n_moedas, 168) alinhada às linhas de `df`;
+# `mudancas` compara com o snapshot anterior e `agregados` resume o mercado.
+SnapshotMercado = namedtuple('SnapshotMercado', [
+    'df', 'sparklines', 'atualizado_em', 'versao', 'erro', 'mudancas', 'agregados'
+])
+
+SNAPSHOT_VAZIO = SnapshotMercado(pd.DataFrame(), matriz_vazia(), None, 0, None, SEM_MUDANCAS, AGREGADOS_VAZIOS)
+
+
+def idade_snapshot(snapshot):
+    """
+    Retorna os segundos desde a coleta do snapshot (None se nunca coletado).
+    """
+    if snapshot.atualizado_em is None:
+        return None
+    return max(0.0, (datetime.now() - snapshot.atualizado_em).total_seconds())
+
+
+class ColunaAusenteError(Exception):
+    """
+    A resposta da API não contém uma coluna essencial.
+    """
+
+
+def parametros_pagina(pagina, por_pagina=POR_PAGINA):
+    """
+    Retorna os parâmetros de /coins/markets para uma página do ranking.
+    """
+    return {
+        'vs_currency': 'usd',
+        'order': 'market_cap_desc',
+        'per_page': por_pagina,
+        'page': pagina,
+        'sparkline': 'true',
+        'price_change_percentage': '1h,24h,7d,30d'
+    }
+
+
+def normalizar_pagina(dados):
+    """
+    Converte o JSON de uma página em PaginaCompacta (colunas usadas, dtypes
+    estáveis e sparklines em matriz). Lança ColunaAusenteError se faltar
+    uma coluna essencial.
+    """
+    if not dados:
+        return PaginaCompacta(pd.DataFrame(), matriz_vazia())
+
+    df = pd.DataFrame(dados)
+
+    # Verificar se colunas essenciais existem
+    for col in COLUNAS_NECESSARIAS:
+        if col not in df.columns:
+            raise ColunaAusenteError(col)
+
+    return compactar_pagina(df)
+
+
+def intervalo_pagina(pagina, intervalo=INTERVALO_COLETA):
+    """
+    Retorna o intervalo de renovação (segundos) de uma página do ranking.
+    """
+    return min(INTERVALO_MAXIMO_PAGINA, intervalo * 2 ** (pagina - 1))
+
+
+class ColetorMercado:
+    """
+    Thread que coleta o mercado periodicamente e publica snapshots imutáveis.
+    Em caso de erro, mantém o último snapshot válido e registra o erro nele.
+    """
+
+    def __init__(self, intervalo=INTERVALO_COLETA, paginas=PAGINAS_MERCADO, por_pagina=POR_PAGINA):
+        self.intervalo = intervalo
+        self.paginas = paginas
+        self.por_pagina = por_pagina
+        self._snapshot = SNAPSHOT_VAZIO
+        self._paginas = {}
+        self._forcar = False
+        self._acumulador = AcumuladorAgregados()
+        self._condicao = threading.Condition()
+        self._acordar = threading.Event()
+        self._ultimo_acesso = time.monotonic()
+        self._ultima_coleta = None
+        self._thread = None
+        self._inscritos = []
+
+    def iniciar(self):
+        """
+        Inicia a thread de coleta (apenas uma vez).
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="coletor-mercado", daemon=True)
+            self._thread.start()
+        return self
+
+    def ao_publicar(self, funcao):
+        """
+        Registra uma etapa executada a cada snapshot com dados novos.
+        A função recebe o snapshot (com snapshot.mudancas em relação ao
+        anterior) e roda na thread do coletor: deve ser rápida.
+        """
+        self._inscritos.append(funcao)
+
+    def _registrar_acesso(self):
+        agora = time.monotonic()
+        self._ultimo_acesso = agora
+        # Após um período ocioso, a primeira leitura dispara uma coleta imediata
+        if self._ultima_coleta is None or agora - self._ultima_coleta > self.intervalo:
+            self._acordar.set()
+
+    def snapshot(self):
+        """
+        Retorna o snapshot mais recente, sem bloquear.
+        """
+        self._registrar_acesso()
+        return self._snapshot
+
+    def aguardar_snapshot(self, timeout=15):
+        """
+        Retorna o snapshot mais recente, esperando a primeira coleta se necessário.
+        """
+        self._registrar_acesso()
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._snapshot.versao > 0, timeout=timeout)
+            return self._snapshot
+
+    def atualizar_agora(self, timeout=15):
+        """
+        Força uma nova coleta e espera o snapshot resultante.
+        Retorna o snapshot publicado (ou o anterior, em caso de timeout).
+        """
+        with self._condicao:
+            versao_atual = self._snapshot.versao
+        self._ultimo_acesso = time.monotonic()
+        with self._condicao:
+            self._forcar = True
+        self._acordar.set()
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._snapshot.versao > versao_atual, timeout=timeout)
+            return self._snapshot
+
+    def _publicar(self, mercado, erro):
+        # Só a thread do coletor publica: o snapshot anterior pode ser lido sem trava
+        anterior = self._snapshot
+        novo = mercado is not None
+        if not novo:
+            # Nenhuma página nova: mantém os últimos dados válidos, registrando o erro
+            df, sparklines = anterior.df, anterior.sparklines
+            atualizado_em = anterior.atualizado_em
+            mudancas, agregados = SEM_MUDANCAS, anterior.agregados
+        else:
+            df, sparklines = mercado
+            atualizado_em = datetime.now()
+            with metricas.medir('coleta_agregados'):
+                mudancas = calcular_mudancas(anterior.df, df)
+                self._acumulador.aplicar(anterior.df, df, mudancas)
+                agregados = self._acumulador.agregados()
+
+        snapshot = SnapshotMercado(df, sparklines, atualizado_em, anterior.versao + 1, erro,
+                                   mudancas, agregados)
+        with self._condicao:
+            self._snapshot = snapshot
+            self._condicao.notify_all()
+
+        if novo and not snapshot.df.empty:
+            for funcao in self._inscritos:
+                funcao(snapshot)
+
+    def paginas_vencidas(self, agora, forcar=False):
+        """
+        Retorna as páginas que precisam ser renovadas, da mais atrasada
+        (em proporção ao seu intervalo) para a menos atrasada. Com `forcar`,
+        o topo (página 1) entra mesmo sem estar vencido.
+        """
+        atrasos = {}
+        for pagina in range(1, self.paginas + 1):
+            if pagina not in self._paginas:
+                atrasos[pagina] = float('inf')
+                continue
+            idade = agora - self._paginas[pagina][1]
+            atraso = idade / intervalo_pagina(pagina, self.intervalo)
+            if atraso >= 1:
+                atrasos[pagina] = atraso
+
+        if forcar:
+            atrasos.setdefault(1, float('inf'))
+        return sorted(atrasos, key=lambda pagina: (-atrasos[pagina], pagina))
+
+    def _coletar(self):
+        self._ultima_coleta = agora = time.monotonic()
+        # Lido e limpo de uma vez: um pedido que chega durante a coleta vale para a próxima
+        with self._condicao:
+            forcar, self._forcar = self._forcar, False
+        paginas = self.paginas_vencidas(agora, forcar)
+        if not paginas:
+            return
+
+        primeira_carga = not self._paginas
+        if primeira_carga:
+            # Publica o topo do ranking o quanto antes; a cauda vem logo em seguida
+            paginas = [1]
+
+        # Páginas buscadas concorrentemente; o limitador de taxa dita o ritmo
+        requisicoes = [('/coins/markets', parametros_pagina(pagina, self.por_pagina)) for pagina in paginas]
+        try:
+            with metricas.medir('coleta_buscar'):
+                respostas = asyncio.run(obter_cliente().obter_varios(requisicoes, timeout=10))
+        except Exception as e:
+            self._publicar(None, e)
+            return
+
+        erro = None
+        novas = 0
+        for pagina, resposta in zip(paginas, respostas):
+            try:
+                if isinstance(resposta, Exception):
+                    raise resposta
+                with metricas.medir('coleta_normalizar'):
+                    compacta = normalizar_pagina(resposta)
+            except Exception as e:
+                erro = erro or e
+                continue
+            self._paginas[pagina] = (compacta, agora)
+            novas += 1
+
+        if novas == 0:
+            self._publicar(None, erro)
+        else:
+            # Páginas que falharam seguem com a última coleta válida
+            with metricas.medir('coleta_unir'):
+                mercado = unir_paginas(self._paginas)
+            self._publicar(mercado, erro)
+
+        if primeira_carga and self.paginas > 1:
+            self._acordar.set()
+
+    def _executar(self):
+        while True:
+            self._acordar.clear()
+            ocioso = time.monotonic() - self._ultimo_acesso > OCIOSIDADE_MAXIMA
+            if not ocioso:
+                self._coletar()
+            # Espera o intervalo ou um pedido de atualização imediata
+            self._acordar.wait(self.intervalo)
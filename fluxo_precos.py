@@ -0,0 +1,274 @@
+"""
+Fluxo de preços ao vivo (modo streaming) das moedas visíveis.
+
+Um produtor plugável entrega ticks de preço só das moedas que alguma sessão
+está exibindo; uma thread publica esses ticks em um buffer limitado por
+moeda, do qual os fragmentos do Streamlit leem apenas o que chegou desde a
+última leitura. Ticks mais próximos que RESOLUCAO_MINIMA são agrupados
+(vale o último), e cada moeda guarda no máximo CAPACIDADE_PONTOS pontos:
+um navegador lento recebe o estado mais recente, nunca uma fila acumulada.
+
+Produtores:
+    ProdutorCoinGecko  consulta /simple/price a cada INTERVALO_CONSULTA segundos
+    ProdutorReplay     reproduz um arquivo CSV (id, instante, preco) em tempo real
+"""
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import pandas as pd
+
+from cliente_api import obter_cliente
+
+# Intervalo entre consultas a /simple/price (segundos). As consultas disputam
+# o mesmo limitador (15/min) que a coleta do mercado (~2/min), o aquecimento
+# do histórico (~4/min com o Top 20) e os pedidos interativos: a cada 30 s,
+# o modo ao vivo usa 2/min e deixa cerca de metade do orçamento livre.
+# Conferido por benchmarks/bench_app.py (orçamento do limitador).
+INTERVALO_CONSULTA = 30
+
+# Pontos mantidos por moeda no buffer (e por sessão no gráfico ao vivo)
+CAPACIDADE_PONTOS = 720
+
+# Ticks da mesma moeda mais próximos que isto (segundos) viram um só ponto
+RESOLUCAO_MINIMA = 5
+
+# Por quanto tempo uma moeda continua sendo acompanhada após ser exibida
+VALIDADE_VISIVEIS = 60
+
+# Espera da thread quando não há moedas visíveis ou após um erro (segundos)
+ESPERA_OCIOSA = 1
+ESPERA_ERRO = 15
+
+Tick = namedtuple('Tick', ['cripto_id', 'preco', 'instante'])
+
+
+class ProdutorCoinGecko:
+    """
+    Produz ticks consultando /simple/price apenas para as moedas pedidas.
+    """
+
+    def __init__(self, intervalo=INTERVALO_CONSULTA, cliente=None):
+        self.intervalo = intervalo
+        self.cliente = cliente if cliente is not None else obter_cliente()
+        self._proxima = 0.0
+
+    def proximos(self, ids):
+        """
+        Espera a próxima consulta e retorna a lista de ticks das moedas `ids`.
+        """
+        espera = self._proxima - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self._proxima = time.monotonic() + self.intervalo
+
+        parametros = {
+            'ids': ','.join(sorted(ids)),
+            'vs_currencies': 'usd',
+            'include_last_updated_at': 'true'
+        }
+        dados = self.cliente.obter('/simple/price', parametros, timeout=10)
+        return [Tick(cripto_id, float(valores['usd']), float(valores.get('last_updated_at') or time.time()))
+                for cripto_id, valores in dados.items() if valores.get('usd') is not None]
+
+
+class ProdutorReplay:
+    """
+    Reproduz ticks gravados em CSV (colunas id, instante, preco; instante em
+    segundos Unix). O primeiro tick do arquivo corresponde ao momento em que
+    o replay começa; `velocidade` acelera a reprodução e `repetir` recomeça
+    o arquivo ao chegar no fim.
+    """
+
+    def __init__(self, caminho, velocidade=1.0, repetir=True):
+        df = pd.read_csv(caminho).sort_values('instante', kind='stable')
+        self.ids = df['id'].astype(str).to_numpy()
+        self.precos = df['preco'].to_numpy(dtype='float64')
+        self.instantes = df['instante'].to_numpy(dtype='float64')
+        self.velocidade = velocidade
+        self.repetir = repetir
+        self._posicao = 0
+        self._volta = 0
+        self._inicio = None
+
+    def _quando(self, posicao):
+        # Instante real (time.time) do tick na posição, na volta atual
+        duracao = self.instantes[-1] - self.instantes[0] + RESOLUCAO_MINIMA
+        decorrido = self.instantes[posicao] - self.instantes[0] + self._volta * duracao
+        return self._inicio + decorrido / self.velocidade
+
+    def proximos(self, ids):
+        """
+        Espera o próximo instante gravado e retorna os ticks dele (só das
+        moedas `ids`, se informadas), com o horário atual.
+        """
+        if self._inicio is None:
+            self._inicio = time.time()
+        if self._posicao >= len(self.instantes):
+            if not self.repetir or not len(self.instantes):
+                time.sleep(ESPERA_OCIOSA)
+                return []
+            self._posicao = 0
+            self._volta += 1
+
+        espera = self._quando(self._posicao) - time.time()
+        if espera > 0:
+            time.sleep(espera)
+
+        agora = time.time()
+        fim = self._posicao
+        while fim < len(self.instantes) and self._quando(fim) <= agora:
+            fim += 1
+        fim = max(fim, self._posicao + 1)
+
+        ticks = []
+        for posicao in range(self._posicao, fim):
+            if not ids or self.ids[posicao] in ids:
+                ticks.append(Tick(self.ids[posicao], float(self.precos[posicao]), self._quando(posicao)))
+        self._posicao = fim
+        return ticks
+
+
+def criar_produtor():
+    """
+    Retorna o produtor configurado: replay se FLUXO_REPLAY apontar para um
+    arquivo (velocidade em FLUXO_REPLAY_VELOCIDADE), senão a CoinGecko.
+    """
+    caminho = os.environ.get('FLUXO_REPLAY')
+    if caminho:
+        return ProdutorReplay(caminho, velocidade=float(os.environ.get('FLUXO_REPLAY_VELOCIDADE', 1)))
+    return ProdutorCoinGecko()
+
+
+def anexar_pontos(pontos, novos, resolucao=RESOLUCAO_MINIMA):
+    """
+    Anexa pontos (instante, preco) a uma deque limitada, agrupando pontos
+    mais próximos que `resolucao` (vale o mais recente). Modifica `pontos`.
+    """
+    for instante, preco in novos:
+        if pontos and instante <= pontos[-1][0]:
+            # Repetido ou fora de ordem
+            continue
+        if pontos and instante - pontos[-1][0] < resolucao:
+            pontos[-1] = (instante, preco)
+        else:
+            pontos.append((instante, preco))
+    return pontos
+
+
+class BufferTicks:
+    """
+    Últimos pontos de cada moeda, com número de sequência para leitura incremental.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PONTOS, resolucao=RESOLUCAO_MINIMA):
+        self.capacidade = capacidade
+        self.resolucao = resolucao
+        self._series = {}
+        self._sequencia = 0
+        self._trava = threading.Lock()
+
+    def publicar(self, ticks):
+        """
+        Registra ticks; cada ponto novo ou agrupado recebe nova sequência.
+        """
+        with self._trava:
+            for tick in ticks:
+                serie = self._series.setdefault(tick.cripto_id, deque(maxlen=self.capacidade))
+                if serie and tick.instante <= serie[-1][1]:
+                    continue
+                self._sequencia += 1
+                ponto = (self._sequencia, tick.instante, tick.preco)
+                if serie and tick.instante - serie[-1][1] < self.resolucao:
+                    serie[-1] = ponto
+                else:
+                    serie.append(ponto)
+
+    def ler(self, cripto_id, desde=0):
+        """
+        Retorna tupla (pontos (instante, preco) com sequência > desde, cursor
+        para a próxima leitura).
+        """
+        with self._trava:
+            serie = self._series.get(cripto_id, ())
+            return [(instante, preco) for sequencia, instante, preco in serie if sequencia > desde], self._sequencia
+
+    def ultimo(self, cripto_id):
+        """
+        Retorna o tick mais recente da moeda (ou None).
+        """
+        with self._trava:
+            serie = self._series.get(cripto_id)
+            if not serie:
+                return None
+            _, instante, preco = serie[-1]
+            return Tick(cripto_id, preco, instante)
+
+
+class FluxoPrecos:
+    """
+    Thread que pede ao produtor os ticks das moedas visíveis e os publica no buffer.
+    """
+
+    def __init__(self, produtor, buffer=None):
+        self.produtor = produtor
+        self.buffer = buffer if buffer is not None else BufferTicks()
+        self.erro = None
+        self._visiveis = {}
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def iniciar(self):
+        """
+        Inicia a thread do fluxo (apenas uma vez).
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="fluxo-precos", daemon=True)
+            self._thread.start()
+        return self
+
+    def registrar_visiveis(self, ids):
+        """
+        Registra moedas exibidas por uma sessão (acompanhadas por VALIDADE_VISIVEIS segundos).
+        """
+        agora = time.monotonic()
+        with self._trava:
+            for cripto_id in ids:
+                self._visiveis[cripto_id] = agora
+
+    def ids_visiveis(self):
+        """
+        Retorna o conjunto de moedas exibidas recentemente.
+        """
+        limite = time.monotonic() - VALIDADE_VISIVEIS
+        with self._trava:
+            self._visiveis = {i: instante for i, instante in self._visiveis.items() if instante >= limite}
+            return set(self._visiveis)
+
+    def ler(self, cripto_id, desde=0):
+        """
+        Retorna os pontos da moeda desde o cursor (ver BufferTicks.ler).
+        """
+        return self.buffer.ler(cripto_id, desde)
+
+    def ultimo(self, cripto_id):
+        """
+        Retorna o tick mais recente da moeda (ou None).
+        """
+        return self.buffer.ultimo(cripto_id)
+
+    def _executar(self):
+        while True:
+            ids = self.ids_visiveis()
+            if not ids:
+                time.sleep(ESPERA_OCIOSA)
+                continue
+            try:
+                ticks = self.produtor.proximos(ids)
+                self.erro = None
+            except Exception as e:
+                self.erro = e
+                time.sleep(ESPERA_ERRO)
+                continue
+            self.buffer.publicar(ticks)
@@ -0,0 +1,244 @@
+"""
+Formatação de valores para exibição.
+
+As funções escalares formatam um valor por vez (métricas e cards). As
+versões vetorizadas montam colunas inteiras da tabela de ranking com
+operações em arrays, sem df.apply linha a linha.
+"""
+import numpy as np
+import pandas as pd
+
+EMOJIS_VARIACAO = np.array(["🔴", "⚪", "🟢"], dtype=object)
+
+# Colunas de variação da tabela de ranking: (coluna de origem, título)
+COLUNAS_VARIACAO = [
+    ('price_change_percentage_1h_in_currency', '1h'),
+    ('price_change_percentage_24h', '24h'),
+    ('price_change_percentage_7d_in_currency', '7d'),
+]
+
+# Símbolo exibido antes dos valores de cada moeda (código da CoinGecko)
+SIMBOLOS_MOEDA = {'usd': '$', 'brl': 'R$', 'eur': '€'}
+
+
+def simbolo_moeda(moeda):
+    """
+    Retorna o símbolo da moeda (ou o código em maiúsculas, se não houver).
+    """
+    return SIMBOLOS_MOEDA.get(moeda, f"{moeda.upper()} ")
+
+
+def formatar_numero(numero, simbolo='$'):
+    """
+    Formata números grandes para notação simplificada (K, M, B, T).
+    Retorna string formatada.
+    """
+    if pd.isna(numero) or numero is None:
+        return "N/A"
+    
+    try:
+        numero = float(numero)
+        
+        if numero >= 1e12:
+            return f"{simbolo}{numero/1e12:.2f}T"
+        elif numero >= 1e9:
+            return f"{simbolo}{numero/1e9:.2f}B"
+        elif numero >= 1e6:
+            return f"{simbolo}{numero/1e6:.2f}M"
+        elif numero >= 1e3:
+            return f"{simbolo}{numero/1e3:.2f}K"
+        else:
+            return f"{simbolo}{numero:.2f}"
+    except (ValueError, TypeError):
+        return "N/A"
+
+
+def formatar_preco(preco, simbolo='$'):
+    """
+    Formata o preço com a quantidade adequada de casas decimais.
+    Retorna string formatada.
+    """
+    if pd.isna(preco) or preco is None:
+        return "N/A"
+    
+    try:
+        preco = float(preco)
+        
+        if preco >= 1:
+            return f"{simbolo}{preco:,.2f}"
+        elif preco >= 0.01:
+            return f"{simbolo}{preco:.4f}"
+        else:
+            return f"{simbolo}{preco:.8f}"
+    except (ValueError, TypeError):
+        return "N/A"
+
+
+def formatar_percentual(valor):
+    """
+    Formata valores percentuais com 2 casas decimais.
+    Retorna string formatada ou N/A.
+    """
+    if pd.isna(valor) or valor is None:
+        return "N/A"
+    
+    try:
+        valor = float(valor)
+        return f"{valor:.2f}%"
+    except (ValueError, TypeError):
+        return "N/A"
+
+
+def formatar_idade(segundos):
+    """
+    Formata a idade de um dado em segundos (ex.: "45s", "3 min", "2 h").
+    Retorna string formatada ou N/A.
+    """
+    if segundos is None or pd.isna(segundos):
+        return "N/A"
+    
+    segundos = max(0, int(segundos))
+    if segundos < 60:
+        return f"{segundos}s"
+    elif segundos < 3600:
+        return f"{segundos // 60} min"
+    elif segundos < 86400:
+        return f"{segundos // 3600} h"
+    else:
+        return f"{segundos // 86400} d"
+
+
+def obter_emoji_variacao(valor):
+    """
+    Retorna emoji baseado na variação do preço.
+    🟢 para positivo, 🔴 para negativo, ⚪ para neutro/N/A.
+    """
+    if pd.isna(valor) or valor is None:
+        return "⚪"
+    
+    try:
+        valor = float(valor)
+        return "🟢" if valor > 0 else "🔴" if valor < 0 else "⚪"
+    except (ValueError, TypeError):
+        return "⚪"
+
+
+# ========== VERSÕES VETORIZADAS ==========
+
+def _como_float(valores):
+    """
+    Converte uma série/array para float64; valores inválidos viram NaN.
+    """
+    return pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _formatar_lote(valores, formato):
+    """
+    Aplica o mesmo formato a um array de floats, em uma única passada.
+    Retorna array de objetos (str).
+    """
+    saida = np.empty(len(valores), dtype=object)
+    saida[:] = list(map(formato.format, valores.tolist()))
+    return saida
+
+
+def _formatar_por_faixa(valores, condicoes, formatos, divisores=None):
+    """
+    Formata cada valor conforme a primeira condição satisfeita (np.select).
+    A última entrada de `formatos` é usada quando nenhuma condição vale;
+    NaN vira "N/A".
+    """
+    if condicoes:
+        faixa = np.select(condicoes, np.arange(len(condicoes)), len(condicoes))
+    else:
+        faixa = np.zeros(len(valores), dtype=int)
+    if divisores is not None:
+        valores = valores / np.select(condicoes, divisores[:-1], divisores[-1])
+
+    saida = np.full(len(valores), "N/A", dtype=object)
+    validos = ~np.isnan(valores)
+    for indice, formato in enumerate(formatos):
+        mascara = validos & (faixa == indice)
+        if mascara.any():
+            saida[mascara] = _formatar_lote(valores[mascara], formato)
+    return saida
+
+
+def formatar_numeros(valores, simbolo='$'):
+    """
+    Versão vetorizada de formatar_numero (K, M, B, T).
+    Retorna array de strings.
+    """
+    v = _como_float(valores)
+    condicoes = [v >= 1e12, v >= 1e9, v >= 1e6, v >= 1e3]
+    return _formatar_por_faixa(
+        v, condicoes,
+        [simbolo + formato for formato in ["{:.2f}T", "{:.2f}B", "{:.2f}M", "{:.2f}K", "{:.2f}"]],
+        divisores=[1e12, 1e9, 1e6, 1e3, 1.0]
+    )
+
+
+def formatar_precos(valores, simbolo='$'):
+    """
+    Versão vetorizada de formatar_preco.
+    Retorna array de strings.
+    """
+    v = _como_float(valores)
+    return _formatar_por_faixa(v, [v >= 1, v >= 0.01],
+                               [simbolo + formato for formato in ["{:,.2f}", "{:.4f}", "{:.8f}"]])
+
+
+def formatar_percentuais(valores):
+    """
+    Versão vetorizada de formatar_percentual.
+    Retorna array de strings.
+    """
+    v = _como_float(valores)
+    return _formatar_por_faixa(v, [], ["{:.2f}%"])
+
+
+def emojis_variacao(valores):
+    """
+    Versão vetorizada de obter_emoji_variacao (NaN vira ⚪).
+    Retorna array de strings.
+    """
+    sinal = np.sign(np.nan_to_num(_como_float(valores), nan=0.0)).astype(np.int8)
+    return EMOJIS_VARIACAO[sinal + 1]
+
+
+def formatar_variacoes(valores):
+    """
+    Monta a coluna "emoji percentual" (ex.: "🟢 1.23%") de uma só vez:
+    o sinal (np.sign) escolhe o formato, e cada valor é formatado uma única vez.
+    Retorna array de strings.
+    """
+    v = _como_float(valores)
+    sinal = np.sign(v)
+    saida = _formatar_por_faixa(v, [sinal > 0, sinal < 0], ["🟢 {:.2f}%", "🔴 {:.2f}%", "⚪ {:.2f}%"])
+    saida[np.isnan(v)] = "⚪ N/A"
+    return saida
+
+
+def montar_tabela_ranking(df, simbolo='$'):
+    """
+    Monta o DataFrame de exibição do "Ranking de Criptomoedas", com os
+    valores monetários precedidos de `simbolo`.
+    Retorna DataFrame vazio se df estiver vazio.
+    """
+    df_tabela = pd.DataFrame(index=df.index)
+    if df.empty:
+        return df_tabela
+
+    df_tabela['#'] = df['market_cap_rank'].fillna(0).astype(int)
+    df_tabela['Nome'] = df['name'].astype(str) + ' (' + df['symbol'].astype(str).str.upper() + ')'
+    df_tabela['Preço'] = formatar_precos(df['current_price'], simbolo)
+
+    # Variações com emojis
+    for coluna, titulo in COLUNAS_VARIACAO:
+        if coluna in df.columns:
+            df_tabela[titulo] = formatar_variacoes(df[coluna])
+
+    df_tabela['Volume 24h'] = formatar_numeros(df['total_volume'], simbolo)
+    df_tabela['Market Cap'] = formatar_numeros(df['market_cap'], simbolo)
+
+    return df_tabela
@@ -0,0 +1,137 @@
+"""
+Serialização de snapshots de mercado e séries históricas em Arrow/Parquet.
+
+Usado pelo serviço de dados (servico_dados.py) e pelo cliente do serviço
+(cliente_servico.py). O snapshot vira uma tabela Arrow com as colunas do
+DataFrame compacto e os sparklines em uma coluna de listas de tamanho fixo
+(float32); os demais campos do snapshot vão como JSON nos metadados do
+esquema. Séries históricas levam nos metadados a idade dos dados
+(df.attrs['idade']). O formato padrão é Arrow IPC (stream) comprimido com zstd.
+"""
+import io
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from coletor_mercado import SnapshotMercado
+from mudancas_mercado import AgregadosMercado, ConjuntoMudancas
+from snapshot_compacto import PONTOS_SPARKLINE, matriz_vazia
+
+TIPO_ARROW = 'application/vnd.apache.arrow.stream'
+TIPO_PARQUET = 'application/vnd.apache.parquet'
+
+COMPRESSAO = 'zstd'
+
+CHAVE_METADADOS = b'snapshot'
+
+CHAVE_HISTORICO = b'historico'
+
+COLUNA_SPARKLINE = 'sparkline'
+
+
+def descrever_erro(erro):
+    """
+    Retorna dict {tipo, mensagem} de uma exceção (ou None).
+    """
+    if erro is None:
+        return None
+    return {'tipo': type(erro).__name__, 'mensagem': str(erro)}
+
+
+def _escrever(tabela, formato):
+    buffer = io.BytesIO()
+    if formato == 'parquet':
+        pq.write_table(tabela, buffer, compression=COMPRESSAO)
+    else:
+        opcoes = pa.ipc.IpcWriteOptions(compression=COMPRESSAO)
+        with pa.ipc.new_stream(buffer, tabela.schema, options=opcoes) as escritor:
+            escritor.write_table(tabela)
+    return buffer.getvalue()
+
+
+def _ler(conteudo, formato):
+    if formato == 'parquet':
+        return pq.read_table(io.BytesIO(conteudo))
+    return pa.ipc.open_stream(conteudo).read_all()
+
+
+def snapshot_para_bytes(snapshot, formato='arrow'):
+    """
+    Serializa um SnapshotMercado. Retorna bytes (Arrow IPC ou Parquet).
+    """
+    tabela = pa.Table.from_pandas(snapshot.df, preserve_index=False)
+    valores = pa.array(np.ascontiguousarray(snapshot.sparklines, dtype=np.float32).ravel())
+    tabela = tabela.append_column(COLUNA_SPARKLINE, pa.FixedSizeListArray.from_arrays(valores, PONTOS_SPARKLINE))
+
+    metadados = {
+        'atualizado_em': snapshot.atualizado_em.isoformat() if snapshot.atualizado_em else None,
+        'versao': snapshot.versao,
+        'erro': descrever_erro(snapshot.erro),
+        'mudancas': {campo: [str(i) for i in ids] for campo, ids in snapshot.mudancas._asdict().items()},
+        'agregados': snapshot.agregados._asdict(),
+    }
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        CHAVE_METADADOS: json.dumps(metadados).encode()
+    })
+    return _escrever(tabela, formato)
+
+
+def bytes_para_snapshot(conteudo, reconstruir_erro, formato='arrow'):
+    """
+    Reconstrói um SnapshotMercado a partir dos bytes serializados.
+    `reconstruir_erro(descricao)` converte a descrição do erro em exceção.
+    """
+    tabela = _ler(conteudo, formato)
+    metadados = json.loads(tabela.schema.metadata[CHAVE_METADADOS])
+
+    if tabela.num_rows:
+        coluna = tabela.column(COLUNA_SPARKLINE).combine_chunks()
+        sparklines = coluna.flatten().to_numpy(zero_copy_only=False).reshape(-1, PONTOS_SPARKLINE)
+        sparklines = np.ascontiguousarray(sparklines, dtype=np.float32)
+        df = tabela.drop_columns([COLUNA_SPARKLINE]).to_pandas()
+    else:
+        sparklines = matriz_vazia()
+        df = pd.DataFrame()
+
+    atualizado_em = metadados['atualizado_em']
+    mudancas = ConjuntoMudancas(**{campo: np.array(ids, dtype=object)
+                                   for campo, ids in metadados['mudancas'].items()})
+    return SnapshotMercado(
+        df=df,
+        sparklines=sparklines,
+        atualizado_em=datetime.fromisoformat(atualizado_em) if atualizado_em else None,
+        versao=metadados['versao'],
+        erro=reconstruir_erro(metadados['erro']),
+        mudancas=mudancas,
+        agregados=AgregadosMercado(**metadados['agregados']),
+    )
+
+
+def historico_para_bytes(df, formato='arrow'):
+    """
+    Serializa uma série histórica (timestamp, price) com a idade dos dados
+    em segundos (df.attrs['idade'], se houver). Retorna bytes.
+    """
+    tabela = pa.Table.from_pandas(df[['timestamp', 'price']], preserve_index=False)
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        CHAVE_HISTORICO: json.dumps({'idade': df.attrs.get('idade')}).encode()
+    })
+    return _escrever(tabela, formato)
+
+
+def bytes_para_historico(conteudo, formato='arrow'):
+    """
+    Reconstrói a série histórica. Retorna DataFrame com timestamp e price e
+    a idade dos dados em df.attrs['idade'] (None se desconhecida).
+    """
+    tabela = _ler(conteudo, formato)
+    metadados = json.loads((tabela.schema.metadata or {}).get(CHAVE_HISTORICO, b'{}'))
+    df = tabela.to_pandas()
+    df.attrs['idade'] = metadados.get('idade')
+    return df
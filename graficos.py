@@ -0,0 +1,412 @@
+"""
+Gráficos Plotly do dashboard, com cache de figuras.
+
+Cada figura é guardada em um cache LRU compartilhado, com chave dada pelo
+hash do conteúdo da fatia de dados usada (não do DataFrame inteiro), então
+reruns com os mesmos dados reaproveitam a figura pronta. Séries históricas
+são enviadas em modo compacto: arrays float32/float64 (codificados pelo
+Plotly como typed arrays em base64) e scattergl para séries longas, já
+reduzidas por LTTB ao número de pontos que cabe na largura do gráfico.
+
+plotly.express só é importado quando uma figura de pizza ou de barras
+precisa ser montada (e não já estiver no cache): a importação custa mais
+de 200 ms e não deve atrasar o primeiro rerun de cada processo.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from amostragem import pontos_alvo, reduzir_serie
+from formatacao import simbolo_moeda
+from metricas import metricas
+
+# Figuras mantidas no cache (LRU)
+CAPACIDADE_CACHE_FIGURAS = 256
+
+# A partir deste número de pontos, o histórico usa WebGL (scattergl)
+PONTOS_WEBGL = 1000
+
+
+def hash_conteudo(*partes):
+    """
+    Calcula um hash estável do conteúdo das partes (DataFrames, arrays ou
+    valores simples). Retorna string hexadecimal.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, pd.DataFrame):
+            h.update(repr(list(parte.columns)).encode())
+            h.update(pd.util.hash_pandas_object(parte, index=False).to_numpy().tobytes())
+        elif isinstance(parte, np.ndarray):
+            h.update(f"{parte.dtype}{parte.shape}".encode())
+            h.update(np.ascontiguousarray(parte).tobytes())
+        else:
+            h.update(repr(parte).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+class CacheFiguras:
+    """
+    Cache LRU de figuras Plotly, seguro para várias sessões (threads).
+    As figuras guardadas são compartilhadas e não devem ser modificadas.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_CACHE_FIGURAS):
+        self.capacidade = capacidade
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter_ou_criar(self, chave, criar):
+        """
+        Retorna a figura da chave, criando-a com `criar()` se não existir.
+        """
+        with self._trava:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return self._figuras[chave]
+            self.faltas += 1
+
+        figura = criar()
+
+        with self._trava:
+            self._figuras[chave] = figura
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.capacidade:
+                self._figuras.popitem(last=False)
+        return figura
+
+    def limpar(self):
+        """
+        Remove todas as figuras do cache.
+        """
+        with self._trava:
+            self._figuras.clear()
+
+    def invalidar(self, chave=None):
+        """
+        Remove as figuras de um construtor (chave = nome da função, ex.:
+        '_figura_historico') ou uma figura específica (chave completa).
+        Sem chave, limpa o cache inteiro.
+        """
+        if chave is None:
+            self.limpar()
+            return
+        with self._trava:
+            for existente in list(self._figuras):
+                if existente == chave or existente[0] == chave:
+                    del self._figuras[existente]
+
+
+cache_figuras = CacheFiguras()
+
+
+def figura_em_cache(funcao):
+    """
+    Decorador: guarda a figura retornada por `funcao` no cache de figuras,
+    com chave dada pelo nome da função e pelo hash dos argumentos.
+    Só a construção de fato (falta no cache) é medida, na etapa
+    'construir' + nome da função.
+    """
+    etapa = 'construir' + funcao.__name__
+
+    def construir(args):
+        with metricas.medir(etapa):
+            return funcao(*args)
+
+    @wraps(funcao)
+    def envoltorio(*args):
+        chave = (funcao.__name__, hash_conteudo(*args))
+        return cache_figuras.obter_ou_criar(chave, lambda: construir(args))
+    return envoltorio
+
+
+@figura_em_cache
+def _figura_historico(timestamps_ms, precos, titulo, moeda):
+    """
+    Monta o gráfico de histórico a partir de arrays compactos.
+    """
+    simbolo = simbolo_moeda(moeda)
+    tipo_traco = go.Scattergl if len(precos) >= PONTOS_WEBGL else go.Scatter
+
+    fig = go.Figure()
+
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms,
+        y=precos,
+        mode='lines',
+        name='Preço',
+        line=dict(color='#00d4ff', width=2),
+        fill='tozeroy',
+        fillcolor='rgba(0, 212, 255, 0.1)',
+        hovertemplate='<b>Data:</b> %{x|%d/%m/%Y %H:%M}<br><b>Preço:</b> ' + simbolo + '%{y:.2f}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title=titulo,
+        xaxis_title="Data",
+        yaxis_title=f"Preço ({moeda.upper()})",
+        # Timestamps em milissegundos: o eixo precisa ser declarado como data
+        xaxis_type='date',
+        hovermode='x unified',
+        template='plotly_dark',
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0.3)',
+        plot_bgcolor='rgba(0,0,0,0.3)',
+        font=dict(color='white')
+    )
+
+    return fig
+
+
+def criar_grafico_historico(df_historico, titulo, largura_px=None, moeda='usd'):
+    """
+    Cria gráfico de linha com os dados históricos (preços já em `moeda`).
+    Séries com mais pontos do que a largura comporta são reduzidas (LTTB).
+    Retorna figure do Plotly.
+    """
+    if df_historico.empty or 'timestamp' not in df_historico.columns or 'price' not in df_historico.columns:
+        return None
+
+    alvo = pontos_alvo(largura_px) if largura_px else pontos_alvo()
+    df_historico = reduzir_serie(df_historico, alvo)
+
+    # Payload compacto: timestamps em ms (float64, exato para datas; o Plotly
+    # não codifica int64 como typed array) e preços em float32
+    timestamps_ms = df_historico['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.float64)
+    precos = df_historico['price'].to_numpy(dtype=np.float32)
+    return _figura_historico(timestamps_ms, precos, titulo, moeda)
+
+
+# Colunas de indicadores sobrepostas ao preço em criar_grafico_indicadores
+COLUNAS_SOBREPOSTAS = ['media', 'ema', 'banda_superior', 'banda_inferior']
+
+
+@figura_em_cache
+def _figura_indicadores(timestamps_ms, series, titulo, moeda):
+    """
+    Monta o gráfico de preço com média móvel, EMA e bandas de Bollinger.
+    `series` tem uma linha por curva: preço e COLUNAS_SOBREPOSTAS.
+    """
+    precos, media, ema, superior, inferior = series
+    valor = simbolo_moeda(moeda) + '%{y:.2f}<extra></extra>'
+    tipo_traco = go.Scattergl if len(precos) >= PONTOS_WEBGL else go.Scatter
+
+    fig = go.Figure()
+
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms, y=superior, mode='lines', name='Bollinger (sup.)',
+        line=dict(color='rgba(200, 200, 200, 0.5)', width=1),
+        hovertemplate='Banda sup.: ' + valor
+    ))
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms, y=inferior, mode='lines', name='Bollinger (inf.)',
+        line=dict(color='rgba(200, 200, 200, 0.5)', width=1),
+        fill='tonexty', fillcolor='rgba(200, 200, 200, 0.08)',
+        hovertemplate='Banda inf.: ' + valor
+    ))
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms, y=precos, mode='lines', name='Preço',
+        line=dict(color='#00d4ff', width=2),
+        hovertemplate='<b>Data:</b> %{x|%d/%m/%Y %H:%M}<br><b>Preço:</b> ' + valor
+    ))
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms, y=media, mode='lines', name='Média móvel',
+        line=dict(color='#ffd166', width=1.5, dash='dash'),
+        hovertemplate='Média: ' + valor
+    ))
+    fig.add_trace(tipo_traco(
+        x=timestamps_ms, y=ema, mode='lines', name='EMA',
+        line=dict(color='#ef476f', width=1.5),
+        hovertemplate='EMA: ' + valor
+    ))
+
+    fig.update_layout(
+        title=titulo,
+        xaxis_title="Data",
+        yaxis_title=f"Preço ({moeda.upper()})",
+        xaxis_type='date',
+        hovermode='x unified',
+        template='plotly_dark',
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0.3)',
+        plot_bgcolor='rgba(0,0,0,0.3)',
+        font=dict(color='white'),
+        legend=dict(orientation='h', y=-0.2)
+    )
+
+    return fig
+
+
+def criar_grafico_indicadores(df_indicadores, titulo, largura_px=None, moeda='usd'):
+    """
+    Cria gráfico do preço com os indicadores sobrepostos (colunas de
+    IndicadoresSeries.obter). A redução LTTB escolhe os pontos pelo preço e
+    leva junto as linhas dos indicadores. Retorna figure do Plotly.
+    """
+    colunas = ['timestamp', 'price'] + COLUNAS_SOBREPOSTAS
+    if df_indicadores.empty or any(coluna not in df_indicadores.columns for coluna in colunas):
+        return None
+
+    alvo = pontos_alvo(largura_px) if largura_px else pontos_alvo()
+    df_indicadores = reduzir_serie(df_indicadores, alvo)
+
+    timestamps_ms = df_indicadores['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.float64)
+    series = df_indicadores[colunas[1:]].to_numpy(dtype=np.float32).T
+    return _figura_indicadores(timestamps_ms, np.ascontiguousarray(series), titulo, moeda)
+
+
+@figura_em_cache
+def _figura_distribuicao(df_top, moeda):
+    """
+    Monta o gráfico de pizza a partir da fatia Top 10 já filtrada.
+    """
+    import plotly.express as px
+
+    fig = px.pie(
+        df_top,
+        values='market_cap',
+        names='name',
+        title='Distribuição de Market Cap (Top 10)',
+        hole=0.4,
+        color_discrete_sequence=px.colors.sequential.Plasma
+    )
+
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Market Cap: ' + simbolo_moeda(moeda) + '%{value:,.0f}<br>Percentual: %{percent}<extra></extra>'
+    )
+
+    fig.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0.3)',
+        height=400,
+        font=dict(color='white')
+    )
+
+    return fig
+
+
+def criar_grafico_distribuicao(df, moeda='usd'):
+    """
+    Cria gráfico de pizza com distribuição de market cap (Top 10), em `moeda`.
+    Retorna figure do Plotly.
+    """
+    if df.empty or 'market_cap' not in df.columns or 'name' not in df.columns:
+        return None
+
+    # Top 10 para o gráfico, só com as colunas usadas (chave do cache)
+    df_top = df.head(10)[['name', 'market_cap']].copy()
+    df_top['name'] = df_top['name'].astype(str)
+
+    # Remover valores nulos
+    df_top = df_top[df_top['market_cap'].notna()]
+
+    if df_top.empty:
+        return None
+
+    return _figura_distribuicao(df_top, moeda)
+
+
+@figura_em_cache
+def _figura_barras(df_top10, color_col, moeda):
+    """
+    Monta o gráfico de barras a partir da fatia Top 10 já filtrada.
+    """
+    import plotly.express as px
+
+    fig = px.bar(
+        df_top10,
+        x='name',
+        y='market_cap',
+        title='Top 10 Criptomoedas por Market Cap',
+        labels={'market_cap': f"Market Cap ({moeda.upper()})", 'name': 'Criptomoeda'},
+        color=color_col,
+        color_continuous_scale=['red', 'yellow', 'green'],
+        hover_data={'market_cap': ':,.0f'}
+    )
+
+    fig.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0.3)',
+        height=400,
+        xaxis_tickangle=-45,
+        font=dict(color='white')
+    )
+
+    return fig
+
+
+def criar_grafico_barras(df, moeda='usd'):
+    """
+    Cria gráfico de barras com Top 10 por Market Cap, em `moeda`.
+    Retorna figure do Plotly.
+    """
+    if df.empty or 'market_cap' not in df.columns or 'name' not in df.columns:
+        return None
+
+    # Verificar se a coluna de variação existe
+    color_col = 'price_change_percentage_24h' if 'price_change_percentage_24h' in df.columns else None
+
+    # Top 10, só com as colunas usadas (chave do cache)
+    colunas = ['name', 'market_cap'] + ([color_col] if color_col else [])
+    df_top10 = df.head(10)[colunas].copy()
+    df_top10['name'] = df_top10['name'].astype(str)
+    df_top10 = df_top10[df_top10['market_cap'].notna()]
+
+    if df_top10.empty:
+        return None
+
+    return _figura_barras(df_top10, color_col, moeda)
+
+
+@figura_em_cache
+def _figura_correlacao(matriz, nomes, titulo):
+    """
+    Monta o mapa de calor da matriz de correlação.
+    """
+    fig = go.Figure(go.Heatmap(
+        z=matriz,
+        x=nomes,
+        y=nomes,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        reversescale=True,
+        colorbar=dict(title='ρ'),
+        hovertemplate='%{y} × %{x}<br>Correlação: %{z:.2f}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title=titulo,
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0.3)',
+        height=max(400, 18 * len(nomes) + 150),
+        xaxis_tickangle=-45,
+        yaxis_autorange='reversed',
+        font=dict(color='white')
+    )
+
+    return fig
+
+
+def criar_grafico_correlacao(matriz, nomes, titulo="Correlação dos Retornos Horários (7 dias)"):
+    """
+    Cria mapa de calor da correlação entre moedas (matriz quadrada alinhada
+    com `nomes`). Retorna figure do Plotly.
+    """
+    if len(nomes) < 2:
+        return None
+
+    # float32 basta para correlações e reduz o payload (typed array)
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+    return _figura_correlacao(matriz, [str(nome) for nome in nomes], titulo)
@@ -0,0 +1,289 @@
+"""
+Indicadores técnicos calculados sobre matrizes (moedas × tempo).
+
+Média móvel, EMA, RSI (Wilder), bandas de Bollinger, volatilidade realizada
+e drawdown são calculados de uma vez para todas as linhas da matriz: médias
+e desvios móveis por somas acumuladas, EMA e médias do RSI por recursão
+no tempo (cada passo vale para todas as moedas) e drawdown pelo máximo
+acumulado.
+
+MotorIndicadores guarda o estado do fim da série (cauda das janelas, última
+EMA, médias do RSI, máximo) e, quando pontos novos chegam, calcula só as
+colunas novas. IndicadoresMercado calcula os sparklines de todas as moedas
+uma vez por snapshot; IndicadoresSeries mantém os indicadores das
+séries históricas, complementados quando a série só ganhou pontos no fim.
+Se a janela andou (perdeu pontos no começo), a série é recalculada: EMA,
+RSI e drawdown dependem de todos os pontos desde o início da janela.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# Janelas em pontos horários. Os sparklines já são horários; as séries
+# históricas são reduzidas a um ponto por hora antes do cálculo (serie_horaria)
+Parametros = namedtuple('Parametros', [
+    'janela_media', 'janela_ema', 'janela_rsi', 'janela_bollinger', 'desvios_bollinger',
+    'janela_volatilidade', 'periodos_ano'
+])
+PARAMETROS_PADRAO = Parametros(
+    janela_media=20, janela_ema=20, janela_rsi=14, janela_bollinger=20, desvios_bollinger=2.0,
+    janela_volatilidade=24, periodos_ano=24 * 365
+)
+
+# Todos os indicadores têm a forma da matriz de preços (moedas × tempo).
+# rsi em 0-100; volatilidade anualizada e drawdown em %.
+Indicadores = namedtuple('Indicadores', [
+    'media', 'ema', 'rsi', 'banda_superior', 'banda_inferior', 'volatilidade', 'drawdown'
+])
+
+# Estado do fim da série, suficiente para continuar o cálculo
+_Estado = namedtuple('_Estado', [
+    'cauda', 'ema', 'media_ganhos', 'media_perdas', 'variacoes', 'maximo'
+])
+
+# Séries históricas mantidas por IndicadoresSeries (LRU)
+CAPACIDADE_SERIES = 128
+
+
+def _como_matriz(valores):
+    matriz = np.asarray(valores, dtype=np.float64)
+    return matriz.reshape(1, -1) if matriz.ndim == 1 else matriz
+
+
+def estatisticas_moveis(matriz, janela, ddof=0):
+    """
+    Retorna tupla (média, desvio padrão) das janelas de `janela` colunas
+    terminadas em cada coluna; NaN onde a janela não está completa.
+    """
+    matriz = _como_matriz(matriz)
+    validos = np.isfinite(matriz)
+    # Centrar cada linha na sua média reduz o erro das somas de quadrados
+    quantidade = validos.sum(axis=1, keepdims=True)
+    referencia = np.where(validos, matriz, 0.0).sum(axis=1, keepdims=True) / np.maximum(quantidade, 1)
+    centrada = np.where(validos, matriz - referencia, 0.0)
+
+    def somar(valores):
+        acumulado = np.cumsum(valores, axis=1)
+        soma = acumulado.copy()
+        soma[:, janela:] -= acumulado[:, :-janela]
+        return soma
+
+    soma = somar(centrada)
+    soma_quadrados = somar(centrada * centrada)
+    completas = somar(validos.astype(np.int32)) == janela
+
+    media = soma / janela
+    variancia = np.maximum(soma_quadrados - soma * media, 0.0) / (janela - ddof)
+    media = np.where(completas, media + referencia, np.nan)
+    desvio = np.where(completas, np.sqrt(variancia), np.nan)
+    return media, desvio
+
+
+def media_exponencial(matriz, alfa, inicial=None):
+    """
+    EMA de cada linha (recursiva, sem ajuste). O laço percorre só o tempo;
+    cada passo atualiza todas as moedas de uma vez. NaN mantém o valor
+    anterior; `inicial` (uma EMA por linha) continua uma série já calculada.
+    """
+    matriz = _como_matriz(matriz)
+    ema = np.empty_like(matriz)
+    anterior = np.full(len(matriz), np.nan) if inicial is None else np.array(inicial, dtype=np.float64)
+    for coluna in range(matriz.shape[1]):
+        valores = matriz[:, coluna]
+        proximo = anterior + alfa * (valores - anterior)
+        # Sem média ainda: começa no valor; valor ausente: mantém a média
+        proximo = np.where(np.isnan(anterior), valores, np.where(np.isnan(valores), anterior, proximo))
+        ema[:, coluna] = anterior = proximo
+    return ema
+
+
+def _estado_vazio(moedas):
+    vazio = np.full(moedas, np.nan)
+    return _Estado(np.empty((moedas, 0)), vazio, vazio, vazio, np.zeros(moedas, dtype=np.int64), vazio)
+
+
+def _calcular(novas, estado, parametros):
+    """
+    Retorna tupla (Indicadores das colunas novas, novo estado).
+    """
+    p = parametros
+    colunas = novas.shape[1]
+    precos = np.hstack([estado.cauda, novas])
+    inicio = estado.cauda.shape[1]
+
+    centro, desvio = estatisticas_moveis(precos, p.janela_bollinger)
+    media = centro if p.janela_media == p.janela_bollinger else estatisticas_moveis(precos, p.janela_media)[0]
+    superior = centro + p.desvios_bollinger * desvio
+    inferior = centro - p.desvios_bollinger * desvio
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacoes = np.diff(precos, axis=1, prepend=np.nan)
+        retornos = np.log(precos[:, 1:] / precos[:, :-1])
+    _, desvio_retornos = estatisticas_moveis(retornos, p.janela_volatilidade, ddof=1)
+    volatilidade = np.hstack([np.full((len(precos), 1), np.nan), desvio_retornos])[:, :precos.shape[1]]
+    volatilidade = volatilidade * np.sqrt(p.periodos_ano) * 100
+
+    variacoes = variacoes[:, inicio:]
+    ema = media_exponencial(novas, 2 / (p.janela_ema + 1), estado.ema)
+    ganhos = media_exponencial(np.clip(variacoes, 0, None), 1 / p.janela_rsi, estado.media_ganhos)
+    perdas = media_exponencial(np.clip(-variacoes, 0, None), 1 / p.janela_rsi, estado.media_perdas)
+    contagem = estado.variacoes[:, None] + np.cumsum(np.isfinite(variacoes), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + ganhos / perdas)
+    rsi = np.where(contagem >= p.janela_rsi, rsi, np.nan)
+
+    maximo = np.fmax.accumulate(np.hstack([estado.maximo[:, None], novas]), axis=1)[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = (novas / maximo - 1) * 100
+
+    indicadores = Indicadores(
+        media[:, inicio:], ema, rsi, superior[:, inicio:], inferior[:, inicio:],
+        volatilidade[:, inicio:], drawdown
+    )
+    tamanho_cauda = max(p.janela_media, p.janela_bollinger, p.janela_volatilidade + 1)
+    novo_estado = _Estado(
+        precos[:, -tamanho_cauda:],
+        ema[:, -1] if colunas else estado.ema,
+        ganhos[:, -1] if colunas else estado.media_ganhos,
+        perdas[:, -1] if colunas else estado.media_perdas,
+        contagem[:, -1] if colunas else estado.variacoes,
+        maximo[:, -1] if colunas else estado.maximo,
+    )
+    return indicadores, novo_estado
+
+
+class MotorIndicadores:
+    """
+    Indicadores de uma matriz de preços (moedas × tempo), com atualização
+    incremental: anexar() calcula só as colunas novas. O número de moedas
+    (linhas) é fixado no primeiro cálculo.
+    """
+
+    def __init__(self, parametros=PARAMETROS_PADRAO):
+        self.parametros = parametros
+        self.indicadores = None
+        self._estado = None
+
+    def calcular(self, matriz):
+        """
+        Calcula os indicadores da matriz inteira, descartando o estado anterior.
+        """
+        self.indicadores = None
+        self._estado = None
+        return self.anexar(matriz)
+
+    def anexar(self, novas):
+        """
+        Acrescenta colunas (pontos mais recentes) e retorna os indicadores da
+        série inteira. Lança ValueError se o número de linhas mudar.
+        """
+        novas = _como_matriz(novas)
+        if self._estado is None:
+            self._estado = _estado_vazio(len(novas))
+        elif len(novas) != len(self._estado.ema):
+            raise ValueError(f"Esperadas {len(self._estado.ema)} linhas, recebidas {len(novas)}")
+
+        calculados, self._estado = _calcular(novas, self._estado, self.parametros)
+        if self.indicadores is None:
+            self.indicadores = calculados
+        else:
+            self.indicadores = Indicadores(*(np.hstack([anterior, novo])
+                                             for anterior, novo in zip(self.indicadores, calculados)))
+        return self.indicadores
+
+
+class IndicadoresMercado:
+    """
+    Indicadores dos sparklines de todas as moedas, calculados uma única vez
+    por snapshot e compartilhados pelas sessões. A chave inclui o instante
+    da coleta: no modo serviço as versões recomeçam quando o serviço reinicia.
+    """
+
+    def __init__(self, parametros=PARAMETROS_PADRAO):
+        self.parametros = parametros
+        self._chave = None
+        self._indicadores = None
+        self._trava = threading.Lock()
+
+    def obter(self, snapshot):
+        """
+        Retorna os Indicadores (linhas alinhadas com snapshot.df) do snapshot.
+        """
+        with self._trava:
+            chave = (snapshot.atualizado_em, snapshot.versao)
+            if self._chave != chave or self._indicadores is None:
+                self._indicadores = MotorIndicadores(self.parametros).calcular(snapshot.sparklines)
+                self._chave = chave
+            return self._indicadores
+
+
+def serie_horaria(df_historico):
+    """
+    Retorna as linhas de df_historico (timestamp, price; em ordem) com o
+    último preço válido de cada hora. Janelas refinadas e a hora corrente
+    podem trazer pontos de 5 minutos, que distorceriam janelas contadas em
+    pontos e a anualização da volatilidade.
+    """
+    validos = df_historico[df_historico['price'].notna()]
+    hora = validos['timestamp'].dt.floor('h')
+    return validos[~hora.duplicated(keep='last').to_numpy()]
+
+
+class IndicadoresSeries:
+    """
+    Indicadores de séries históricas por chave (ex.: (moeda, dias)). Se a
+    série nova começa no mesmo ponto e só ganhou pontos no fim, só os pontos
+    novos são calculados; senão, a série é recalculada, com o mesmo
+    resultado de um cálculo do zero.
+    """
+
+    def __init__(self, parametros=PARAMETROS_PADRAO, capacidade=CAPACIDADE_SERIES):
+        self.parametros = parametros
+        self.capacidade = capacidade
+        self._series = OrderedDict()
+        self._trava = threading.Lock()
+        self.recalculos = 0
+        self.incrementais = 0
+
+    def obter(self, chave, df_historico):
+        """
+        Retorna DataFrame com timestamp, price e uma coluna por indicador, com
+        um ponto por hora (ver serie_horaria).
+        """
+        df_historico = serie_horaria(df_historico)
+        timestamps = df_historico['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        precos = df_historico['price'].to_numpy(dtype=np.float64)
+
+        with self._trava:
+            motor, anteriores = self._series.pop(chave, (None, None))
+            mantidos = 0
+            if motor is not None and 0 < len(anteriores) <= len(timestamps):
+                if np.array_equal(anteriores, timestamps[:len(anteriores)]):
+                    mantidos = len(anteriores)
+
+            if mantidos:
+                indicadores = motor.anexar(precos[mantidos:])
+                self.incrementais += 1
+            else:
+                motor = MotorIndicadores(self.parametros)
+                indicadores = motor.calcular(precos)
+                self.recalculos += 1
+
+            self._series[chave] = (motor, timestamps)
+            while len(self._series) > self.capacidade:
+                self._series.popitem(last=False)
+
+        resultado = df_historico[['timestamp', 'price']].reset_index(drop=True)
+        for nome, valores in zip(Indicadores._fields, indicadores):
+            resultado[nome] = valores[0]
+        return resultado
+
+
+def ultimo_valor(valores):
+    """
+    Retorna o último valor finito de uma série (ou None).
+    """
+    valores = np.asarray(valores)
+    finitos = valores[np.isfinite(valores)]
+    return float(finitos[-1]) if len(finitos) else None
@@ -0,0 +1,119 @@
+"""
+Limitador de taxa (token bucket) compartilhado por todas as chamadas à API.
+
+Requisições passam imediatamente enquanto houver tokens; quando o balde
+esvazia, elas esperam em fila, atendidas por ordem de chegada.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+
+# Orçamento do plano gratuito da CoinGecko (~10-30 req/min): 15 por minuto,
+# com rajadas de até 5 requisições.
+TAXA_PADRAO = 15 / 60
+CAPACIDADE_PADRAO = 5
+
+
+class EsperaLimitadorExcedida(requests.exceptions.Timeout):
+    """
+    A requisição esperou na fila do limitador por mais tempo que o permitido.
+    """
+
+
+class LimitadorTaxa:
+    """
+    Token bucket com fila justa (FIFO) e estatísticas de espera.
+    """
+
+    def __init__(self, taxa=TAXA_PADRAO, capacidade=CAPACIDADE_PADRAO):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultima_reposicao = time.monotonic()
+        self._condicao = threading.Condition()
+        self._fila = deque()
+
+        self._total = 0
+        self._imediatas = 0
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultima_reposicao) * self.taxa)
+        self._ultima_reposicao = agora
+
+    def _registrar(self, espera):
+        self._total += 1
+        if espera == 0:
+            self._imediatas += 1
+        self._espera_total += espera
+        self._espera_maxima = max(self._espera_maxima, espera)
+
+    def adquirir(self, timeout=None):
+        """
+        Consome um token, esperando na fila se necessário.
+        Retorna o tempo de espera em segundos; lança EsperaLimitadorExcedida
+        se o timeout expirar antes da vez da requisição.
+        """
+        inicio = time.monotonic()
+
+        with self._condicao:
+            self._repor()
+            if not self._fila and self._tokens >= 1:
+                self._tokens -= 1
+                self._registrar(0.0)
+                return 0.0
+
+            vez = object()
+            self._fila.append(vez)
+            try:
+                while True:
+                    self._repor()
+                    primeiro = self._fila[0] is vez
+                    if primeiro and self._tokens >= 1:
+                        self._tokens -= 1
+                        espera = time.monotonic() - inicio
+                        self._registrar(espera)
+                        return espera
+
+                    # Só o primeiro da fila sabe quanto falta para o próximo token
+                    espera = (1 - self._tokens) / self.taxa if primeiro else None
+                    if timeout is not None:
+                        restante = timeout - (time.monotonic() - inicio)
+                        if restante <= 0:
+                            raise EsperaLimitadorExcedida(
+                                f"Fila do limitador de requisições excedeu {timeout:.1f}s"
+                            )
+                        espera = restante if espera is None else min(espera, restante)
+                    self._condicao.wait(espera)
+            finally:
+                self._fila.remove(vez)
+                self._condicao.notify_all()
+
+    def penalizar(self, segundos):
+        """
+        Esvazia o balde por `segundos` (ex.: após um 429 com Retry-After),
+        fazendo todas as requisições do processo aguardarem.
+        """
+        with self._condicao:
+            self._repor()
+            self._tokens = min(self._tokens, -segundos * self.taxa)
+            self._condicao.notify_all()
+
+    def estatisticas(self):
+        """
+        Retorna dicionário com profundidade da fila, tokens e tempos de espera.
+        """
+        with self._condicao:
+            self._repor()
+            return {
+                'fila': len(self._fila),
+                'tokens': self._tokens,
+                'total': self._total,
+                'imediatas': self._imediatas,
+                'espera_media': self._espera_total / self._total if self._total else 0.0,
+                'espera_maxima': self._espera_maxima,
+            }
@@ -0,0 +1,226 @@
+"""
+Instrumentação do caminho quente: tempos por etapa e contadores.
+
+Desligada por padrão: sem METRICAS=1, medir() devolve um contexto vazio
+compartilhado e contar() retorna na hora, então as chamadas espalhadas
+pelo código custam praticamente nada. Ligada, cada etapa acumula número de
+execuções, soma e máximo dos tempos; contadores levam rótulos (ex.: status
+da resposta). Valores que já existem em outros objetos (limitador, cache de
+figuras, single-flight) são lidos só na exportação, por coletores.
+
+Exportação:
+    texto_prometheus()   formato texto do Prometheus (GET /metricas no
+                         servico_dados.py, ou METRICAS_PORTA no app)
+    METRICAS_LOG=1       cada etapa medida vira uma linha JSON no log 'metricas'
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIXO = 'dashboard'
+TIPO_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+ATIVAS = os.environ.get('METRICAS', '') not in ('', '0')
+LOG = os.environ.get('METRICAS_LOG', '') not in ('', '0')
+
+logger = logging.getLogger('metricas')
+if LOG and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+# Contexto devolvido por medir() com as métricas desligadas
+_NADA = nullcontext()
+
+
+class _Intervalo:
+    """
+    Mede o tempo de um bloco `with` e o registra na etapa ao sair.
+    """
+
+    __slots__ = ('metricas', 'etapa', 'inicio')
+
+    def __init__(self, metricas, etapa):
+        self.metricas = metricas
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.metricas.observar(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in rotulos) + '}'
+
+
+class Metricas:
+    """
+    Tempos por etapa, contadores com rótulos e coletores lidos na exportação.
+    """
+
+    def __init__(self, ativas=ATIVAS, log=LOG):
+        self.ativas = ativas
+        self.log = log
+        self._tempos = {}
+        self._contadores = {}
+        self._coletores = {}
+        self._trava = threading.Lock()
+
+    def medir(self, etapa):
+        """
+        Retorna um contexto que mede o bloco e o registra em `etapa`.
+        """
+        if not self.ativas:
+            return _NADA
+        return _Intervalo(self, etapa)
+
+    def observar(self, etapa, segundos):
+        """
+        Registra uma execução de `etapa` que levou `segundos`.
+        """
+        if not self.ativas:
+            return
+        with self._trava:
+            tempos = self._tempos.get(etapa)
+            if tempos is None:
+                self._tempos[etapa] = [1, segundos, segundos]
+            else:
+                tempos[0] += 1
+                tempos[1] += segundos
+                tempos[2] = max(tempos[2], segundos)
+        if self.log:
+            logger.info(json.dumps({'etapa': etapa, 'segundos': round(segundos, 6),
+                                    'thread': threading.current_thread().name}))
+
+    def contar(self, nome, valor=1, **rotulos):
+        """
+        Soma `valor` ao contador `nome` com os rótulos informados.
+        """
+        if not self.ativas:
+            return
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def registrar_coletor(self, nome, funcao):
+        """
+        Registra `funcao()`, que retorna dict de valores numéricos lidos na
+        exportação (ex.: estatísticas do limitador).
+        """
+        with self._trava:
+            self._coletores[nome] = funcao
+        return self
+
+    def _coletar(self):
+        with self._trava:
+            coletores = dict(self._coletores)
+        valores = {}
+        for nome, funcao in coletores.items():
+            try:
+                dados = funcao()
+            except Exception:
+                # Um coletor com problema não derruba a exportação
+                continue
+            for chave, valor in dados.items():
+                if isinstance(valor, (int, float)):
+                    valores[f"{nome}_{chave}"] = valor
+        return valores
+
+    def resumo(self):
+        """
+        Retorna dict com 'etapas' (etapa -> execuções, total_s, medio_ms,
+        maximo_ms), 'contadores' (nome{rotulos} -> valor) e 'coletados'.
+        """
+        with self._trava:
+            tempos = {etapa: list(valores) for etapa, valores in self._tempos.items()}
+            contadores = dict(self._contadores)
+        return {
+            'etapas': {
+                etapa: {'execucoes': n, 'total_s': soma, 'medio_ms': soma / n * 1000, 'maximo_ms': maximo * 1000}
+                for etapa, (n, soma, maximo) in sorted(tempos.items())
+            },
+            'contadores': {nome + _rotulos(rotulos): valor for (nome, rotulos), valor in sorted(contadores.items())},
+            'coletados': self._coletar(),
+        }
+
+    def texto_prometheus(self):
+        """
+        Retorna as métricas no formato texto de exposição do Prometheus.
+        """
+        with self._trava:
+            tempos = sorted(self._tempos.items())
+            contadores = sorted(self._contadores.items())
+
+        linhas = []
+        if tempos:
+            nome = f"{PREFIXO}_etapa_segundos"
+            linhas.append(f"# TYPE {nome} summary")
+            for etapa, (n, soma, _) in tempos:
+                linhas.append(f'{nome}_count{{etapa="{etapa}"}} {n}')
+                linhas.append(f'{nome}_sum{{etapa="{etapa}"}} {soma:.6f}')
+            linhas.append(f"# TYPE {nome}_max gauge")
+            for etapa, (_, _, maximo) in tempos:
+                linhas.append(f'{nome}_max{{etapa="{etapa}"}} {maximo:.6f}')
+
+        vistos = set()
+        for (nome, rotulos), valor in contadores:
+            if nome not in vistos:
+                vistos.add(nome)
+                linhas.append(f"# TYPE {PREFIXO}_{nome}_total counter")
+            linhas.append(f"{PREFIXO}_{nome}_total{_rotulos(rotulos)} {valor}")
+
+        for nome, valor in sorted(self._coletar().items()):
+            linhas.append(f"# TYPE {PREFIXO}_{nome} gauge")
+            linhas.append(f"{PREFIXO}_{nome} {valor}")
+        return '\n'.join(linhas) + '\n'
+
+    def zerar(self):
+        """
+        Descarta tempos e contadores (os coletores continuam registrados).
+        """
+        with self._trava:
+            self._tempos.clear()
+            self._contadores.clear()
+
+
+metricas = Metricas()
+
+
+class ManipuladorMetricas(BaseHTTPRequestHandler):
+    """
+    Servidor mínimo de GET /metricas para processos sem rota HTTP própria.
+    """
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metricas':
+            self.send_error(404)
+            return
+        corpo = self.server.metricas.texto_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', TIPO_PROMETHEUS)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def iniciar_exportador(porta, host='127.0.0.1', registro=metricas):
+    """
+    Serve GET /metricas em uma thread e retorna o servidor.
+    """
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorMetricas)
+    servidor.daemon_threads = True
+    servidor.metricas = registro
+    threading.Thread(target=servidor.serve_forever, name="exportador-metricas", daemon=True).start()
+    return servidor
@@ -0,0 +1,132 @@
+"""
+Diferenças entre snapshots de mercado e agregados incrementais.
+
+Cada novo snapshot é comparado com o anterior por `id` e `last_updated`,
+gerando um conjunto de mudanças (moedas alteradas, que entraram e que
+saíram do ranking acompanhado). Os agregados do painel (market cap total,
+volume total, dominância BTC e variação média 24h) são atualizados apenas
+com as linhas dessas moedas.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Conjunto de mudanças entre dois snapshots (arrays de ids)
+ConjuntoMudancas = namedtuple('ConjuntoMudancas', ['alteradas', 'entraram', 'sairam'])
+
+# Agregados publicados com o snapshot
+AgregadosMercado = namedtuple('AgregadosMercado', [
+    'market_cap_total', 'volume_total', 'dominancia_btc', 'media_variacao_24h', 'moedas'
+])
+
+SEM_MUDANCAS = ConjuntoMudancas(np.array([], dtype=object), np.array([], dtype=object),
+                                np.array([], dtype=object))
+
+AGREGADOS_VAZIOS = AgregadosMercado(0.0, 0.0, None, None, 0)
+
+ID_BITCOIN = 'bitcoin'
+
+# A cada tantas atualizações incrementais, os agregados são recalculados do
+# zero para não acumular erro de arredondamento
+RECALCULO_COMPLETO = 100
+
+
+def _chaves(df):
+    """
+    Retorna DataFrame com id (str) e last_updated de um snapshot.
+    """
+    if df.empty:
+        return pd.DataFrame({'id': pd.Series([], dtype=object),
+                             'last_updated': pd.Series([], dtype='datetime64[ns, UTC]')})
+    return pd.DataFrame({'id': df['id'].astype(str).to_numpy(),
+                         'last_updated': df['last_updated'].to_numpy()})
+
+
+def calcular_mudancas(df_anterior, df_novo):
+    """
+    Compara dois snapshots por id e last_updated.
+    Retorna ConjuntoMudancas com os ids alterados, que entraram e que saíram.
+    """
+    anterior = _chaves(df_anterior)
+    novo = _chaves(df_novo)
+
+    juncao = novo.merge(anterior, on='id', how='outer', suffixes=('_novo', '_anterior'), indicator=True)
+    ambos = juncao['_merge'] == 'both'
+    # NaT nunca é igual a NaT: moedas sem last_updated contam como alteradas
+    alteradas = ambos & (juncao['last_updated_novo'] != juncao['last_updated_anterior'])
+
+    return ConjuntoMudancas(
+        alteradas=juncao.loc[alteradas, 'id'].to_numpy(dtype=object),
+        entraram=juncao.loc[juncao['_merge'] == 'left_only', 'id'].to_numpy(dtype=object),
+        sairam=juncao.loc[juncao['_merge'] == 'right_only', 'id'].to_numpy(dtype=object),
+    )
+
+
+class AcumuladorAgregados:
+    """
+    Mantém somas e contagens do mercado e as atualiza só com as moedas que mudaram.
+    """
+
+    def __init__(self):
+        self._zerar()
+        self._atualizacoes = 0
+
+    def _zerar(self):
+        self.market_cap = 0.0
+        self.volume = 0.0
+        self.soma_variacao = 0.0
+        self.contagem_variacao = 0
+        self.moedas = 0
+        self.market_cap_btc = None
+
+    def _somar(self, df, sinal):
+        if df.empty:
+            return
+        variacao = df['price_change_percentage_24h'].to_numpy(dtype='float64')
+        self.market_cap += sinal * np.nansum(df['market_cap'].to_numpy(dtype='float64'))
+        self.volume += sinal * np.nansum(df['total_volume'].to_numpy(dtype='float64'))
+        self.soma_variacao += sinal * np.nansum(variacao)
+        self.contagem_variacao += sinal * int(np.count_nonzero(~np.isnan(variacao)))
+        self.moedas += sinal * len(df)
+
+    def _atualizar_btc(self, df_novo):
+        linha_btc = df_novo[df_novo['id'] == ID_BITCOIN]
+        self.market_cap_btc = float(linha_btc['market_cap'].iloc[0]) if not linha_btc.empty else None
+
+    def recalcular(self, df):
+        """
+        Recalcula todos os agregados a partir do snapshot completo.
+        """
+        self._zerar()
+        self._somar(df, 1)
+        if not df.empty:
+            self._atualizar_btc(df)
+        self._atualizacoes = 0
+
+    def aplicar(self, df_anterior, df_novo, mudancas):
+        """
+        Atualiza os agregados só com as linhas das moedas do conjunto de mudanças.
+        """
+        self._atualizacoes += 1
+        if self._atualizacoes >= RECALCULO_COMPLETO or df_anterior.empty:
+            self.recalcular(df_novo)
+            return
+
+        saem = np.concatenate([mudancas.alteradas, mudancas.sairam])
+        entram = np.concatenate([mudancas.alteradas, mudancas.entraram])
+        self._somar(df_anterior[df_anterior['id'].isin(saem)], -1)
+        self._somar(df_novo[df_novo['id'].isin(entram)], 1)
+
+        if ID_BITCOIN in saem or ID_BITCOIN in entram:
+            self._atualizar_btc(df_novo)
+
+    def agregados(self):
+        """
+        Retorna os agregados atuais como AgregadosMercado.
+        """
+        dominancia = None
+        if self.market_cap_btc is not None and self.market_cap > 0:
+            dominancia = float(self.market_cap_btc / self.market_cap * 100)
+        media = float(self.soma_variacao / self.contagem_variacao) if self.contagem_variacao else None
+        return AgregadosMercado(float(self.market_cap), float(self.volume), dominancia, media, self.moedas)
@@ -0,0 +1,66 @@
+"""
+Registro dos caches do dashboard, organizados em regiões nomeadas.
+
+Cada região (mercado, historico, figuras) registra uma função de
+invalidação que aceita uma chave opcional: com chave, só aquele item é
+invalidado (ex.: o histórico de uma moeda); sem chave, a região inteira.
+Assim o botão "Atualizar Agora" renova só o que a sessão está vendo, sem
+esvaziar os caches de todas as outras sessões.
+"""
+import threading
+
+MERCADO = 'mercado'
+HISTORICO = 'historico'
+FIGURAS = 'figuras'
+
+
+class RegiaoInexistente(KeyError):
+    """
+    Nenhuma região registrada com o nome pedido.
+    """
+
+
+class RegistroCaches:
+    """
+    Regiões de cache nomeadas, cada uma com sua função de invalidação.
+    """
+
+    def __init__(self):
+        self._regioes = {}
+        self._invalidacoes = {}
+        self._trava = threading.Lock()
+
+    def registrar(self, nome, invalidar):
+        """
+        Registra a região `nome`; `invalidar(chave=None)` invalida um item ou tudo.
+        """
+        with self._trava:
+            self._regioes[nome] = invalidar
+            self._invalidacoes.setdefault(nome, 0)
+        return self
+
+    def regioes(self):
+        """
+        Retorna os nomes das regiões registradas.
+        """
+        with self._trava:
+            return list(self._regioes)
+
+    def invalidar(self, nome, chave=None):
+        """
+        Invalida um item da região (ou a região inteira, sem chave).
+        Lança RegiaoInexistente se a região não estiver registrada.
+        """
+        with self._trava:
+            invalidar = self._regioes.get(nome)
+            if invalidar is None:
+                raise RegiaoInexistente(nome)
+            self._invalidacoes[nome] += 1
+        return invalidar(chave)
+
+    def estatisticas(self):
+        """
+        Retorna dicionário região -> número de invalidações.
+        """
+        with self._trava:
+            return dict(self._invalidacoes)
@@ -0,0 +1,250 @@
+"""
+Serviço de dados de mercado, separado da interface Streamlit.
+
+Um único processo é dono da coleta do mercado, do armazém de histórico, do
+aquecimento e da avaliação dos alertas (alertas.py), e serve snapshots
+comprimidos (Arrow IPC ou Parquet, zstd) por HTTP para quantas réplicas do
+dashboard houver. A carga na CoinGecko passa
+a depender só deste processo, não do número de réplicas. O app usa o
+serviço quando a variável SERVICO_DADOS_URL está definida.
+
+Uso (na raiz do projeto):
+    python servico_dados.py [--host 127.0.0.1] [--porta 8765]
+
+Rotas:
+    GET  /saude                              estado do serviço e do limitador (JSON)
+    GET  /mercado?visiveis=20&espera=15      snapshot atual (ETag / If-None-Match)
+    POST /mercado/atualizar                  força uma coleta e retorna o snapshot
+    GET  /historico/<id>?dias=30             últimos `dias` da série
+    GET  /historico/<id>?inicio=<ms>&fim=<ms>  janela da série (zoom)
+    POST /historico/<id>/invalidar           marca a série da moeda como vencida
+    POST /historico/invalidar                marca todas as séries como vencidas
+    GET  /fluxo?ids=bitcoin,ethereum         últimos ticks ao vivo das moedas (JSON)
+    GET  /cambio                             fatores de conversão a partir de USD (JSON)
+    GET  /metricas                           tempos e contadores (texto Prometheus; METRICAS=1)
+
+Snapshots e históricos aceitam `formato=parquet`; o padrão é Arrow IPC.
+"""
+import argparse
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from alertas import obter_motor_alertas
+from aquecimento import AquecedorHistorico
+from armazem_historico import obter_armazem
+from cambio import TabelaCambio
+from cliente_api import obter_cliente
+from coletor_mercado import ColetorMercado
+from fluxo_precos import FluxoPrecos, criar_produtor
+from formato_arrow import (TIPO_ARROW, TIPO_PARQUET, descrever_erro, historico_para_bytes,
+                           snapshot_para_bytes)
+from metricas import TIPO_PROMETHEUS, metricas
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Espera máxima pela primeira coleta em GET /mercado (segundos)
+ESPERA_MAXIMA = 30
+
+
+class ServicoDados:
+    """
+    Dono da coleta, do armazém, do aquecimento e dos alertas. Cada versão
+    do snapshot é serializada uma única vez, qualquer que seja o número de
+    réplicas.
+    """
+
+    def __init__(self, coletor=None, armazem=None):
+        self.armazem = armazem if armazem is not None else obter_armazem()
+        self.aquecedor = AquecedorHistorico(self.armazem).iniciar()
+        self.coletor = coletor if coletor is not None else ColetorMercado()
+        self.coletor.ao_publicar(self.aquecedor.notificar)
+        # Regras gravadas pelas réplicas no mesmo arquivo (ALERTAS_CAMINHO)
+        self.alertas = obter_motor_alertas()
+        self.coletor.ao_publicar(self.alertas.notificar)
+        self.coletor.iniciar()
+        # Uma só consulta de preços ao vivo para todas as réplicas
+        self.fluxo = FluxoPrecos(criar_produtor()).iniciar()
+        # Uma só tabela de câmbio; as réplicas convertem localmente
+        self.cambio = TabelaCambio()
+        # Distingue reinícios do serviço (as versões recomeçam do zero)
+        self.instancia = uuid.uuid4().hex[:8]
+        self._serializados = {}
+        self._trava = threading.Lock()
+        cliente = obter_cliente()
+        metricas.registrar_coletor('limitador', cliente.limitador.estatisticas)
+        metricas.registrar_coletor('api_voo', cliente.voo.estatisticas)
+
+    def etag(self, snapshot):
+        """
+        Retorna o ETag HTTP de um snapshot.
+        """
+        return f'"{self.instancia}-{snapshot.versao}"'
+
+    def serializar(self, snapshot, formato):
+        """
+        Retorna os bytes do snapshot no formato pedido, serializando só na
+        primeira vez que a versão é pedida.
+        """
+        with self._trava:
+            chave = (snapshot.versao, formato)
+            if chave not in self._serializados:
+                # Guarda apenas a versão atual
+                self._serializados = {c: v for c, v in self._serializados.items() if c[0] == snapshot.versao}
+                with metricas.medir('servico_serializar'):
+                    self._serializados[chave] = snapshot_para_bytes(snapshot, formato)
+            return self._serializados[chave]
+
+    def saude(self):
+        """
+        Retorna dict com o estado do serviço.
+        """
+        snapshot = self.coletor.snapshot()
+        return {
+            'instancia': self.instancia,
+            'versao': snapshot.versao,
+            'atualizado_em': snapshot.atualizado_em.isoformat() if snapshot.atualizado_em else None,
+            'moedas': len(snapshot.df),
+            'erro': descrever_erro(snapshot.erro),
+            'limitador': obter_cliente().limitador.estatisticas(),
+        }
+
+
+class ManipuladorServico(BaseHTTPRequestHandler):
+    """
+    Rotas HTTP do serviço de dados (uma thread por conexão).
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def servico(self):
+        return self.server.servico
+
+    def log_message(self, formato, *args):
+        # Réplicas consultam /mercado a cada rerun: sem log por requisição
+        pass
+
+    def _responder(self, status, corpo=b'', tipo='application/json', cabecalhos=None):
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        if corpo:
+            self.wfile.write(corpo)
+
+    def _json(self, status, dados):
+        self._responder(status, json.dumps(dados).encode())
+
+    def _enviar_snapshot(self, snapshot, formato):
+        etag = self.servico.etag(snapshot)
+        if self.headers.get('If-None-Match') == etag:
+            self._responder(304, cabecalhos={'ETag': etag})
+            return
+        tipo = TIPO_PARQUET if formato == 'parquet' else TIPO_ARROW
+        self._responder(200, self.servico.serializar(snapshot, formato), tipo, {'ETag': etag})
+
+    def _mercado(self, params):
+        if 'visiveis' in params:
+            self.servico.aquecedor.registrar_visiveis(int(params['visiveis']))
+        espera = min(float(params.get('espera', 15)), ESPERA_MAXIMA)
+        snapshot = self.servico.coletor.aguardar_snapshot(timeout=espera)
+        self._enviar_snapshot(snapshot, params.get('formato', 'arrow'))
+
+    def _historico(self, cripto_id, params):
+        if 'inicio' in params and 'fim' in params:
+            df = self.servico.armazem.obter_janela(cripto_id, int(params['inicio']), int(params['fim']))
+        else:
+            df = self.servico.armazem.obter(cripto_id, int(params.get('dias', 30)))
+        formato = params.get('formato', 'arrow')
+        tipo = TIPO_PARQUET if formato == 'parquet' else TIPO_ARROW
+        self._responder(200, historico_para_bytes(df, formato), tipo)
+
+    def _tratar(self, rota):
+        url = urlparse(self.path)
+        params = {nome: valores[-1] for nome, valores in parse_qs(url.query).items()}
+        partes = url.path.strip('/').split('/')
+        try:
+            rota(url.path, partes, params)
+        except ValueError as e:
+            self._json(400, descrever_erro(e))
+        except requests.exceptions.Timeout as e:
+            self._json(504, descrever_erro(e))
+        except Exception as e:
+            # Erros da API de origem seguem para o app com tipo e mensagem
+            self._json(502, descrever_erro(e))
+
+    def _fluxo(self, params):
+        ids = [cripto_id for cripto_id in params.get('ids', '').split(',') if cripto_id]
+        self.servico.fluxo.registrar_visiveis(ids)
+        ticks = [self.servico.fluxo.ultimo(cripto_id) for cripto_id in ids]
+        self._json(200, [tick._asdict() for tick in ticks if tick is not None])
+
+    def _rotas_get(self, caminho, partes, params):
+        if caminho == '/saude':
+            self._json(200, self.servico.saude())
+        elif caminho == '/mercado':
+            self._mercado(params)
+        elif len(partes) == 2 and partes[0] == 'historico':
+            self._historico(partes[1], params)
+        elif caminho == '/fluxo':
+            self._fluxo(params)
+        elif caminho == '/cambio':
+            self._json(200, self.servico.cambio.fatores())
+        elif caminho == '/metricas':
+            self._responder(200, metricas.texto_prometheus().encode(), TIPO_PROMETHEUS)
+        else:
+            self._json(404, {'tipo': 'RotaInexistente', 'mensagem': caminho})
+
+    def _rotas_post(self, caminho, partes, params):
+        if caminho == '/mercado/atualizar':
+            self._enviar_snapshot(self.servico.coletor.atualizar_agora(), params.get('formato', 'arrow'))
+        elif partes[0] == 'historico' and partes[-1] == 'invalidar' and len(partes) in (2, 3):
+            cripto_id = partes[1] if len(partes) == 3 else None
+            self.servico.armazem.invalidar(cripto_id)
+            self._json(200, {'invalidado': cripto_id})
+        else:
+            self._json(404, {'tipo': 'RotaInexistente', 'mensagem': caminho})
+
+    def do_GET(self):
+        self._tratar(self._rotas_get)
+
+    def do_POST(self):
+        self._tratar(self._rotas_post)
+
+
+def criar_servidor(host=HOST_PADRAO, porta=PORTA_PADRAO, servico=None):
+    """
+    Cria o servidor HTTP do serviço de dados (sem iniciá-lo).
+    """
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorServico)
+    servidor.daemon_threads = True
+    servidor.servico = servico if servico is not None else ServicoDados()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de dados de mercado do dashboard")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.host, args.porta)
+    print(f"Serviço de dados em http://{args.host}:{args.porta}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Representação colunar compacta do snapshot de mercado.
+
+O JSON de /coins/markets vira um DataFrame só com as colunas usadas pelo
+dashboard (ids, símbolos e nomes como category, números em float32) e uma
+matriz contígua (n_moedas, 168) float32 com os sparklines de 7 dias, no
+lugar de um dict com uma lista Python de floats por linha.
+"""
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Pontos horários do sparkline de 7 dias
+PONTOS_SPARKLINE = 168
+
+COLUNAS_CATEGORICAS = ['id', 'symbol', 'name']
+
+# Preços ficam em float64: são exibidos com até 8 casas decimais
+COLUNAS_FLOAT64 = ['current_price', 'high_24h', 'low_24h']
+
+COLUNAS_FLOAT32 = [
+    'market_cap', 'market_cap_rank', 'total_volume',
+    'price_change_percentage_24h', 'price_change_percentage_1h_in_currency',
+    'price_change_percentage_7d_in_currency', 'price_change_percentage_30d_in_currency',
+]
+
+COLUNAS_DATA = ['last_updated']
+
+# Página já compactada: DataFrame + matriz de sparklines (mesma ordem de linhas)
+PaginaCompacta = namedtuple('PaginaCompacta', ['df', 'sparklines'])
+
+
+def matriz_vazia(linhas=0):
+    """
+    Retorna matriz de sparklines preenchida com NaN.
+    """
+    return np.full((linhas, PONTOS_SPARKLINE), np.nan, dtype=np.float32)
+
+
+def matriz_sparklines(coluna):
+    """
+    Converte a coluna sparkline_in_7d ({'price': [...]} por linha) em matriz
+    (n, PONTOS_SPARKLINE) float32. Séries curtas ficam alinhadas à direita
+    (pontos mais recentes no fim), com NaN no começo.
+    """
+    matriz = matriz_vazia(len(coluna))
+    for linha, item in enumerate(coluna):
+        precos = item.get('price') if isinstance(item, dict) else None
+        if precos:
+            # None vira NaN na conversão para float
+            valores = np.asarray(precos[-PONTOS_SPARKLINE:], dtype=np.float32)
+            matriz[linha, PONTOS_SPARKLINE - len(valores):] = valores
+    return matriz
+
+
+def compactar_pagina(df):
+    """
+    Compacta o DataFrame bruto de uma página de /coins/markets.
+    Retorna PaginaCompacta; campos não usados pelo dashboard são descartados.
+    """
+    compacto = pd.DataFrame(index=df.index)
+    for col in COLUNAS_CATEGORICAS:
+        compacto[col] = df[col].astype(str)
+    for col in COLUNAS_FLOAT64 + COLUNAS_FLOAT32:
+        tipo = 'float64' if col in COLUNAS_FLOAT64 else 'float32'
+        if col in df.columns:
+            compacto[col] = pd.to_numeric(df[col], errors='coerce').astype(tipo)
+        else:
+            compacto[col] = pd.Series(np.nan, index=df.index, dtype=tipo)
+    for col in COLUNAS_DATA:
+        valores = df[col] if col in df.columns else None
+        compacto[col] = pd.to_datetime(valores, utc=True, errors='coerce')
+
+    if 'sparkline_in_7d' in df.columns:
+        sparklines = matriz_sparklines(df['sparkline_in_7d'])
+    else:
+        sparklines = matriz_vazia(len(df))
+
+    return PaginaCompacta(compacto.reset_index(drop=True), sparklines)
+
+
+def unir_paginas(paginas):
+    """
+    Une as páginas em um único snapshot ordenado por rank.
+    Recebe dict pagina -> (PaginaCompacta, instante da coleta). Se uma moeda
+    mudou de página entre coletas, vale a linha da coleta mais recente.
+    Retorna tupla (DataFrame, matriz de sparklines) com linhas alinhadas.
+    """
+    ordem = sorted(paginas, key=lambda pagina: paginas[pagina][1], reverse=True)
+    compactas = [paginas[pagina][0] for pagina in ordem if not paginas[pagina][0].df.empty]
+    if not compactas:
+        return pd.DataFrame(), matriz_vazia()
+
+    df = pd.concat([pagina.df for pagina in compactas], ignore_index=True)
+    sparklines = np.concatenate([pagina.sparklines for pagina in compactas])
+
+    df = df[~df['id'].duplicated(keep='first')]
+    df = df.sort_values('market_cap_rank', na_position='last', kind='stable')
+
+    # O índice ainda é a posição na concatenação: reordena a matriz junto
+    sparklines = np.ascontiguousarray(sparklines[df.index.to_numpy()])
+    df = df.reset_index(drop=True)
+    for col in COLUNAS_CATEGORICAS:
+        df[col] = df[col].astype('category')
+
+    return df, sparklines
+
+
+def _tamanho_profundo(objeto):
+    """
+    Tamanho em bytes de um objeto Python, incluindo dicts e listas aninhados.
+    """
+    tamanho = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        tamanho += sum(_tamanho_profundo(k) + _tamanho_profundo(v) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple)):
+        tamanho += sum(_tamanho_profundo(item) for item in objeto)
+    return tamanho
+
+
+def memoria_dataframe(df):
+    """
+    Memória ocupada por um DataFrame em bytes, contando o conteúdo de
+    colunas object com dicts/listas (memory_usage(deep=True) não conta).
+    """
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    for col in df.columns:
+        if df[col].dtype == object:
+            aninhados = [v for v in df[col] if isinstance(v, (dict, list, tuple))]
+            total += sum(_tamanho_profundo(v) - sys.getsizeof(v) for v in aninhados)
+    return total
+
+
+def relatorio_memoria(df_bruto, df_compacto, sparklines):
+    """
+    Compara a memória do DataFrame bruto (JSON carregado direto) com o
+    snapshot compacto. Retorna dict com bytes de cada um e a redução.
+    """
+    bruto = memoria_dataframe(df_bruto)
+    compacto = memoria_dataframe(df_compacto) + sparklines.nbytes
+    return {
+        'moedas': len(df_bruto),
+        'bruto_bytes': bruto,
+        'compacto_bytes': compacto,
+        'dataframe_bytes': compacto - sparklines.nbytes,
+        'sparklines_bytes': sparklines.nbytes,
+        'reducao': bruto / compacto if compacto else float('nan'),
+    }
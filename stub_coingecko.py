@@ -0,0 +1,222 @@
+"""
+Stub local da API CoinGecko, para testar o dashboard e o serviço de dados
+de ponta a ponta sem acessar a internet.
+
+Responde com dados sintéticos (determinísticos por moeda) às rotas usadas
+pelo projeto, com a mesma granularidade automática da API real: pontos de
+5 minutos até 1 dia, horários até 90 dias e diários acima disso.
+
+Uso (na raiz do projeto):
+    python stub_coingecko.py [--porta 8100] [--moedas 2000]
+    COINGECKO_URL_BASE=http://127.0.0.1:8100/api/v3 python servico_dados.py
+"""
+import argparse
+import json
+import math
+import re
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+PREFIXO = '/api/v3'
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8100
+MOEDAS_PADRAO = 2000
+
+PONTOS_SPARKLINE = 168
+
+MS_POR_HORA = 3600 * 1000
+MS_POR_DIA = 24 * MS_POR_HORA
+
+ROTA_GRAFICO = re.compile(r'^/coins/([^/]+)/market_chart(/range)?$')
+
+# Cotações fixas em relação ao dólar usadas em /exchange_rates: (nome, unidade, valor)
+CAMBIO_USD = {
+    'usd': ("US Dollar", "$", 1.0),
+    'brl': ("Brazil Real", "R$", 5.4),
+    'eur': ("Euro", "€", 0.92),
+    'gbp': ("British Pound Sterling", "£", 0.79),
+    'jpy': ("Japanese Yen", "¥", 150.0),
+}
+
+
+class MercadoSintetico:
+    """
+    Mercado sintético: preço base, market cap e volume fixos por moeda; o
+    preço oscila em função do tempo, então séries e ranking são coerentes.
+    """
+
+    def __init__(self, moedas=MOEDAS_PADRAO, semente=7):
+        rng = np.random.default_rng(semente)
+        self.moedas = moedas
+        self.ids = ['bitcoin', 'ethereum'] + [f"moeda-{i}" for i in range(3, moedas + 1)]
+        self.precos_base = np.concatenate([[60000.0, 3000.0], rng.lognormal(0, 3, moedas - 2)])
+        # Market cap decrescente: o ranking segue a ordem dos ids
+        self.market_caps = 1.2e12 / np.arange(1, moedas + 1) ** 1.3
+        self.volumes = self.market_caps * rng.uniform(0.01, 0.2, moedas)
+        self.fases = rng.uniform(0, 2 * math.pi, moedas)
+        self.indices = {cripto_id: i for i, cripto_id in enumerate(self.ids)}
+
+    def preco(self, indice, timestamps_ms):
+        """
+        Retorna o preço da moeda nos instantes dados (ms).
+        """
+        t = np.asarray(timestamps_ms, dtype=np.float64) / MS_POR_DIA
+        onda = 0.08 * np.sin(t / 5 + self.fases[indice]) + 0.02 * np.sin(t * 24 / 7 + 2 * self.fases[indice])
+        return self.precos_base[indice] * (1 + onda)
+
+    def serie(self, cripto_id, inicio_ms, fim_ms):
+        """
+        Retorna lista [[timestamp_ms, preco], ...] com a granularidade da API real.
+        Como na API, janelas que chegam ao momento atual terminam no preço atual.
+        """
+        indice = self.indices.get(cripto_id)
+        if indice is None:
+            return None
+        duracao = fim_ms - inicio_ms
+        passo = 5 * 60 * 1000 if duracao <= MS_POR_DIA else MS_POR_HORA if duracao <= 90 * MS_POR_DIA else MS_POR_DIA
+        timestamps = np.arange(inicio_ms - inicio_ms % passo + passo, fim_ms, passo, dtype=np.int64)
+        if fim_ms >= time.time() * 1000 - 60 * 1000:
+            timestamps = np.append(timestamps, np.int64(fim_ms))
+        return [[int(ts), float(p)] for ts, p in zip(timestamps, self.preco(indice, timestamps))]
+
+    def precos_simples(self, ids, agora):
+        """
+        Retorna o corpo de /simple/price (usd e last_updated_at) das moedas.
+        """
+        resultado = {}
+        for cripto_id in ids:
+            indice = self.indices[cripto_id]
+            resultado[cripto_id] = {'usd': float(self.preco(indice, [agora * 1000])[0]),
+                                    'last_updated_at': int(agora)}
+        return resultado
+
+    def cambio(self, agora):
+        """
+        Retorna o corpo de /exchange_rates (valor de 1 BTC em cada moeda).
+        """
+        bitcoin_usd = float(self.preco(0, [agora * 1000])[0])
+        taxas = {'btc': {'name': "Bitcoin", 'unit': "BTC", 'value': 1.0, 'type': 'crypto'}}
+        for moeda, (nome, unidade, valor) in CAMBIO_USD.items():
+            taxas[moeda] = {'name': nome, 'unit': unidade, 'value': bitcoin_usd * valor, 'type': 'fiat'}
+        return {'rates': taxas}
+
+    def pagina(self, pagina, por_pagina, sparkline):
+        """
+        Retorna uma página de /coins/markets.
+        """
+        agora_ms = int(time.time() * 1000)
+        atualizado = datetime.fromtimestamp(agora_ms // 60000 * 60, tz=timezone.utc)
+        horas = agora_ms - agora_ms % MS_POR_HORA - np.arange(PONTOS_SPARKLINE - 1, -1, -1) * MS_POR_HORA
+
+        inicio = (pagina - 1) * por_pagina
+        resultado = []
+        for i in range(inicio, min(inicio + por_pagina, self.moedas)):
+            preco = float(self.preco(i, [agora_ms])[0])
+            anterior_24h = float(self.preco(i, [agora_ms - MS_POR_DIA])[0])
+            variacao = lambda ms: float((preco / self.preco(i, [agora_ms - ms])[0] - 1) * 100)
+            item = {
+                'id': self.ids[i], 'symbol': self.ids[i][:4], 'name': self.ids[i].replace('-', ' ').title(),
+                'image': '', 'current_price': preco,
+                'market_cap': float(self.market_caps[i] * preco / self.precos_base[i]), 'market_cap_rank': i + 1,
+                'total_volume': float(self.volumes[i]), 'high_24h': max(preco, anterior_24h) * 1.01,
+                'low_24h': min(preco, anterior_24h) * 0.99, 'price_change_24h': preco - anterior_24h,
+                'price_change_percentage_24h': variacao(MS_POR_DIA),
+                'last_updated': atualizado.isoformat().replace('+00:00', 'Z'),
+                'price_change_percentage_1h_in_currency': variacao(MS_POR_HORA),
+                'price_change_percentage_24h_in_currency': variacao(MS_POR_DIA),
+                'price_change_percentage_7d_in_currency': variacao(7 * MS_POR_DIA),
+                'price_change_percentage_30d_in_currency': variacao(30 * MS_POR_DIA),
+            }
+            if sparkline:
+                item['sparkline_in_7d'] = {'price': self.preco(i, horas).tolist()}
+            resultado.append(item)
+        return resultado
+
+
+class ManipuladorStub(BaseHTTPRequestHandler):
+    """
+    Rotas do stub (subconjunto de /api/v3 usado pelo projeto).
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _json(self, status, dados):
+        corpo = json.dumps(dados).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {nome: valores[-1] for nome, valores in parse_qs(url.query).items()}
+        caminho = url.path[len(PREFIXO):] if url.path.startswith(PREFIXO) else url.path
+        mercado = self.server.mercado
+
+        if caminho == '/ping':
+            self._json(200, {'gecko_says': '(V3) To the Moon!'})
+        elif caminho == '/simple/price':
+            agora = time.time()
+            ids = [cripto_id for cripto_id in params.get('ids', '').split(',') if cripto_id in mercado.indices]
+            self._json(200, mercado.precos_simples(ids, agora))
+        elif caminho == '/exchange_rates':
+            self._json(200, mercado.cambio(time.time()))
+        elif caminho == '/coins/markets':
+            pagina = mercado.pagina(int(params.get('page', 1)), int(params.get('per_page', 100)),
+                                    params.get('sparkline') == 'true')
+            self._json(200, pagina)
+        elif ROTA_GRAFICO.match(caminho):
+            cripto_id, intervalo = ROTA_GRAFICO.match(caminho).groups()
+            agora_ms = int(time.time() * 1000)
+            if intervalo:
+                inicio_ms, fim_ms = int(params['from']) * 1000, int(params['to']) * 1000
+            else:
+                inicio_ms, fim_ms = agora_ms - int(float(params.get('days', 1)) * MS_POR_DIA), agora_ms
+            precos = mercado.serie(cripto_id, inicio_ms, fim_ms)
+            if precos is None:
+                self._json(404, {'error': 'coin not found'})
+            else:
+                self._json(200, {'prices': precos, 'market_caps': [], 'total_volumes': []})
+        else:
+            self._json(404, {'error': 'Not Found'})
+
+
+def criar_stub(host=HOST_PADRAO, porta=PORTA_PADRAO, moedas=MOEDAS_PADRAO):
+    """
+    Cria o servidor do stub (sem iniciá-lo). A URL base da API fica em
+    f"http://{host}:{porta}/api/v3".
+    """
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorStub)
+    servidor.daemon_threads = True
+    servidor.mercado = MercadoSintetico(moedas)
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da API CoinGecko")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--moedas', type=int, default=MOEDAS_PADRAO)
+    args = parser.parse_args()
+
+    servidor = criar_stub(args.host, args.porta, args.moedas)
+    print(f"Stub da CoinGecko em http://{args.host}:{args.porta}{PREFIXO}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
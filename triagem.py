@@ -0,0 +1,252 @@
+"""
+Triagem e correlação entre moedas sobre a matriz de sparklines.
+
+Cada snapshot traz 168 pontos horários por moeda (moedas × 168). Uma única
+passada vetorizada calcula os retornos logarítmicos, retornos de 24h e 7d,
+volatilidade realizada, correlação com um índice do mercado (ponderado por
+market cap) e os retornos padronizados usados na matriz de correlação.
+
+Os filtros e ordenações da triagem não percorrem linhas em Python: para
+cada métrica ficam guardados a ordem (argsort) e os valores ordenados, então
+uma faixa [mínimo, máximo] vira duas buscas binárias (searchsorted) e uma
+fatia da ordem. TriagemMercado faz esse cálculo uma vez por snapshot e
+o compartilha entre as sessões.
+"""
+import threading
+
+import numpy as np
+
+from indicadores import PARAMETROS_PADRAO
+
+# Métricas disponíveis para filtros e ordenação: coluna -> título
+METRICAS_TRIAGEM = {
+    'retorno_24h': "Retorno 24h (%)",
+    'retorno_7d': "Retorno 7d (%)",
+    'volatilidade': "Volatilidade anualizada (%)",
+    'correlacao_mercado': "Correlação com o mercado",
+    'market_cap': "Market Cap",
+    'total_volume': "Volume 24h",
+}
+
+# Pontos de um dia nos sparklines horários
+PONTOS_DIA = 24
+
+# Mínimo de retornos válidos para volatilidade e correlação
+MINIMO_RETORNOS = 24
+
+# Moedas (as primeiras por market cap) com a matriz de correlação completa
+# calculada por snapshot; fora delas, a correlação é calculada sob demanda
+LIMITE_CORRELACAO = 250
+
+
+def _indices_extremos(validos):
+    """
+    Retorna tupla (coluna do primeiro, coluna do último) valor válido de
+    cada linha; -1 nas linhas sem nenhum.
+    """
+    colunas = validos.shape[1]
+    algum = validos.any(axis=1)
+    primeiro = np.where(algum, validos.argmax(axis=1), -1)
+    ultimo = np.where(algum, colunas - 1 - validos[:, ::-1].argmax(axis=1), -1)
+    return primeiro, ultimo
+
+
+def _retornos_padronizados(retornos, validos, quantidade):
+    """
+    Retorna os retornos de cada linha centrados e com norma 1 (ausentes
+    viram 0), de forma que o produto escalar de duas linhas é a correlação.
+    Linhas com menos de MINIMO_RETORNOS retornos ficam zeradas.
+    """
+    media = np.where(validos, retornos, 0.0).sum(axis=1, keepdims=True) / np.maximum(quantidade, 1)[:, None]
+    centrados = np.where(validos, retornos - media, 0.0)
+    norma = np.sqrt((centrados * centrados).sum(axis=1, keepdims=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        padronizados = np.where(norma > 0, centrados / norma, 0.0)
+    padronizados[quantidade < MINIMO_RETORNOS] = 0.0
+    return padronizados
+
+
+class Triagem:
+    """
+    Métricas de todas as moedas de um snapshot, com índices pré-calculados
+    para filtrar e ordenar. Linhas alinhadas com o DataFrame do snapshot.
+    Não deve ser modificada depois de criada (é compartilhada).
+    """
+
+    def __init__(self, df, sparklines, limite_correlacao=LIMITE_CORRELACAO):
+        self.df = df
+        precos = np.asarray(sparklines, dtype=np.float64)
+        moedas = len(precos)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retornos = np.log(precos[:, 1:] / precos[:, :-1])
+        validos = np.isfinite(retornos)
+        quantidade = validos.sum(axis=1)
+
+        # Retornos de 24h e 7d entre o último preço válido e o de 24h antes / o primeiro
+        primeiro, ultimo = _indices_extremos(np.isfinite(precos) & (precos > 0))
+        linhas = np.arange(moedas)
+        final = precos[linhas, ultimo] if moedas else np.empty(0)
+        inicial = precos[linhas, primeiro] if moedas else np.empty(0)
+        dia = ultimo - PONTOS_DIA
+        anterior = np.where(dia >= 0, precos[linhas, np.maximum(dia, 0)], np.nan) if moedas else np.empty(0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retorno_24h = (final / anterior - 1) * 100
+            retorno_7d = np.where(ultimo > primeiro, (final / inicial - 1) * 100, np.nan)
+
+        # Volatilidade realizada: desvio padrão amostral dos retornos horários, anualizado
+        padronizados = _retornos_padronizados(retornos, validos, quantidade)
+        media = np.where(validos, retornos, 0.0).sum(axis=1) / np.maximum(quantidade, 1)
+        soma_quadrados = np.where(validos, (retornos - media[:, None]) ** 2, 0.0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volatilidade = np.sqrt(soma_quadrados / (quantidade - 1)) * np.sqrt(PARAMETROS_PADRAO.periodos_ano) * 100
+        volatilidade[quantidade < MINIMO_RETORNOS] = np.nan
+
+        # Índice do mercado: média dos retornos ponderada por market cap
+        if moedas and 'market_cap' in df.columns:
+            pesos = np.nan_to_num(df['market_cap'].to_numpy(dtype=np.float64), nan=0.0)
+        else:
+            pesos = np.ones(moedas)
+        pesos_validos = validos * pesos[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indice = np.where(validos, retornos, 0.0).T @ pesos / pesos_validos.sum(axis=0) if moedas else np.empty(0)
+        indice_valido = np.isfinite(indice)
+        indice_padronizado = _retornos_padronizados(indice[None, :], indice_valido[None, :],
+                                                    np.array([indice_valido.sum()]))[0]
+        correlacao_mercado = padronizados @ indice_padronizado
+        correlacao_mercado[quantidade < MINIMO_RETORNOS] = np.nan
+
+        self.retornos_padronizados = padronizados.astype(np.float32)
+        self.valores = {
+            'retorno_24h': retorno_24h,
+            'retorno_7d': retorno_7d,
+            'volatilidade': volatilidade,
+            'correlacao_mercado': correlacao_mercado,
+        }
+        for coluna in ('market_cap', 'total_volume'):
+            if coluna in df.columns:
+                self.valores[coluna] = df[coluna].to_numpy(dtype=np.float64)
+            else:
+                self.valores[coluna] = np.full(moedas, np.nan)
+
+        # Índices: ordem crescente (NaN no fim), valores ordenados e posição de cada linha
+        self._ordens = {}
+        self._ordenados = {}
+        self._posicoes = {}
+        self._finitos = {}
+        for nome, valores in self.valores.items():
+            ordem = np.argsort(valores, kind='stable')
+            posicao = np.empty(moedas, dtype=np.int64)
+            posicao[ordem] = np.arange(moedas)
+            self._ordens[nome] = ordem
+            self._ordenados[nome] = valores[ordem]
+            self._posicoes[nome] = posicao
+            self._finitos[nome] = int(np.isfinite(valores).sum())
+
+        # Correlação completa entre as primeiras moedas por market cap
+        limite = min(moedas, limite_correlacao)
+        topo = self.retornos_padronizados[:limite]
+        self.correlacao = np.clip(topo @ topo.T, -1.0, 1.0)
+        self._tem_retornos = quantidade >= MINIMO_RETORNOS
+
+    def __len__(self):
+        return len(self.df)
+
+    def faixa(self, metrica, minimo=None, maximo=None):
+        """
+        Retorna as linhas (em ordem crescente da métrica) com valor entre
+        `minimo` e `maximo`, inclusive; None não limita. NaN fica de fora.
+        """
+        ordenados = self._ordenados[metrica][:self._finitos[metrica]]
+        inicio = 0 if minimo is None else int(np.searchsorted(ordenados, minimo, side='left'))
+        fim = len(ordenados) if maximo is None else int(np.searchsorted(ordenados, maximo, side='right'))
+        return self._ordens[metrica][inicio:max(inicio, fim)]
+
+    def filtrar(self, faixas):
+        """
+        Retorna as linhas que atendem a todas as faixas, em ordem de market cap.
+        `faixas` é dict métrica -> (mínimo, máximo).
+        """
+        selecionadas = np.ones(len(self), dtype=bool)
+        for metrica, (minimo, maximo) in faixas.items():
+            if minimo is None and maximo is None:
+                continue
+            mascara = np.zeros(len(self), dtype=bool)
+            mascara[self.faixa(metrica, minimo, maximo)] = True
+            selecionadas &= mascara
+        return np.flatnonzero(selecionadas)
+
+    def ordenar(self, linhas, metrica, decrescente=True):
+        """
+        Retorna `linhas` ordenadas pela métrica (NaN sempre no fim), usando a
+        posição pré-calculada de cada linha na ordem da métrica.
+        """
+        linhas = np.asarray(linhas, dtype=np.int64)
+        posicoes = self._posicoes[metrica][linhas]
+        if decrescente:
+            # Finitos do maior para o menor; NaN (posições do fim) continua no fim
+            finitos = self._finitos[metrica]
+            posicoes = np.where(posicoes < finitos, finitos - 1 - posicoes, posicoes)
+        return linhas[np.argsort(posicoes, kind='stable')]
+
+    def maiores(self, metrica, quantidade, decrescente=True):
+        """
+        Retorna as `quantidade` linhas com os maiores (ou menores) valores da métrica.
+        """
+        finitas = self._ordens[metrica][:self._finitos[metrica]]
+        return finitas[::-1][:quantidade] if decrescente else finitas[:quantidade]
+
+    def correlacao_entre(self, linhas):
+        """
+        Retorna a matriz de correlação entre as linhas informadas (NaN para
+        moedas sem retornos suficientes).
+        """
+        linhas = np.asarray(linhas, dtype=np.int64)
+        if len(linhas) and linhas.max() < len(self.correlacao):
+            matriz = self.correlacao[np.ix_(linhas, linhas)]
+        else:
+            subconjunto = self.retornos_padronizados[linhas]
+            matriz = np.clip(subconjunto @ subconjunto.T, -1.0, 1.0)
+        sem_dados = ~self._tem_retornos[linhas]
+        matriz = matriz.astype(np.float64)
+        matriz[sem_dados, :] = np.nan
+        matriz[:, sem_dados] = np.nan
+        return matriz
+
+    def tabela(self, linhas):
+        """
+        Retorna DataFrame com identificação, preço e métricas das linhas, na
+        ordem recebida.
+        """
+        linhas = np.asarray(linhas, dtype=np.int64)
+        colunas = [coluna for coluna in ('id', 'name', 'symbol', 'current_price', 'market_cap_rank')
+                   if coluna in self.df.columns]
+        resultado = self.df[colunas].iloc[linhas].reset_index(drop=True)
+        for nome, valores in self.valores.items():
+            resultado[nome] = valores[linhas]
+        return resultado
+
+
+class TriagemMercado:
+    """
+    Triagem de todas as moedas, calculada uma única vez por snapshot e
+    compartilhada pelas sessões. A chave inclui o instante da coleta: no
+    modo serviço as versões recomeçam quando o serviço reinicia.
+    """
+
+    def __init__(self, limite_correlacao=LIMITE_CORRELACAO):
+        self.limite_correlacao = limite_correlacao
+        self._chave = None
+        self._triagem = None
+        self._trava = threading.Lock()
+
+    def obter(self, snapshot):
+        """
+        Retorna a Triagem do snapshot (linhas alinhadas com snapshot.df).
+        """
+        with self._trava:
+            chave = (snapshot.atualizado_em, snapshot.versao)
+            if self._chave != chave or self._triagem is None:
+                self._triagem = Triagem(snapshot.df, snapshot.sparklines, self.limite_correlacao)
+                self._chave = chave
+            return self._triagem
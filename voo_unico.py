@@ -0,0 +1,124 @@
+"""
+Agrupamento de chamadas concorrentes idênticas (single-flight).
+
+Quando várias threads pedem a mesma chave ao mesmo tempo, só a primeira
+executa a função; as demais esperam e recebem o mesmo resultado (ou uma
+cópia da mesma exceção, com o original em __cause__). Erros ficam guardados por VALIDADE_ERRO segundos (cache negativo):
+quem pedir a mesma chave nesse intervalo recebe o erro na hora, sem gerar
+uma nova rodada de requisições que terminaria em outro 429.
+"""
+import copy
+import threading
+import time
+
+# Por quanto tempo um erro é devolvido sem nova tentativa (segundos)
+VALIDADE_ERRO = 10
+
+
+def _copia(erro):
+    """
+    Retorna uma cópia da exceção para ser lançada em outra thread: lançar o
+    mesmo objeto em várias threads mistura __traceback__ e __context__ entre elas.
+    """
+    try:
+        return copy.copy(erro)
+    except Exception:
+        # Exceções que não aceitam cópia: um RuntimeError com o original como causa
+        return RuntimeError(f"{type(erro).__name__}: {erro}")
+
+
+class _Chamada:
+    """
+    Execução em andamento de uma chave.
+    """
+
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class VooUnico:
+    """
+    Executa no máximo uma chamada por chave de cada vez, compartilhando o
+    resultado com as chamadas concorrentes. Os resultados compartilhados não
+    devem ser modificados por quem os recebe.
+    """
+
+    def __init__(self, validade_erro=VALIDADE_ERRO):
+        self.validade_erro = validade_erro
+        self._em_voo = {}
+        self._erros = {}
+        self._trava = threading.Lock()
+        self.execucoes = 0
+        self.compartilhadas = 0
+        self.erros_reaproveitados = 0
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        """
+        Retorna funcao(*args, **kwargs), executada uma única vez para todas
+        as chamadas concorrentes com a mesma chave. Relança a exceção da
+        execução (ou a guardada no cache negativo).
+        """
+        with self._trava:
+            guardado = self._erros.get(chave)
+            if guardado is not None:
+                expira_em, erro = guardado
+                if time.monotonic() < expira_em:
+                    self.erros_reaproveitados += 1
+                    raise _copia(erro) from erro
+                del self._erros[chave]
+
+            chamada = self._em_voo.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_voo[chave] = _Chamada()
+                self.execucoes += 1
+            else:
+                self.compartilhadas += 1
+
+        if not lider:
+            chamada.concluida.wait()
+            if chamada.erro is not None:
+                raise _copia(chamada.erro) from chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao(*args, **kwargs)
+        except Exception as e:
+            chamada.erro = e
+            if self.validade_erro > 0:
+                with self._trava:
+                    self._erros[chave] = (time.monotonic() + self.validade_erro, e)
+            raise
+        finally:
+            with self._trava:
+                del self._em_voo[chave]
+            chamada.concluida.set()
+        return chamada.resultado
+
+    def esquecer(self, chave):
+        """
+        Remove o erro guardado da chave (a próxima chamada executa de novo).
+        """
+        with self._trava:
+            self._erros.pop(chave, None)
+
+    def esquecer_se(self, predicado):
+        """
+        Remove os erros guardados das chaves para as quais predicado(chave) é verdadeiro.
+        """
+        with self._trava:
+            self._erros = {chave: erro for chave, erro in self._erros.items() if not predicado(chave)}
+
+    def estatisticas(self):
+        """
+        Retorna dicionário com execuções, chamadas compartilhadas e erros reaproveitados.
+        """
+        with self._trava:
+            return {
+                'execucoes': self.execucoes,
+                'compartilhadas': self.compartilhadas,
+                'erros_reaproveitados': self.erros_reaproveitados,
+                'em_voo': len(self._em_voo),
+            }